@@ -0,0 +1,7 @@
+"""
+Growatt Modbus API, independent of Home Assistant.
+
+The package can be imported on its own as top level package `API` from the directory of the integration, which
+doesn't import the integration package and thereby Home Assistant. The poller process and the command line tool
+are run this way.
+"""
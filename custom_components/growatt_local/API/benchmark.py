@@ -0,0 +1,186 @@
+"""
+Micro benchmarks of the planning and decoding functions running every update cycle on the event loop.
+
+Every benchmark reports the operations per second, the mean time per call and the peak of the memory
+allocated by a single call. The results can be written to a JSON file and compared with an earlier run.
+Run from the directory of the integration, without importing Home Assistant:
+
+    cd custom_components/growatt_local
+    python -m API.benchmark --json current.json --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any
+
+from .device_type.base import (
+    GrowattDeviceRegisters,
+    ATTR_STATUS_CODE,
+    ATTR_DERATING_MODE,
+    ATTR_INPUT_POWER,
+    ATTR_OUTPUT_POWER,
+    inverter_status,
+)
+from .device_type.inverter import MAXIMUM_DATA_LENGTH, INPUT_REGISTERS
+from .utils import (
+    LRUCache,
+    RegisterImage,
+    create_read_plan,
+    get_all_keys_from_register,
+    get_continuation_keys,
+    get_keys_from_register,
+    keys_sequences,
+    process_registers,
+    split_sequence,
+)
+
+MANIFEST = Path(__file__).parent.parent / "manifest.json"
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    ops_per_sec: float
+    mean_ns: float
+    peak_bytes: int
+
+
+def _keys(registers: tuple[GrowattDeviceRegisters, ...]) -> set[int]:
+    return {register.register for register in registers}
+
+
+def key_sets() -> dict[str, set[int]]:
+    """Realistic key sets of the input registers."""
+    power = {ATTR_STATUS_CODE, ATTR_DERATING_MODE, ATTR_INPUT_POWER, ATTR_OUTPUT_POWER}
+
+    return {
+        "power_only": _keys(tuple(register for register in INPUT_REGISTERS if register.name in power)),
+        "full_scan": _keys(INPUT_REGISTERS),
+        "storage": _keys(tuple(register for register in INPUT_REGISTERS if register.register >= 3000)),
+        # one key just beyond every split threshold, the maximum number of requests
+        "sparse_worst_case": set(range(0, 4000, MAXIMUM_DATA_LENGTH // 4 + 1)),
+    }
+
+
+def benchmarks() -> dict[str, Callable[[], Any]]:
+    registers = INPUT_REGISTERS
+    continuation_keys = get_continuation_keys(registers)
+    all_keys = get_keys_from_register(registers)
+    values = {key: key & 0xFF for key in all_keys}
+    image = RegisterImage(registers)
+    for start, end in image.ranges():
+        image.write(start, [values.get(key, 0) for key in range(start, end)])
+    status = {ATTR_STATUS_CODE: 1, ATTR_DERATING_MODE: 4}
+
+    cases: dict[str, Callable[[], Any]] = {}
+    for name, keys in key_sets().items():
+        sorted_keys = sorted(keys)
+        cases[f"get_all_keys_from_register[{name}]"] = lambda keys=keys: get_all_keys_from_register(registers, keys)
+        cases[f"split_sequence[{name}]"] = (
+            lambda sorted_keys=sorted_keys: split_sequence(sorted_keys, MAXIMUM_DATA_LENGTH)
+        )
+        cases[f"keys_sequences[{name}]"] = (
+            lambda keys=keys: keys_sequences(keys, MAXIMUM_DATA_LENGTH, continuation_keys)
+        )
+        cases[f"create_read_plan[{name}]"] = lambda keys=keys: create_read_plan(registers, keys, MAXIMUM_DATA_LENGTH)
+
+    cases["process_registers[dict]"] = lambda: process_registers(registers, values)
+    cases["process_registers[image]"] = lambda: process_registers(registers, image)
+    cases["inverter_status"] = lambda: inverter_status(status)
+
+    cache = LRUCache(10)
+    for i in range(10):
+        cache[frozenset((i,))] = i
+    hit = frozenset((5,))
+    miss = iter(range(10, sys.maxsize))
+
+    cases["LRUCache[hit]"] = lambda: cache.get(hit)
+    cases["LRUCache[miss]"] = lambda: cache.set(frozenset((next(miss),)), 0)
+
+    return cases
+
+
+def measure(name: str, function: Callable[[], Any], repeat: int = 5) -> BenchmarkResult:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        function()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(name, 1 / best, best * 1e9, max(0, peak - current))
+
+
+def run(selection: str | None = None, repeat: int = 5) -> list[BenchmarkResult]:
+    return [
+        measure(name, function, repeat)
+        for name, function in benchmarks().items()
+        if selection is None or selection in name
+    ]
+
+
+def compare(results: list[BenchmarkResult], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """
+    Compares the results with the results of an earlier run.
+    returns list of the benchmarks slower than the threshold fraction
+    """
+    previous = {item["name"]: item for item in baseline["results"]}
+    regressions = []
+
+    for result in results:
+        if (item := previous.get(result.name)) is None:
+            continue
+
+        change = item["ops_per_sec"] / result.ops_per_sec - 1
+        print(f"{result.name:<45} {change:+8.1%} time, {result.peak_bytes - item['peak_bytes']:+8d} B")
+        if change > threshold:
+            regressions.append(result.name)
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Growatt planning and decoding benchmarks")
+    parser.add_argument("-k", dest="selection", help="only run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="compare with the results in this file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slow down before failing")
+    args = parser.parse_args()
+
+    results = run(args.selection, args.repeat)
+
+    for result in results:
+        print(
+            f"{result.name:<45} {result.ops_per_sec:>12,.0f} ops/s {result.mean_ns:>12,.0f} ns {result.peak_bytes:>8d} B"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "version": json.loads(MANIFEST.read_text())["version"],
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "results": [asdict(result) for result in results],
+        }, indent=2))
+
+    if args.compare and (regressions := compare(results, json.loads(args.compare.read_text()), args.threshold)):
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
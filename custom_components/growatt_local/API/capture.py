@@ -0,0 +1,305 @@
+"""
+Recording and replaying of the Modbus traffic of a Growatt device.
+
+`GrowattRecorder` wraps a transport and writes every request with its outcome and timing to a capture file,
+`GrowattReplay` serves a capture file back as transport so a session can be reproduced without the device.
+
+The capture file starts with a header of the magic, the format version and the start time as epoch,
+followed by one record per request:
+
+    offset (double, s since start), duration (float, s), function, unit, status, exception code, address, count,
+    followed by count register values (the response of a read or the written values of a write)
+
+The exception code is the one of an exception response, 0 for other outcomes. Version 1 files don't have the
+exception code and are still read. All values are little endian.
+"""
+import asyncio
+import logging
+import struct
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import BinaryIO
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.pdu import ModbusResponse
+from pymodbus.register_write_message import WriteSingleRegisterResponse
+
+from .const import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, WRITE_SINGLE_REGISTER
+from .exception import ModbusException
+from .growatt import GrowattModbusBase
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"GWCAP"
+CAPTURE_VERSION = 2
+CAPTURE_HEADER = struct.Struct("<5sBd")
+CAPTURE_RECORD = struct.Struct("<dfBBBBHH")
+# records of version 1 files, without the exception code
+CAPTURE_RECORD_V1 = struct.Struct("<dfBBBHH")
+
+
+class CaptureStatus(IntEnum):
+    Ok = 0
+    Error = 1  # device answered with an exception response
+    Timeout = 2
+    NoResponse = 3  # transport gave up waiting for the response
+    ConnectionLost = 4
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    offset: float
+    duration: float
+    function: int
+    unit: int
+    status: CaptureStatus
+    address: int
+    count: int
+    values: tuple[int, ...] = ()
+    exception_code: int | None = None
+
+    @property
+    def key(self) -> tuple[int, int, int, int]:
+        return self.function, self.unit, self.address, self.count
+
+
+def read_capture(file: BinaryIO) -> tuple[float, Iterator[CaptureRecord]]:
+    """
+    Reads a capture file.
+    returns start time as epoch and iterator of the records
+    """
+    magic, version, start = CAPTURE_HEADER.unpack(file.read(CAPTURE_HEADER.size))
+    if magic != CAPTURE_MAGIC or version not in (1, CAPTURE_VERSION):
+        raise ValueError(f"Unsupported capture file {getattr(file, 'name', file)!r}")
+
+    record = CAPTURE_RECORD if version == CAPTURE_VERSION else CAPTURE_RECORD_V1
+
+    def records() -> Iterator[CaptureRecord]:
+        while header := file.read(record.size):
+            if version == CAPTURE_VERSION:
+                offset, duration, function, unit, status, exception_code, address, count = record.unpack(header)
+            else:
+                offset, duration, function, unit, status, address, count = record.unpack(header)
+                exception_code = 0
+            values = struct.unpack(f"<{count}H", file.read(2 * count)) if status == CaptureStatus.Ok else ()
+            yield CaptureRecord(
+                offset, duration, function, unit, CaptureStatus(status), address, count, values, exception_code or None
+            )
+
+    return start, records()
+
+
+class GrowattRecorder(GrowattModbusBase):
+    """Transport recording all requests of the wrapped transport to the given capture file."""
+
+    def __init__(self, modbus: GrowattModbusBase, path: str) -> None:
+        self.modbus = modbus
+        self.client = modbus.client
+        self.path = path
+        self._file: BinaryIO | None = None
+        self._start = 0.0
+
+    async def connect(self):
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            self._file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, time.time()))
+            self._start = time.monotonic()
+
+        return await self.modbus.connect()
+
+    def connected(self):
+        return self.modbus.connected()
+
+    async def close(self):
+        try:
+            await self.modbus.close()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _record(
+            self,
+            started: float,
+            function: int,
+            unit: int,
+            status: CaptureStatus,
+            address: int,
+            count: int,
+            values=(),
+            exception_code: int | None = None,
+    ) -> None:
+        if self._file is None:
+            return
+
+        self._file.write(
+            CAPTURE_RECORD.pack(
+                started - self._start,
+                time.monotonic() - started,
+                function,
+                unit or 0,
+                status,
+                exception_code or 0,
+                address,
+                count,
+            )
+            + struct.pack(f"<{len(values)}H", *values)
+        )
+
+    async def _recorded(self, function: int, unit: int, address: int, count: int, request, values=None):
+        started = time.monotonic()
+        try:
+            result = await request
+        except ModbusException as error:
+            self._record(started, function, unit, CaptureStatus.Error, address, count, (), error.exception_code)
+            raise
+        except asyncio.TimeoutError:
+            self._record(started, function, unit, CaptureStatus.Timeout, address, count)
+            raise
+        except ModbusIOException:
+            self._record(started, function, unit, CaptureStatus.NoResponse, address, count)
+            raise
+        except ConnectionException:
+            self._record(started, function, unit, CaptureStatus.ConnectionLost, address, count)
+            raise
+
+        self._record(started, function, unit, CaptureStatus.Ok, address, count, result if values is None else values)
+        return result
+
+    async def write_register(self, register, payload, unit) -> ModbusResponse:
+        return await self._recorded(
+            WRITE_SINGLE_REGISTER, unit, register, 1,
+            self.modbus.write_register(register, payload, unit), (payload & 0xFFFF,)
+        )
+
+    async def read_holding_registers(self, start_index, length, unit, timeout: float | None = None) -> list[int]:
+        return await self._recorded(
+            READ_HOLDING_REGISTERS, unit, start_index, length,
+            self.modbus.read_holding_registers(start_index, length, unit, timeout=timeout)
+        )
+
+    async def read_input_registers(self, start_index, length, unit) -> list[int]:
+        return await self._recorded(
+            READ_INPUT_REGISTERS, unit, start_index, length,
+            self.modbus.read_input_registers(start_index, length, unit)
+        )
+
+
+class GrowattReplay(GrowattModbusBase):
+    """
+    Transport serving a capture file.
+    Requests are answered by the next recorded request with the same function, unit, address and count, after
+    the recorded duration multiplied by time_scale (0 answers right away). Reads that weren't recorded as such,
+    for example after a change of the read plan, are composed from the register values replayed so far.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0) -> None:
+        self.client = None
+        self.path = path
+        self.time_scale = time_scale
+        self.missed = 0
+
+        with open(path, "rb") as file:
+            self.start, records = read_capture(file)
+            self.records = list(records)
+
+        self._pending: dict[tuple[int, int, int, int], deque[int]] = {}
+        for index, record in enumerate(self.records):
+            self._pending.setdefault(record.key, deque()).append(index)
+
+        self._replayed = 0
+        self._registers: dict[tuple[int, int], dict[int, int]] = {}
+        # exception codes of the single registers the device refused, by unit and function
+        self._refused: dict[tuple[int, int], dict[int, int]] = {}
+        self._connected = False
+
+    async def connect(self):
+        self._connected = True
+        return True
+
+    def connected(self):
+        return self._connected
+
+    async def close(self):
+        self._connected = False
+
+    def _advance(self, index: int) -> None:
+        """Applies the register values of all records up to the given index."""
+        for record in self.records[self._replayed:index + 1]:
+            if record.status == CaptureStatus.Error and record.count == 1 and record.exception_code is not None:
+                self._refused.setdefault((record.unit, record.function), {})[record.address] = record.exception_code
+            if record.status != CaptureStatus.Ok:
+                continue
+
+            if record.function == WRITE_SINGLE_REGISTER:
+                self._registers.setdefault((record.unit, READ_HOLDING_REGISTERS), {})[record.address] = record.values[0]
+            else:
+                registers = self._registers.setdefault((record.unit, record.function), {})
+                registers.update(zip(range(record.address, record.address + record.count), record.values))
+
+        self._replayed = max(self._replayed, index + 1)
+
+    async def _replay(self, function: int, unit: int, address: int, count: int) -> tuple[int, ...]:
+        unit = unit or 0
+        if not (pending := self._pending.get((function, unit, address, count))):
+            return await self._compose(function, unit, address, count)
+
+        return (await self._replay_record(pending.popleft())).values
+
+    async def _replay_record(self, index: int) -> CaptureRecord:
+        self._advance(index)
+        record = self.records[index]
+
+        if self.time_scale:
+            await asyncio.sleep(record.duration * self.time_scale)
+
+        if record.status == CaptureStatus.Timeout:
+            raise asyncio.TimeoutError()
+        if record.status == CaptureStatus.NoResponse:
+            raise ModbusIOException(f"Replayed missing response at {record.offset:.3f}s")
+        if record.status == CaptureStatus.ConnectionLost:
+            raise ConnectionException(f"Replayed connection loss at {record.offset:.3f}s")
+        if record.status == CaptureStatus.Error:
+            end = record.address + record.count - 1
+            raise ModbusException(
+                f"Modbus request failed for registers {record.address}-{end}.", record.exception_code
+            )
+
+        return record
+
+    async def _compose(self, function: int, unit: int, address: int, count: int) -> tuple[int, ...]:
+        self.missed += 1
+        refused = self._refused.get((unit, function), {})
+        for key in range(address, address + count):
+            if key in refused:
+                # a composed read covering a register the device refused is refused as well
+                raise ModbusException(
+                    f"Modbus read failed for registers {address}-{address + count - 1}.", refused[key]
+                )
+
+        registers = self._registers.get((unit, function), {})
+        try:
+            return tuple(registers[key] for key in range(address, address + count))
+        except KeyError:
+            _LOGGER.debug("No replayed values for registers %d-%d", address, address + count - 1)
+            raise ModbusException(f"Modbus read failed for registers {address}-{address + count - 1}.") from None
+
+    async def write_register(self, register, payload, unit) -> ModbusResponse:
+        unit = unit or 0
+        if pending := self._pending.get((WRITE_SINGLE_REGISTER, unit, register, 1)):
+            await self._replay_record(pending.popleft())
+        else:
+            self.missed += 1
+
+        self._registers.setdefault((unit, READ_HOLDING_REGISTERS), {})[register] = payload & 0xFFFF
+        return WriteSingleRegisterResponse(register, payload & 0xFFFF)
+
+    async def read_holding_registers(self, start_index, length, unit, timeout: float | None = None) -> list[int]:
+        # the recorded outcome is replayed, a timeout of the request is part of it
+        return list(await self._replay(READ_HOLDING_REGISTERS, unit, start_index, length))
+
+    async def read_input_registers(self, start_index, length, unit) -> list[int]:
+        return list(await self._replay(READ_INPUT_REGISTERS, unit, start_index, length))
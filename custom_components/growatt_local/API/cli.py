@@ -0,0 +1,282 @@
+"""
+Command line tool for polling and diagnosing a Growatt device without Home Assistant.
+
+Run from the directory of the integration, which imports the package as top level package `API` instead of
+importing the integration and thereby Home Assistant:
+
+    cd custom_components/growatt_local
+    python -m API info --serial /dev/ttyUSB0
+    python -m API poll --tcp 192.168.1.2 502 --format csv --keys input_power,output_power
+    python -m API plan --keys input_power,output_power --baudrate 9600
+    python -m API dump --tcp 192.168.1.2 502 --input 0-124,3000-3124
+    python -m API bench --serial /dev/ttyUSB0 --count 100
+    python -m API scan --serial /dev/ttyUSB0 --units 1-10
+"""
+import argparse
+import asyncio
+import csv
+import json
+import statistics
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from .device_type.inverter import MAXIMUM_DATA_LENGTH
+from .exception import ModbusException
+from .growatt import GrowattDevice, GrowattModbusBase, GrowattNetwork, GrowattSerial, get_device_info
+from .metrics import REQUEST_PDU_SIZE
+from .proxy import parse_register_ranges
+from .utils import ReadPlan, keys_sequences
+
+# Response time of the device assumed by the cost estimate of a read plan
+DEFAULT_TURNAROUND = 0.05
+
+
+def add_transport_arguments(parser: argparse.ArgumentParser, required: bool = True) -> None:
+    transport = parser.add_argument_group("transport")
+    layer = transport.add_mutually_exclusive_group(required=required)
+    layer.add_argument("--serial", metavar="PORT")
+    layer.add_argument("--tcp", nargs=2, metavar=("HOST", "PORT"))
+    layer.add_argument("--udp", nargs=2, metavar=("HOST", "PORT"))
+    transport.add_argument("--baudrate", type=int, default=9600)
+    transport.add_argument("--stopbits", type=int, default=1)
+    transport.add_argument("--parity", default="None")
+    transport.add_argument("--bytesize", type=int, default=8)
+    transport.add_argument("--timeout", type=float, default=3)
+    transport.add_argument("--unit", type=int, default=1)
+
+
+def create_transport(args: argparse.Namespace) -> GrowattModbusBase:
+    """Creates the transport given by the arguments added by `add_transport_arguments`."""
+    if args.serial:
+        return GrowattSerial(args.serial, args.baudrate, args.stopbits, args.parity, args.bytesize, args.timeout)
+
+    layer, (host, port) = ("tcp", args.tcp) if args.tcp else ("udp", args.udp)
+    return GrowattNetwork(layer, host, int(port), args.timeout)
+
+
+def names(value: str) -> list[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def selected_keys(device: GrowattDevice, args: argparse.Namespace) -> tuple[set[int], set[int]]:
+    """Input and holding keys of the registers named by --keys and --holding, all input registers by default."""
+    if args.keys is None and args.holding is None:
+        return {register.register for register in device.input_register}, set()
+
+    return device.get_keys_by_name(args.keys or ()), device.get_holding_keys_by_name(args.holding or ())
+
+
+def plan_cost(plan: ReadPlan, args: argparse.Namespace) -> list[float]:
+    """
+    Estimated duration in seconds of every request of the plan, the turnaround of the device and for serial
+    transports the time to transmit the request and response frames.
+    """
+    if args.tcp or args.udp:
+        character_time = 0.0
+    else:
+        bits = 1 + args.bytesize + args.stopbits + (0 if args.parity[:1].upper() == "N" else 1)
+        character_time = bits / args.baudrate
+
+    # unit, function code, byte count, CRC and the 3.5 character silent interval after both frames
+    return [
+        args.turnaround + character_time * (REQUEST_PDU_SIZE + 3 + 3 + 2 * length + 2 + 2 * 3.5)
+        for (_, length), _ in plan.blocks
+    ]
+
+
+async def command_info(args: argparse.Namespace, modbus: GrowattModbusBase) -> None:
+    info = await get_device_info(modbus, args.unit)
+    if args.json:
+        print(json.dumps(asdict(info)))
+        return
+
+    for name, value in asdict(info).items():
+        print(f"{name:<15} {value}")
+
+
+async def command_poll(args: argparse.Namespace, modbus: GrowattModbusBase) -> None:
+    device = GrowattDevice(modbus, args.unit)
+    keys, holding_keys = selected_keys(device, args)
+    values: dict[str, Any] = {}
+    writer = None
+
+    count = 0
+    while args.count is None or count < args.count:
+        started = time.monotonic()
+        values.update(await device.update(keys))
+        values.update(await device.update_holding(holding_keys))
+        values["status"] = device.status(values)
+        timestamp = datetime.now().isoformat(timespec="seconds")
+
+        if args.format == "json":
+            print(json.dumps({"timestamp": timestamp, **values}, default=str), flush=True)
+        elif args.format == "csv":
+            if writer is None:
+                writer = csv.DictWriter(sys.stdout, ["timestamp", *sorted(values)], extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({"timestamp": timestamp, **values})
+            sys.stdout.flush()
+        else:
+            print(timestamp)
+            for name in sorted(values):
+                print(f"  {name:<35} {values[name]}")
+
+        count += 1
+        if args.count is None or count < args.count:
+            await asyncio.sleep(max(args.interval - (time.monotonic() - started), 0))
+
+
+def command_plan(args: argparse.Namespace) -> None:
+    device = GrowattDevice(None, args.unit)
+    keys, holding_keys = selected_keys(device, args)
+    total = 0.0
+
+    for kind, kind_keys, holding in (("input", keys, False), ("holding", holding_keys, True)):
+        if not kind_keys:
+            continue
+
+        plan = device.plan(kind_keys, holding)
+        costs = plan_cost(plan, args)
+        total += sum(costs)
+        print(f"{kind} registers, {len(plan.blocks)} requests, {sum(costs) * 1000:.0f} ms")
+        for ((start, length), registers), cost in zip(plan.blocks, costs):
+            print(f"  {start:>5}-{start + length - 1:<5} {length:>4} registers {cost * 1000:>6.0f} ms")
+            if args.verbose:
+                for register in registers:
+                    print(f"        {register.register:>5} {register.name}")
+
+    print(f"estimated cycle {total * 1000:.0f} ms")
+
+
+async def command_dump(args: argparse.Namespace, modbus: GrowattModbusBase) -> None:
+    for kind, ranges, read in (
+            ("input", args.input, modbus.read_input_registers),
+            ("holding", args.holding, modbus.read_holding_registers),
+    ):
+        if not ranges:
+            continue
+
+        for start, length in sorted(keys_sequences(parse_register_ranges(ranges), MAXIMUM_DATA_LENGTH)):
+            try:
+                values = await read(start_index=start, length=length, unit=args.unit)
+            except ModbusException as error:
+                print(f"{kind} {start}-{start + length - 1}: {error}", file=sys.stderr)
+                continue
+
+            for address, value in enumerate(values, start):
+                print(f"{kind:<7} {address:>5} {value:>5} 0x{value:04x}")
+
+
+async def command_bench(args: argparse.Namespace, modbus: GrowattModbusBase) -> None:
+    read = modbus.read_holding_registers if args.holding_block else modbus.read_input_registers
+    latencies = []
+    failures = 0
+
+    for _ in range(args.count):
+        started = time.monotonic()
+        try:
+            await read(start_index=args.start, length=args.length, unit=args.unit)
+        except (asyncio.TimeoutError, ModbusIOException, ModbusException):
+            failures += 1
+            continue
+        latencies.append(time.monotonic() - started)
+
+    if not latencies:
+        print(f"{failures} of {args.count} requests failed")
+        return
+
+    latencies.sort()
+    print(f"requests {args.count}, failed {failures}")
+    print(
+        f"latency min {latencies[0] * 1000:.1f} ms, mean {statistics.fmean(latencies) * 1000:.1f} ms, "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+        f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.1f} ms, "
+        f"max {latencies[-1] * 1000:.1f} ms"
+    )
+
+
+async def command_scan(args: argparse.Namespace, modbus: GrowattModbusBase) -> None:
+    units = await modbus.scan_units(
+        sorted(parse_register_ranges(args.units)), args.timeout, args.concurrency
+    )
+
+    for unit, info in units.items():
+        if info is None:
+            print(f"{unit:>3} device information not available")
+        else:
+            print(f"{unit:>3} {info.serial_number} {info.model} {info.device_type}, firmware {info.firmware}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    modbus = create_transport(args)
+    await modbus.connect()
+    try:
+        await args.command(args, modbus)
+    finally:
+        await modbus.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="API", description="Growatt Modbus command line tool")
+    commands = parser.add_subparsers(required=True, metavar="command")
+
+    info = commands.add_parser("info", help="show the device information")
+    add_transport_arguments(info)
+    info.add_argument("--json", action="store_true")
+    info.set_defaults(command=command_info)
+
+    poll = commands.add_parser("poll", help="poll the device continuously")
+    add_transport_arguments(poll)
+    poll.add_argument("--keys", type=names, help="comma separated input register names, all by default")
+    poll.add_argument("--holding", type=names, help="comma separated holding register names")
+    poll.add_argument("--interval", type=float, default=5)
+    poll.add_argument("--count", type=int, help="number of polls, endless by default")
+    poll.add_argument("--format", choices=("text", "json", "csv"), default="text")
+    poll.set_defaults(command=command_poll)
+
+    plan = commands.add_parser("plan", help="show the read plan of the registers and its estimated duration")
+    add_transport_arguments(plan, required=False)
+    plan.add_argument("--keys", type=names, help="comma separated input register names, all by default")
+    plan.add_argument("--holding", type=names, help="comma separated holding register names")
+    plan.add_argument("--turnaround", type=float, default=DEFAULT_TURNAROUND, help="response time of the device")
+    plan.add_argument("-v", "--verbose", action="store_true", help="list the registers of every request")
+    plan.set_defaults(command=None)
+
+    dump = commands.add_parser("dump", help="dump raw register values")
+    add_transport_arguments(dump)
+    dump.add_argument("--input", help="input register ranges like 0-124,3000-3124")
+    dump.add_argument("--holding", help="holding register ranges like 0-124")
+    dump.set_defaults(command=command_dump)
+
+    bench = commands.add_parser("bench", help="measure the latency of repeated reads of a block")
+    add_transport_arguments(bench)
+    bench.add_argument("--count", type=int, default=50)
+    bench.add_argument("--start", type=int, default=0)
+    bench.add_argument("--length", type=int, default=MAXIMUM_DATA_LENGTH)
+    bench.add_argument("--holding-block", action="store_true", help="read holding instead of input registers")
+    bench.set_defaults(command=command_bench)
+
+    scan = commands.add_parser("scan", help="list the unit addresses answering on the bus")
+    add_transport_arguments(scan)
+    scan.add_argument("--units", default="1-247", help="unit addresses to try like 1-10")
+    scan.add_argument("--concurrency", type=int, default=8, help="concurrent probes on Modbus TCP")
+    scan.set_defaults(command=command_scan, timeout=0.5)
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        command_plan(args)
+        return
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    except (ModbusException, ConnectionException, asyncio.TimeoutError, ModbusIOException) as error:
+        print(f"error: {error or type(error).__name__}", file=sys.stderr)
+        sys.exit(1)
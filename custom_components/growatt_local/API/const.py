@@ -13,3 +13,16 @@ TIME_HOURS = "h"
 REACTIVE_ENERGY_KILO_VAR_HOUR = "kvarh"
 FREQUENCY_HERTZ = "Hz"
 TEMP_CELSIUS = "°C"
+
+# Modbus function codes
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+SLAVE_DEVICE_FAILURE = 0x04
+GATEWAY_TARGET_FAILED = 0x0B
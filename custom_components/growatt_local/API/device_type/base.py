@@ -1,5 +1,8 @@
+import time
+from array import array
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass
-from enum import Enum
+from enum import Enum, IntEnum
 from typing import Any, Callable
 
 # Attribute names for values in the holding register
@@ -137,9 +140,53 @@ class custom_function(type):
     pass
 
 
+class bit_field(type):
+    """
+    Object to be used as value_type in a `GrowattDeviceRegisters` of which the value is composed of `GrowattBitField`.
+    """
+    pass
+
+
+@dataclass
+class GrowattBitField:
+    """
+    Dataclass object to define a named range of bits within a register value.
+    For registers with a length of 2 the first register holds the upper 16 bits.
+    """
+
+    name: str
+    offset: int
+    width: int = 1
+    mapping: dict[int, Any] | None = None
+
+    def __post_init__(self) -> None:
+        self.mask = (1 << self.width) - 1
+        self.reverse_mapping = {value: key for key, value in self.mapping.items()} if self.mapping else None
+
+    def decode(self, value: int) -> Any:
+        raw = (value >> self.offset) & self.mask
+
+        if self.mapping is None:
+            return raw
+
+        return self.mapping.get(raw, "Unknown")
+
+    def encode(self, value: int, field_value: Any) -> int:
+        if self.reverse_mapping is not None and field_value in self.reverse_mapping:
+            field_value = self.reverse_mapping[field_value]
+
+        if not isinstance(field_value, int) or not 0 <= field_value <= self.mask:
+            raise ValueError(f"Value {field_value} is not valid for bit field {self.name}")
+
+        return (value & ~(self.mask << self.offset)) | (field_value << self.offset)
+
+
 @dataclass
 class GrowattDeviceRegisters:
-    """Dataclass object to define register value for Growatt devices using modbus."""
+    """
+    Dataclass object to define register value for Growatt devices using modbus.
+    Monotonic registers are counters that never decrease, unless they reset daily and the day changed.
+    """
 
     name: str
     register: int
@@ -147,6 +194,9 @@ class GrowattDeviceRegisters:
     length: int = 1
     scale: int = 10
     function: Callable | None = None
+    fields: tuple[GrowattBitField, ...] = ()
+    monotonic: bool = False
+    daily_reset: bool = False
 
 
 @dataclass
@@ -160,6 +210,131 @@ class GrowattDeviceInfo:
     device_type: str = ""
 
 
+class ValueQuality(IntEnum):
+    "Enum of the quality of a value in a `GrowattSnapshot`."
+    Missing = 0
+    Good = 1
+    Substituted = 2
+
+
+class GrowattCatalog:
+    """Fixed position of each value name of a device, used to index the values of a `GrowattSnapshot`."""
+
+    __slots__ = ("names", "index")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names: tuple[str, ...] = tuple(dict.fromkeys(names))
+        self.index: dict[str, int] = {name: index for index, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class GrowattSnapshot(Mapping[str, Any]):
+    """
+    Compact set of values of a Growatt device, stored in a vector indexed by the position in the catalog.
+    Every value has the time it was set and a quality flag, values with quality Missing are not part of the mapping.
+    A frozen snapshot can't be updated.
+    """
+
+    __slots__ = ("catalog", "timestamp", "frozen", "_values", "_timestamps", "_quality")
+
+    def __init__(self, catalog: GrowattCatalog) -> None:
+        self.catalog = catalog
+        self.timestamp = 0.0
+        self.frozen = False
+        self._values: list[Any] = [None] * len(catalog)
+        self._timestamps = array("d", bytes(8 * len(catalog)))
+        self._quality = array("B", bytes(len(catalog)))
+
+    def update(
+            self,
+            values: Mapping[str, Any],
+            timestamp: float | None = None,
+            quality: ValueQuality = ValueQuality.Good
+    ) -> None:
+        """Sets the given values, names not part of the catalog are ignored."""
+        if self.frozen:
+            raise TypeError("Snapshot is frozen")
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        index = self.catalog.index
+        for name, value in values.items():
+            if (position := index.get(name)) is None:
+                continue
+            self._values[position] = value
+            self._timestamps[position] = timestamp
+            self._quality[position] = quality
+
+        self.timestamp = timestamp
+
+    def value(self, index: int) -> Any:
+        return self._values[index]
+
+    def quality(self, index: int) -> ValueQuality:
+        return ValueQuality(self._quality[index])
+
+    def updated(self, index: int) -> float | None:
+        """returns the time the value was last set."""
+        return self._timestamps[index] if self._quality[index] else None
+
+    def age(self, index: int, now: float | None = None) -> float | None:
+        """returns the number of seconds since the value was last set."""
+        if not self._quality[index]:
+            return None
+
+        return (time.time() if now is None else now) - self._timestamps[index]
+
+    def export(self) -> dict[str, tuple[Any, float, int]]:
+        """returns the values that aren't missing by name, as tuple of value, time set and quality."""
+        return {
+            name: (self._values[index], self._timestamps[index], self._quality[index])
+            for index, name in enumerate(self.catalog.names)
+            if self._quality[index]
+        }
+
+    def restore(self, values: Mapping[str, Sequence[Any]]) -> None:
+        """
+        Sets the values returned by `export` with the time they were set, names not part of the catalog are ignored.
+        Restored values are substituted values as they weren't read from the device.
+        """
+        if self.frozen:
+            raise TypeError("Snapshot is frozen")
+
+        index = self.catalog.index
+        for name, (value, timestamp, _) in values.items():
+            if (position := index.get(name)) is None:
+                continue
+            self._values[position] = value
+            self._timestamps[position] = timestamp
+            self._quality[position] = ValueQuality.Substituted
+            self.timestamp = max(self.timestamp, timestamp)
+
+    def copy(self, frozen: bool = False) -> "GrowattSnapshot":
+        snapshot = GrowattSnapshot.__new__(GrowattSnapshot)
+        snapshot.catalog = self.catalog
+        snapshot.timestamp = self.timestamp
+        snapshot.frozen = frozen
+        snapshot._values = self._values.copy()
+        snapshot._timestamps = array("d", self._timestamps)
+        snapshot._quality = array("B", self._quality)
+        return snapshot
+
+    def __getitem__(self, name: str) -> Any:
+        if (index := self.catalog.index.get(name)) is None or not self._quality[index]:
+            raise KeyError(name)
+
+        return self._values[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for index, name in enumerate(self.catalog.names) if self._quality[index])
+
+    def __len__(self) -> int:
+        return len(self._quality) - self._quality.count(ValueQuality.Missing)
+
+
 DEVICE_TYPE_CODES = {
     0x100: "1 tracker and 1phase Grid connect PV inverter TL",
     0x200: "2 tracker and 1phase Grid connect PV inverter TL",
@@ -1,11 +1,13 @@
 """Device defaults for a Growatt Inverter."""
 import logging
-import datetime
 
 from .base import (
     GrowattDeviceRegisters,
+    GrowattBitField,
+    bit_field,
     custom_function,
     FIRMWARE_REGISTER,
+    SERIAL_NUMBER_REGISTER as SHORT_SERIAL_NUMBER_REGISTER,
     DEVICE_TYPE_CODE_REGISTER,
     NUMBER_OF_TRACKERS_AND_PHASES_REGISTER,
     ATTR_INVERTER_MODEL,
@@ -104,168 +106,129 @@ def model(registers) -> str:
     )
 
 
-def timeX(registers) -> str:
-    start = timeX_start(registers[0])
-    end = timeX_end(registers[1])
+TIME_PRIORITY_MAPPING = {
+    0: 'Load',
+    1: 'Battery',
+    2: 'Grid'
+}
 
-    dictionary = {
-        'Start': datetime.time(start['Hour'], start['Minutes']).isoformat(timespec='minutes'),
-        'End': datetime.time(end['Hour'], end['Minutes']).isoformat(timespec='minutes'),
-        'Priority': start['Priority'],
-        'Enabled': start['Enabled']
-    }
+# Time period registers: bit 0-7 minutes, bit 8-12 hour, bit 13-14 priority and bit 15 enabled (start register only)
+TIME_X_MINUTES = GrowattBitField(name="minutes", offset=0, width=8)
+TIME_X_HOUR = GrowattBitField(name="hour", offset=8, width=5)
+TIME_X_PRIORITY = GrowattBitField(name="priority", offset=13, width=2, mapping=TIME_PRIORITY_MAPPING)
+TIME_X_ENABLED = GrowattBitField(name="enabled", offset=15, mapping={0: False, 1: True})
 
-    converted = str()
-
-    # iterating over dictionary using a for loop
-    for key in dictionary:
-        converted += key + ": " + str(dictionary[key]) + ", "
-
-    _LOGGER.debug("time: %s", converted)
-    return converted
-
-
-def timeX_start(registers) -> dict:
-    bits = bin(registers)[2:].zfill(16)  # Convert to binary string, zero-padded to 16 bits
-    minutes = int(bits[9:15], 2)
-    hour = int(bits[4:8], 2)
-    priority = int(bits[1:3], 2)
-    enabled = int(bits[0], 2)
-    priority_mapping = {
-        0: 'Load',
-        1: 'Battery',
-        2: 'Grid'
-    }
-    enabled_mapping = {
-        0: 'No',
-        1: 'Yes'
-    }
-    dictionary = {
-        'Minutes': minutes,
-        'Hour': hour,
-        'Priority': priority_mapping.get(priority, 'Unknown'),
-        'Enabled': enabled_mapping.get(enabled, 'Unknown')
-    }
-    return dictionary
-
-
-def timeX_end(registers) -> dict:
-    bits = bin(registers)[2:].zfill(16)  # Convert to binary string, zero-padded to 16 bits
-    minutes = int(bits[9:15], 2)
-    hour = int(bits[3:8], 2)
-
-    return {
-        'Minutes': minutes,
-        'Hour': hour
-    }
-
-
-def time_x_start(registers) -> str:
-    bits = bin(registers)[2:].zfill(16)
-    minutes = int(bits[9:15], 2)
-    hour = int(bits[4:8], 2)
-
-    return str(datetime.time(hour, minutes).isoformat(timespec='minutes'))
-
-
-def time_x_enabled(registers) -> bool:
-    bits = bin(registers)[2:].zfill(16)
-    enabled = int(bits[0], 2)
-
-    return enabled == 1
-
-
-def time_x_priority(registers) -> str:
-    bits = bin(registers)[2:].zfill(16)
-    priority = int(bits[1:3], 2)
-    priority_mapping = {
-        0: 'Load',
-        1: 'Battery',
-        2: 'Grid'
-    }
+# Combined start and end register, the start register holds the upper 16 bits
+TIME_X_FIELDS = (
+    GrowattBitField(name="start_minutes", offset=16, width=8),
+    GrowattBitField(name="start_hour", offset=24, width=5),
+    GrowattBitField(name="priority", offset=29, width=2, mapping=TIME_PRIORITY_MAPPING),
+    GrowattBitField(name="enabled", offset=31, mapping={0: 'No', 1: 'Yes'}),
+    GrowattBitField(name="end_minutes", offset=0, width=8),
+    GrowattBitField(name="end_hour", offset=8, width=5),
+)
 
-    return priority_mapping.get(priority, 'Unknown')
 
+def timeX(fields) -> str:
+    return (
+        f"Start: {fields['start_hour']:02d}:{fields['start_minutes']:02d}, "
+        f"End: {fields['end_hour']:02d}:{fields['end_minutes']:02d}, "
+        f"Priority: {fields['priority']}, "
+        f"Enabled: {fields['enabled']}"
+    )
 
-def time_x_end(registers) -> str:
-    bits = bin(registers)[2:].zfill(16)
-    minutes = int(bits[9:15], 2)
-    hour = int(bits[3:8], 2)
 
-    return str(datetime.time(hour, minutes).isoformat(timespec='minutes'))
+def time_x(fields) -> str:
+    return f"{fields['hour']:02d}:{fields['minutes']:02d}"
 
 
 SERIAL_NUMBER_REGISTER = GrowattDeviceRegisters(
     name=ATTR_SERIAL_NUMBER, register=3001, value_type=str, length=15
 )
+MODEL_REGISTER = GrowattDeviceRegisters(
+    name=ATTR_INVERTER_MODEL,
+    register=28,
+    value_type=custom_function,
+    length=2,
+    function=model
+)
+MODBUS_VERSION_REGISTER = GrowattDeviceRegisters(
+    name=ATTR_MODBUS_VERSION,
+    register=88,
+    value_type=float,
+    scale=100
+)
+
+# Registers identifying the device, all within a single request. The full serial number at 3001 is read separately
+# as not every device has the 3000 range, those keep the short serial number at 23.
+IDENTIFICATION_REGISTERS: tuple[GrowattDeviceRegisters, ...] = (
+    FIRMWARE_REGISTER,
+    SHORT_SERIAL_NUMBER_REGISTER,
+    MODEL_REGISTER,
+    DEVICE_TYPE_CODE_REGISTER,
+    NUMBER_OF_TRACKERS_AND_PHASES_REGISTER,
+    MODBUS_VERSION_REGISTER,
+)
 
 HOLDING_REGISTERS: tuple[GrowattDeviceRegisters, ...] = (
     FIRMWARE_REGISTER,
     SERIAL_NUMBER_REGISTER,
-    GrowattDeviceRegisters(
-        name=ATTR_INVERTER_MODEL,
-        register=28,
-        value_type=custom_function,
-        length=2,
-        function=model
-    ),
+    MODEL_REGISTER,
     GrowattDeviceRegisters(
         name=ATTR_TIME_1,
         register=3038,
-        value_type=custom_function,
+        value_type=bit_field,
         length=2,
-        function=timeX
+        function=timeX,
+        fields=TIME_X_FIELDS
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_1_START,
         register=3038,
-        value_type=custom_function,
-        length=1,
-        function=time_x_start
+        value_type=bit_field,
+        function=time_x,
+        fields=(TIME_X_MINUTES, TIME_X_HOUR)
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_1_END,
         register=3039,
-        value_type=custom_function,
-        length=1,
-        function=time_x_end
+        value_type=bit_field,
+        function=time_x,
+        fields=(TIME_X_MINUTES, TIME_X_HOUR)
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_1_PRIORITY,
         register=3038,
-        value_type=custom_function,
-        length=1,
-        function=time_x_priority
+        value_type=bit_field,
+        fields=(TIME_X_PRIORITY,)
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_2,
         register=3040,
-        value_type=custom_function,
+        value_type=bit_field,
         length=2,
-        function=timeX
+        function=timeX,
+        fields=TIME_X_FIELDS
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_3,
         register=3042,
-        value_type=custom_function,
+        value_type=bit_field,
         length=2,
-        function=timeX
+        function=timeX,
+        fields=TIME_X_FIELDS
     ),
     GrowattDeviceRegisters(
         name=ATTR_TIME_4,
         register=3044,
-        value_type=custom_function,
+        value_type=bit_field,
         length=2,
-        function=timeX
+        function=timeX,
+        fields=TIME_X_FIELDS
     ),
     DEVICE_TYPE_CODE_REGISTER,
     NUMBER_OF_TRACKERS_AND_PHASES_REGISTER,
-    GrowattDeviceRegisters(
-        name=ATTR_MODBUS_VERSION,
-        register=88,
-        value_type=float,
-        scale=100
-    ),
+    MODBUS_VERSION_REGISTER,
     GrowattDeviceRegisters(
         name=ATTR_AC_CHARGE_ENABLED,
         register=3049,
@@ -387,64 +350,64 @@ INPUT_REGISTERS: tuple[GrowattDeviceRegisters, ...] = (
         name=ATTR_OUTPUT_3_POWER, register=48, value_type=float, length=2
     ),
     GrowattDeviceRegisters(
-        name=ATTR_OUTPUT_ENERGY_TODAY, register=53, value_type=float, length=2
+        name=ATTR_OUTPUT_ENERGY_TODAY, register=53, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_OUTPUT_ENERGY_TOTAL, register=55, value_type=float, length=2
+        name=ATTR_OUTPUT_ENERGY_TOTAL, register=55, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_OPERATION_HOURS, register=57, value_type=float, length=2, scale=7200,
+        name=ATTR_OPERATION_HOURS, register=57, value_type=float, length=2, monotonic=True, scale=7200,
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_1_ENERGY_TODAY, register=59, value_type=float, length=2
+        name=ATTR_INPUT_1_ENERGY_TODAY, register=59, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_1_ENERGY_TOTAL, register=61, value_type=float, length=2
+        name=ATTR_INPUT_1_ENERGY_TOTAL, register=61, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_2_ENERGY_TODAY, register=63, value_type=float, length=2
+        name=ATTR_INPUT_2_ENERGY_TODAY, register=63, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_2_ENERGY_TOTAL, register=65, value_type=float, length=2
+        name=ATTR_INPUT_2_ENERGY_TOTAL, register=65, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_3_ENERGY_TODAY, register=67, value_type=float, length=2
+        name=ATTR_INPUT_3_ENERGY_TODAY, register=67, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_3_ENERGY_TOTAL, register=69, value_type=float, length=2
+        name=ATTR_INPUT_3_ENERGY_TOTAL, register=69, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_4_ENERGY_TODAY, register=71, value_type=float, length=2
+        name=ATTR_INPUT_4_ENERGY_TODAY, register=71, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_4_ENERGY_TOTAL, register=73, value_type=float, length=2
+        name=ATTR_INPUT_4_ENERGY_TOTAL, register=73, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_5_ENERGY_TODAY, register=75, value_type=float, length=2
+        name=ATTR_INPUT_5_ENERGY_TODAY, register=75, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_5_ENERGY_TOTAL, register=77, value_type=float, length=2
+        name=ATTR_INPUT_5_ENERGY_TOTAL, register=77, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_6_ENERGY_TODAY, register=79, value_type=float, length=2
+        name=ATTR_INPUT_6_ENERGY_TODAY, register=79, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_6_ENERGY_TOTAL, register=81, value_type=float, length=2
+        name=ATTR_INPUT_6_ENERGY_TOTAL, register=81, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_7_ENERGY_TODAY, register=83, value_type=float, length=2
+        name=ATTR_INPUT_7_ENERGY_TODAY, register=83, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_7_ENERGY_TOTAL, register=85, value_type=float, length=2
+        name=ATTR_INPUT_7_ENERGY_TOTAL, register=85, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_8_ENERGY_TODAY, register=87, value_type=float, length=2
+        name=ATTR_INPUT_8_ENERGY_TODAY, register=87, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_8_ENERGY_TOTAL, register=89, value_type=float, length=2
+        name=ATTR_INPUT_8_ENERGY_TOTAL, register=89, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_INPUT_ENERGY_TOTAL, register=91, value_type=float, length=2
+        name=ATTR_INPUT_ENERGY_TOTAL, register=91, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(name=ATTR_TEMPERATURE, register=93, value_type=float),
     GrowattDeviceRegisters(name=ATTR_IPM_TEMPERATURE, register=94, value_type=float),
@@ -477,27 +440,27 @@ INPUT_REGISTERS: tuple[GrowattDeviceRegisters, ...] = (
         name=ATTR_CHARGE_POWER, register=3180, value_type=float, length=2
     ),
     GrowattDeviceRegisters(
-        name=ATTR_ENERGY_TO_USER_TODAY, register=3067, value_type=float, length=2
+        name=ATTR_ENERGY_TO_USER_TODAY, register=3067, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_ENERGY_TO_USER_TOTAL, register=3069, value_type=float, length=2
+        name=ATTR_ENERGY_TO_USER_TOTAL, register=3069, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_ENERGY_TO_GRID_TODAY, register=3071, value_type=float, length=2
+        name=ATTR_ENERGY_TO_GRID_TODAY, register=3071, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_ENERGY_TO_GRID_TOTAL, register=3073, value_type=float, length=2
+        name=ATTR_ENERGY_TO_GRID_TOTAL, register=3073, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_DISCHARGE_ENERGY_TODAY, register=3125, value_type=float, length=2
+        name=ATTR_DISCHARGE_ENERGY_TODAY, register=3125, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_DISCHARGE_ENERGY_TOTAL, register=3127, value_type=float, length=2
+        name=ATTR_DISCHARGE_ENERGY_TOTAL, register=3127, value_type=float, length=2, monotonic=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_CHARGE_ENERGY_TODAY, register=3129, value_type=float, length=2
+        name=ATTR_CHARGE_ENERGY_TODAY, register=3129, value_type=float, length=2, monotonic=True, daily_reset=True
     ),
     GrowattDeviceRegisters(
-        name=ATTR_CHARGE_ENERGY_TOTAL, register=3131, value_type=float, length=2
+        name=ATTR_CHARGE_ENERGY_TOTAL, register=3131, value_type=float, length=2, monotonic=True
     ),
 )
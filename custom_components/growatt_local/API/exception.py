@@ -1,10 +1,11 @@
 class ModbusException(Exception):
     """Raised when the Modbus communication has error."""
 
-    def __init__(self, status):
-        """Initialize."""
+    def __init__(self, status, exception_code: int | None = None):
+        """Initialize, with the exception code of the exception response if the device sent one."""
         super(ModbusException, self).__init__(status)
         self.status = status
+        self.exception_code = exception_code
 
 
 class ModbusPortException(ModbusException):
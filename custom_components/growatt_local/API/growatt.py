@@ -2,26 +2,36 @@
 Python wrapper for getting data asynchronously from Growatt inverters
 via serial usb RS232 connection and modbus RTU protocol.
 """
+import asyncio
 import json
 import logging
 import os
 import sys
+import threading
+import time
 from abc import abstractmethod
-from collections.abc import Sequence
-from datetime import datetime, timedelta
+from array import array
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from contextlib import contextmanager, suppress
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
 from typing import Any
 
 from pymodbus.client.serial import AsyncModbusSerialClient
 from pymodbus.client.tcp import AsyncModbusTcpClient
 from pymodbus.client.udp import AsyncModbusUdpClient
 from pymodbus.constants import Endian
+from pymodbus.exceptions import ConnectionException, ModbusIOException
 from pymodbus.framer.rtu_framer import ModbusRtuFramer
 from pymodbus.payload import BinaryPayloadBuilder, Endian
 from pymodbus.pdu import ModbusResponse
 
 from .device_type.base import (
     GrowattDeviceRegisters,
+    GrowattCatalog,
     GrowattDeviceInfo,
+    GrowattSnapshot,
     ATTR_DEVICE_TYPE_CODE,
     ATTR_FIRMWARE,
     ATTR_INVERTER_MODEL,
@@ -34,30 +44,264 @@ from .device_type.base import (
     ATTR_STATUS_CODE,
     inverter_status,
 )
-from .device_type.inverter import MAXIMUM_DATA_LENGTH, INPUT_REGISTERS, HOLDING_REGISTERS
+from .device_type.inverter import (
+    MAXIMUM_DATA_LENGTH,
+    INPUT_REGISTERS,
+    HOLDING_REGISTERS,
+    IDENTIFICATION_REGISTERS,
+    SERIAL_NUMBER_REGISTER,
+)
+from .const import ILLEGAL_DATA_ADDRESS, ILLEGAL_DATA_VALUE
 from .exception import ModbusException, ModbusPortException
+from .trace import TRACER
+from .metrics import GrowattBlockTiming, GrowattDeviceMetrics, GrowattTransportMetrics, REQUEST_PDU_SIZE
 from .utils import (
     get_keys_from_register,
-    get_all_keys_from_register,
     keys_sequences,
+    create_read_plan,
     process_registers,
-    LRUCache
+    registers_in_sequences,
+    split_keys,
+    encode_bit_fields,
+    LRUCache,
+    ReadPlan,
+    RegisterImage,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Serial settings of Growatt devices as baudrate, bytesize, parity and stopbits, the most common first
+SERIAL_SETTINGS = (
+    (9600, 8, "None", 1),
+    (115200, 8, "None", 1),
+    (19200, 8, "None", 1),
+    (38400, 8, "None", 1),
+    (57600, 8, "None", 1),
+    (9600, 8, "Even", 1),
+    (9600, 8, "None", 2),
+    (4800, 8, "None", 1),
+)
+
+# Bounds of the adaptive timeout of the probes of a unit scan, and its ratio to the slowest response seen
+MINIMUM_PROBE_TIMEOUT = 0.1
+PROBE_TIMEOUT_FACTOR = 5
+
+# Lower bound of the timeout of the optional serial number read of the identification
+MINIMUM_IDENTIFY_TIMEOUT = 0.5
+
+# Version of the dict returned by `GrowattDevice.profile`, a profile of another version is ignored
+PROFILE_VERSION = 2
+
+# Exception codes of a device that doesn't have the requested registers, other codes like busy are transient
+MISSING_REGISTER_CODES = (ILLEGAL_DATA_ADDRESS, ILLEGAL_DATA_VALUE)
+
+# Lower bound of the learned maximum block length, and the time (s) after which learned limits are tried again
+MINIMUM_BLOCK_LENGTH = 8
+LEARNED_EXPIRY = 7 * 24 * 3600
+
 
 class GrowattModbusBase:
     client: AsyncModbusTcpClient | AsyncModbusUdpClient | AsyncModbusSerialClient
+    _lock: asyncio.Lock | None = None
+    _metrics: GrowattTransportMetrics | None = None
+    _io_loop: asyncio.AbstractEventLoop | None = None
+    _io_thread: threading.Thread | None = None
+    framing_overhead: int = 3  # bytes of the frame around the PDU, unit and CRC for RTU
+    trace_name: str = "modbus"
+    # whether responses carry the transaction id of their request, only then requests can be outstanding concurrently
+    concurrent_requests: bool = False
 
     @abstractmethod
     def __init__(self):
         raise NotImplementedError("Needs to be override by sub class")
 
-    async def connect(self):
-        """Connecting the modbus device."""
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Lock serializing the transactions on the connection."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def metrics(self) -> GrowattTransportMetrics:
+        """Metrics of the transactions on the connection."""
+        if self._metrics is None:
+            self._metrics = GrowattTransportMetrics()
+        return self._metrics
+
+    def start_io_thread(self) -> None:
+        """
+        Runs the client on an event loop in a dedicated thread, the timing of the transactions no longer depends
+        on the load of the event loop of the caller. The caller keeps awaiting the requests on its own loop.
+        """
+        if self._io_loop is not None:
+            return
+
+        self._io_loop = asyncio.new_event_loop()
+        self._io_thread = threading.Thread(
+            target=self._io_loop.run_forever, name=f"growatt_local {self.trace_name}", daemon=True
+        )
+        self._io_thread.start()
+
+    async def stop_io_thread(self) -> None:
+        if self._io_loop is None:
+            return
+
+        loop, thread = self._io_loop, self._io_thread
+        self._io_loop = self._io_thread = None
+        loop.call_soon_threadsafe(loop.stop)
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        loop.close()
+
+    async def _io(self, request, *args, **kwargs):
+        """Awaits the request on the I/O thread when running, else on the loop of the caller."""
+        if self._io_loop is None:
+            return await request(*args, **kwargs)
+
+        async def run():
+            return await request(*args, **kwargs)
+
+        # cancelling the wrapped future cancels the request on the I/O loop as well
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(run(), self._io_loop))
+
+    def abort_transactions(self) -> None:
+        """
+        Drops the pending transactions and any partial received frame.
+        Used when a request got cancelled, preventing its late response to be taken as the response of the next request.
+        """
+        if (transaction := getattr(self.client, "transaction", None)) is not None:
+            for tid in list(transaction):
+                transaction.delTransaction(tid)
+
+        if (framer := getattr(self.client, "framer", None)) is not None and hasattr(framer, "resetFrame"):
+            framer.resetFrame()
+
+    def _abort(self) -> None:
+        """Aborts the pending transactions on the loop running the client."""
+        if self._io_loop is None:
+            self.abort_transactions()
+        else:
+            self._io_loop.call_soon_threadsafe(self.abort_transactions)
+
+    @contextmanager
+    def _limit(self, timeout: float | None) -> Iterator[None]:
+        """
+        Makes the client give up requests after the timeout without retries, the caller is expected to hold the
+        connection. The request isn't cancelled, the client drops the connection and with it the transactions
+        waiting for a response, so a late response can't be taken as the response of another request.
+        """
+        if timeout is None:
+            yield
+            return
+
+        params, comm_params = self.client.params, self.client.comm_params
+        retries, client_timeout = params.retries, comm_params.timeout_connect
+        params.retries, comm_params.timeout_connect = 0, timeout
+        try:
+            with self._timed_out():
+                yield
+        finally:
+            params.retries, comm_params.timeout_connect = retries, client_timeout
+
+    @contextmanager
+    def _timed_out(self) -> Iterator[None]:
+        """Raises the ModbusIOException of a timeout the client failed to raise itself."""
+        try:
+            yield
+        except AttributeError as error:
+            # pymodbus 3.5 fails closing a serial transport after a timeout, which is closed nonetheless
+            if self.client.connected:
+                raise
+            raise ModbusIOException("No response received") from error
+
+    async def _reconnect(self) -> None:
+        """Opens the connection the client dropped after a timeout right away, instead of its delayed reconnect."""
+        async def reconnect():
+            if not self.client.connected:
+                self.client.close()
+                await self.client.connect()
+
+        await self._io(reconnect)
+
+    async def probe(self, unit: int) -> bool:
+        """
+        Reads a single register, the caller is expected to hold the connection and to limit the request with `_limit`.
+        A ConnectionException is raised when the connection was dropped by the timeout of another request.
+        returns whether a valid frame was received, an exception response counts as well
+        """
+        try:
+            with self._timed_out():
+                await self._io(self.client.read_holding_registers, 0, 1, unit)
+        except ModbusIOException:
+            return False
+
+        return True
+
+    async def scan_units(
+            self,
+            units: Iterable[int] = range(1, 248),
+            timeout: float = 0.5,
+            concurrency: int = 1,
+    ) -> dict[int, GrowattDeviceInfo | None]:
+        """
+        Scans the unit addresses for devices, probing each address with a single register read without retries.
+        The timeout shrinks to a multiple of the slowest response once devices answer. Concurrent probes are
+        only useful on gateways handling multiple outstanding requests, like most Modbus TCP gateways, on other
+        transports the units are probed one at a time.
+
+        returns the responding units with their device information, None when it couldn't be read
+        """
+        found: list[int] = []
+        slowest = 0.0
+        semaphore = asyncio.Semaphore(concurrency if self.concurrent_requests else 1)
+        reconnecting = asyncio.Lock()
+
+        async def probe(unit: int) -> None:
+            nonlocal slowest
+            async with semaphore:
+                for attempt in range(2):
+                    async with reconnecting:
+                        await self._reconnect()
+                    started = time.monotonic()
+                    try:
+                        responded = await self.probe(unit)
+                    except ConnectionException:
+                        # the timeout of a concurrent probe dropped the connection, the unit is probed again
+                        if attempt:
+                            raise
+                        continue
+                    break
+
+                if responded:
+                    slowest = max(slowest, time.monotonic() - started)
+                    found.append(unit)
+                    self.client.comm_params.timeout_connect = min(
+                        timeout, max(MINIMUM_PROBE_TIMEOUT, PROBE_TIMEOUT_FACTOR * slowest)
+                    )
+
+        async with self.lock:
+            try:
+                with self._limit(timeout):
+                    await asyncio.gather(*(probe(unit) for unit in units))
+            finally:
+                await self._reconnect()
+
+        _LOGGER.info("Units %s responded", sorted(found))
+
+        results = {}
+        for unit in sorted(found):
+            try:
+                results[unit] = await self.identify(unit)
+            except (ModbusException, ModbusIOException, asyncio.TimeoutError, KeyError, TypeError):
+                _LOGGER.warning("Unable to read the device information of unit %d", unit, exc_info=True)
+                results[unit] = None
+
+        return results
+
+    async def connect(self) -> bool:
+        """Connecting the modbus device, returns whether the connection is open."""
         _LOGGER.info("GrowattDevice connect")
-        await self.client.connect()
+        return bool(await self._io(self.client.connect))
 
     def connected(self):
         _LOGGER.info("GrowattDevice connected")
@@ -65,7 +309,13 @@ class GrowattModbusBase:
 
     async def close(self):
         """Closing the modbus device connection."""
-        await self.client.close()
+        async def close():
+            # closing is synchronous as of pymodbus 3
+            if asyncio.iscoroutine(result := self.client.close()):
+                await result
+
+        await self._io(close)
+        await self.stop_io_thread()
 
     async def get_device_info(
             self,
@@ -79,14 +329,12 @@ class GrowattModbusBase:
 
         key_sequences = keys_sequences(get_keys_from_register(register), max_length)
 
-        register_values = {}
+        image = RegisterImage(register)
 
         for item in key_sequences:
-            register_values.update(
-                await self.read_holding_registers(start_index=item[0], length=item[1], unit=unit)
-            )
+            image.write(item[0], await self.read_holding_registers(start_index=item[0], length=item[1], unit=unit))
 
-        results = process_registers(register, register_values)
+        results = process_registers(register, image)
 
         device_info = GrowattDeviceInfo(
             serial_number=results[ATTR_SERIAL_NUMBER].replace("\x00", ""),
@@ -100,55 +348,149 @@ class GrowattModbusBase:
 
         return device_info
 
+    async def identify(self, unit: int) -> GrowattDeviceInfo:
+        """
+        Reads the device information in at most two requests, one for all identification registers and one for
+        the full serial number at 3001. A device without the 3000 range answers with an exception or not at all,
+        the timeout of that read is a multiple of the first one and the short serial number at 23 is used instead.
+        """
+        start = min(register.register for register in IDENTIFICATION_REGISTERS)
+        end = max(register.register + register.length for register in IDENTIFICATION_REGISTERS)
+
+        image = RegisterImage(IDENTIFICATION_REGISTERS)
+        started = time.monotonic()
+        image.write(start, await self.read_holding_registers(start_index=start, length=end - start, unit=unit))
+        timeout = max(MINIMUM_IDENTIFY_TIMEOUT, PROBE_TIMEOUT_FACTOR * (time.monotonic() - started))
+
+        results = process_registers(IDENTIFICATION_REGISTERS, image)
+        serial_number = results[ATTR_SERIAL_NUMBER].replace("\x00", "")
+
+        try:
+            registers = await self.read_holding_registers(
+                start_index=SERIAL_NUMBER_REGISTER.register,
+                length=SERIAL_NUMBER_REGISTER.length,
+                unit=unit,
+                timeout=timeout,
+            )
+        except (ModbusException, ModbusIOException):
+            _LOGGER.debug("Unit %d has no serial number at %d", unit, SERIAL_NUMBER_REGISTER.register)
+        else:
+            image = RegisterImage((SERIAL_NUMBER_REGISTER,))
+            image.write(SERIAL_NUMBER_REGISTER.register, registers)
+            serial_number = (
+                process_registers((SERIAL_NUMBER_REGISTER,), image)[ATTR_SERIAL_NUMBER].replace("\x00", "").strip()
+                or serial_number
+            )
+
+        return GrowattDeviceInfo(
+            serial_number=serial_number,
+            model=results[ATTR_INVERTER_MODEL],
+            firmware=results[ATTR_FIRMWARE].replace("\x00", ""),
+            mppt_trackers=results[ATTR_NUMBER_OF_TRACKERS_AND_PHASES][0],
+            grid_phases=results[ATTR_NUMBER_OF_TRACKERS_AND_PHASES][1],
+            modbus_version=results[ATTR_MODBUS_VERSION],
+            device_type=results[ATTR_DEVICE_TYPE_CODE]
+        )
+
     async def read_device_time(self, unit: int):
         """
         Read Growatt device time.
         """
         # TODO: update with dynamic register values
-        rhr = await self.client.read_holding_registers(45, 6, slave=unit)
-        if rhr.isError():
-            _LOGGER.debug("Modbus read failed for rhr")
-            raise ModbusException("Modbus read failed for rhr.")
-
-        return datetime(
-            rhr.register[0] + 2000,
-            rhr.register[1],
-            rhr.register[2],
-            rhr.register[3],
-            rhr.register[4],
-            rhr.register[5],
-        )
+        year, month, day, hour, minute, second = await self.read_holding_registers(45, 6, unit)
+
+        return datetime(year + 2000, month, day, hour, minute, second)
 
     async def write_device_time(
-            self, year: int, month: int, day: int, hour: int, minute: int, second: int
+            self, year: int, month: int, day: int, hour: int, minute: int, second: int, unit: int | None = None
     ):
         """Writing current date/time to device."""
         # TODO: test if it works with current asyc libary
         # TODO: update with dynamic register values
-        await self.client.write_register(45, year - 2000)
-        await self.client.write_register(46, month)
-        await self.client.write_register(47, day)
-        await self.client.write_register(48, hour)
-        await self.client.write_register(49, minute)
-        await self.client.write_register(50, second)
+        kwargs = {"slave": unit} if unit else {}
+        for register, value in enumerate((year - 2000, month, day, hour, minute, second), 45):
+            await self._execute("write", register, 1, self.client.write_register, register, value, **kwargs)
+
+    async def _execute(
+            self, kind: str, start: int, length: int, request, *args, timeout: float | None = None, **kwargs
+    ) -> ModbusResponse:
+        """
+        Executes the request while holding the connection and keeps the metrics of the transaction.
+        A timeout replaces the one of the client for this request, without retries.
+        """
+        metrics = self.metrics
+        metrics.waiting += 1
+        try:
+            with TRACER.span("queue", "transport", f"{self.trace_name} queue"):
+                await self.lock.acquire()
+        finally:
+            metrics.waiting -= 1
+
+        try:
+            metrics.request(REQUEST_PDU_SIZE + self.framing_overhead)
+            started = time.monotonic()
+            try:
+                with TRACER.span(kind, "transport", self.trace_name, start=start, length=length), self._limit(timeout):
+                    response = await self._io(request, *args, **kwargs)
+            except asyncio.CancelledError:
+                self._abort()
+                raise
+            except (asyncio.TimeoutError, ModbusIOException):
+                metrics.failure(timeout=True)
+                if timeout is not None:
+                    await self._reconnect()
+                raise
+            except ConnectionException:
+                metrics.failure(timeout=False)
+                raise
+        finally:
+            self.lock.release()
+
+        latency = time.monotonic() - started
+        if response.isError():
+            metrics.response(kind, start, length, latency, 2 + self.framing_overhead, response.exception_code)
+        else:
+            size = REQUEST_PDU_SIZE if kind == "write" else 2 + 2 * length
+            metrics.response(kind, start, length, latency, size + self.framing_overhead)
+
+        return response
 
     async def write_register(self, register, payload, unit) -> ModbusResponse:
         kwargs = {"slave": unit} if unit else {}
         builder = BinaryPayloadBuilder(byteorder=Endian.Big, wordorder=Endian.Big)
         builder.reset()
-        builder.add_16bit_int(payload)
+        builder.add_16bit_uint(payload & 0xFFFF)
         payload = builder.to_registers()
-        return await self.client.write_register(register, payload[0], **kwargs)
+        return await self._execute("write", register, 1, self.client.write_register, register, payload[0], **kwargs)
+
+    async def read_holding_registers(self, start_index, length, unit, timeout: float | None = None) -> list[int]:
+        data = await self._execute(
+            "holding", start_index, length, self.client.read_holding_registers, start_index, length, unit,
+            timeout=timeout,
+        )
 
-    async def read_holding_registers(self, start_index, length, unit) -> dict[int, int]:
-        data = await self.client.read_holding_registers(start_index, length, unit)
-        registers = {c: v for c, v in enumerate(data.registers, start_index)}
-        return registers
+        if data.isError():
+            _LOGGER.debug("Modbus read failed for holding registers %d-%d", start_index, start_index + length - 1)
+            raise ModbusException(
+                f"Modbus read failed for holding registers {start_index}-{start_index + length - 1}.",
+                getattr(data, "exception_code", None),
+            )
 
-    async def read_input_registers(self, start_index, length, unit) -> dict[int, int]:
-        data = await self.client.read_input_registers(start_index, length, unit)
-        registers = {c: v for c, v in enumerate(data.registers, start_index)}
-        return registers
+        return data.registers
+
+    async def read_input_registers(self, start_index, length, unit) -> list[int]:
+        data = await self._execute(
+            "input", start_index, length, self.client.read_input_registers, start_index, length, unit
+        )
+
+        if data.isError():
+            _LOGGER.debug("Modbus read failed for input registers %d-%d", start_index, start_index + length - 1)
+            raise ModbusException(
+                f"Modbus read failed for input registers {start_index}-{start_index + length - 1}.",
+                getattr(data, "exception_code", None),
+            )
+
+        return data.registers
 
 
 class GrowattNetwork(GrowattModbusBase):
@@ -162,7 +504,12 @@ class GrowattNetwork(GrowattModbusBase):
     ) -> None:
         """Initialize Network Growatt."""
 
+        self.trace_name = f"{network_type.lower()} {host}:{port if port else 502}"
+
         if network_type.lower() == "tcp":
+            # MBAP header including the unit, its transaction id matches the responses to the requests
+            self.framing_overhead = 7
+            self.concurrent_requests = True
             self.client = AsyncModbusTcpClient(
                 host,
                 port if port else 502,
@@ -191,8 +538,9 @@ class GrowattSerial(GrowattModbusBase):
             parity: str = "N",
             bytesize: int = 8,
             timeout: int = 3,
+            io_thread: bool = False,
     ) -> None:
-        """Initialize Serial Growatt."""
+        """Initialize Serial Growatt, optionally communicating from a dedicated I/O thread."""
 
         if sys.platform.startswith("win"):
             if not port.startswith("COM"):
@@ -208,6 +556,7 @@ class GrowattSerial(GrowattModbusBase):
                 _LOGGER.debug("Port %s is not available", port)
                 raise ModbusPortException(f"USB port {port} is not available")
 
+        self.trace_name = f"serial {port}"
         self.client = AsyncModbusSerialClient(
             port=port,
             framer=ModbusRtuFramer,
@@ -218,6 +567,9 @@ class GrowattSerial(GrowattModbusBase):
             timeout=timeout,
         )
 
+        if io_thread:
+            self.start_io_thread()
+
 
 class GrowattDevice:
     holding_register: tuple[GrowattDeviceRegisters, ...] = ()
@@ -226,10 +578,30 @@ class GrowattDevice:
 
     def __init__(self, GrowattModbusClient: GrowattModbusBase, unit: int) -> None:
         self.modbus = GrowattModbusClient
-        self._input_cache = LRUCache(10)
+        self._input_cache: LRUCache[frozenset[int], ReadPlan] = LRUCache(10)
+        self._holding_cache: LRUCache[frozenset[int], ReadPlan] = LRUCache(10)
         self.max_length = MAXIMUM_DATA_LENGTH
+        self.device_info: GrowattDeviceInfo | None = None
+        # keys of the registers the device answers with an illegal address exception, with the time learned
+        self.input_holes: dict[int, float] = {}
+        self.holding_holes: dict[int, float] = {}
+        self._max_length_learned: float | None = None
+        self._learned_expiry: float | None = None
         self.holding_register = HOLDING_REGISTERS
         self.input_register = INPUT_REGISTERS
+        self.input_image = RegisterImage(self.input_register)
+        self.holding_image = RegisterImage(self.holding_register)
+        self._input_fingerprints: dict[tuple[int, int], bytes] = {}
+        self._holding_fingerprints: dict[tuple[int, int], bytes] = {}
+        self._counters: dict[str, tuple[Any, date]] = {}
+        self._in_flight: dict[tuple[bool, int, int], asyncio.Task[list[int]]] = {}
+        self._waiters: Counter[asyncio.Task[list[int]]] = Counter()
+        self.device_metrics = GrowattDeviceMetrics()
+        self.catalog = GrowattCatalog(
+            (*(register.name for register in self.input_register),
+             *(register.name for register in self.holding_register),
+             ATTR_STATUS)
+        )
 
         self.unit = unit
 
@@ -239,17 +611,147 @@ class GrowattDevice:
     def connected(self):
         return self.modbus.connected()
 
+    @property
+    def metrics(self) -> GrowattTransportMetrics:
+        return self.modbus.metrics
+
+    @property
+    def trace_name(self) -> str:
+        return f"{self.modbus.trace_name} unit {self.unit}"
+
     async def close(self):
         await self.modbus.close()
 
     async def get_device_into(self) -> GrowattDeviceInfo:
-        return await self.modbus.get_device_info(self.holding_register, self.max_length, self.unit)
+        """
+        Reads the device information, the learned profile is reset when the firmware or modbus version
+        differs from the device information it was learned with.
+        """
+        device_info = await self.modbus.identify(self.unit)
+
+        if self.device_info is not None and (
+                (self.device_info.firmware, self.device_info.modbus_version)
+                != (device_info.firmware, device_info.modbus_version)
+        ):
+            _LOGGER.info(
+                "Firmware changed from %s to %s, resetting the learned profile",
+                self.device_info.firmware, device_info.firmware
+            )
+            self.reset_profile()
+
+        self.device_info = device_info
+        return device_info
+
+    def profile(self) -> dict[str, Any]:
+        """
+        Learned state of the device as JSON serializable dict: the device information, the maximum block length,
+        the registers the device doesn't have, the cached read plans and the block timing of the transport.
+        """
+        return {
+            "version": PROFILE_VERSION,
+            "device_info": None if self.device_info is None else asdict(self.device_info),
+            "max_length": self.max_length,
+            "max_length_learned": self._max_length_learned,
+            "input_holes": sorted(self.input_holes.items()),
+            "holding_holes": sorted(self.holding_holes.items()),
+            "plans": [
+                {"holding": plan.holding, "keys": sorted(keys), "blocks": [item for item, _ in plan.blocks]}
+                for cache in (self._input_cache, self._holding_cache)
+                # iterating the underlying dict, looking up entries reorders the cache
+                for keys, plan in cache.cache.items()
+            ],
+            "timing": [
+                [kind, start, length, timing.count, timing.average]
+                for (kind, start, length), timing in self.metrics.blocks.items()
+            ],
+        }
+
+    def load_profile(self, profile: dict[str, Any]) -> None:
+        """
+        Restores the state returned by `profile`, the read plans are rebuilt from their blocks.
+        Learned limits that expired are dropped together with the read plans.
+        raises ValueError, KeyError or TypeError for an invalid profile
+        """
+        if profile.get("version") != PROFILE_VERSION:
+            raise ValueError(f"Unsupported profile version {profile.get('version')}")
+
+        device_info = None if profile["device_info"] is None else GrowattDeviceInfo(**profile["device_info"])
+        max_length = int(profile["max_length"])
+        if not MINIMUM_BLOCK_LENGTH <= max_length <= MAXIMUM_DATA_LENGTH:
+            raise ValueError(f"Invalid maximum length {max_length}")
+        max_length_learned = profile["max_length_learned"]
+        input_holes = {int(key): float(learned) for key, learned in profile["input_holes"]}
+        holding_holes = {int(key): float(learned) for key, learned in profile["holding_holes"]}
+
+        plans = []
+        for item in profile["plans"]:
+            holding = bool(item["holding"])
+            registers = self.holding_register if holding else self.input_register
+            blocks = tuple((start, length) for start, length in item["blocks"])
+            plans.append((
+                holding,
+                frozenset(item["keys"]),
+                ReadPlan(holding, tuple((block, registers_in_sequences(registers, (block,))) for block in blocks)),
+            ))
+
+        self.reset_profile()
+        self.device_info = device_info
+        if max_length_learned is not None:
+            self.max_length = max_length
+            self._max_length_learned = float(max_length_learned)
+        self.input_holes.update(input_holes)
+        self.holding_holes.update(holding_holes)
+        self._update_expiry()
+        if self._expire_profile():
+            return
+
+        for holding, keys, plan in plans:
+            (self._holding_cache if holding else self._input_cache)[keys] = plan
+
+        for kind, start, length, count, average in profile["timing"]:
+            self.metrics.blocks.setdefault((kind, start, length), GrowattBlockTiming(count, average, average))
+
+    def reset_profile(self) -> None:
+        """Forgets the learned maximum block length, the registers the device doesn't have and the read plans."""
+        self.max_length = MAXIMUM_DATA_LENGTH
+        self._max_length_learned = None
+        self._learned_expiry = None
+        self.input_holes.clear()
+        self.holding_holes.clear()
+        self._input_cache.clear()
+        self._holding_cache.clear()
+
+    def _update_expiry(self) -> None:
+        learned = [*self.input_holes.values(), *self.holding_holes.values()]
+        if self._max_length_learned is not None:
+            learned.append(self._max_length_learned)
+        self._learned_expiry = min(learned) + LEARNED_EXPIRY if learned else None
+
+    def _expire_profile(self, now: float | None = None) -> bool:
+        """
+        Forgets the limits learned longer than the expiry ago, a device might have been busy while they were learned.
+        returns whether any limit expired
+        """
+        if self._learned_expiry is None or (now := time.time() if now is None else now) < self._learned_expiry:
+            return False
+
+        if self._max_length_learned is not None and now >= self._max_length_learned + LEARNED_EXPIRY:
+            self.max_length = MAXIMUM_DATA_LENGTH
+            self._max_length_learned = None
+        for holes in (self.input_holes, self.holding_holes):
+            for key in [key for key, learned in holes.items() if now >= learned + LEARNED_EXPIRY]:
+                del holes[key]
+
+        self._update_expiry()
+        self._input_cache.clear()
+        self._holding_cache.clear()
+        return True
 
     async def sync_time(self) -> timedelta:
         device_time = await self.modbus.read_device_time(self.unit)
         time = datetime.now()
         await self.modbus.write_device_time(
-            time.year, time.month, time.day, time.hour, time.minute, time.second
+            time.year, time.month, time.day, time.hour, time.minute, time.second, self.unit
         )
 
         return time - device_time
@@ -259,50 +761,299 @@ class GrowattDevice:
         Based on the given keys it will generate one or multiple requests to get the corrisponding results
         from the input registers from the device.
 
-        returns a dictionary of register name and value
+        returns a dictionary of register name and value for the registers of which the block changed
         """
         if len(keys) == 0:
             return {}
 
-        if (key_hash := hash(frozenset(keys))) not in self._input_cache:
-            key_sequences = keys_sequences(get_all_keys_from_register(self.input_register, keys), self.max_length)
-            self._input_cache[key_hash] = key_sequences
-        else:
-            key_sequences = self._input_cache[key_hash]
-
-        register_values = {}
-
-        for item in key_sequences:
-            register_values.update(
-                await self.modbus.read_input_registers(start_index=item[0], length=item[1], unit=self.unit)
-            )
-
-        return process_registers(self.input_register, register_values)
+        return await self.read_plan(self.plan(keys), self._input_fingerprints)
 
     async def update_holding(self, keys: set[int]) -> dict[str, Any]:
         """
         Based on the given keys it will generate one or multiple requests to get the corrisponding results
-        from the input registers from the device.
+        from the holding registers from the device.
 
-        returns a dictionary of register name and value
+        returns a dictionary of register name and value for the registers of which the block changed
         """
         if len(keys) == 0:
             return {}
 
-        if (key_hash := hash(frozenset(keys))) not in self._input_cache:
-            key_sequences = keys_sequences(get_all_keys_from_register(self.holding_register, keys), self.max_length)
-            self._input_cache[key_hash] = key_sequences
+        return await self.read_plan(self.plan(keys, holding=True), self._holding_fingerprints)
+
+    async def read_input_registers(self, start_index: int, length: int) -> list[int]:
+        return await self._read_registers(False, start_index, length)
+
+    async def read_holding_registers(self, start_index: int, length: int) -> list[int]:
+        return await self._read_registers(True, start_index, length)
+
+    async def _read_registers(self, holding: bool, start: int, length: int) -> list[int]:
+        """
+        Reads a block of registers, sharing the transaction of an in-flight read covering the same range.
+        A read waiting for its turn on the transport is in-flight as well, so overlapping reads of the
+        coordinator, entities and proxy arriving while the transport is busy end up as a single transaction.
+        """
+        end = start + length
+        for in_flight_key, task in self._in_flight.items():
+            in_flight_holding, in_flight_start, in_flight_end = in_flight_key
+            if task.done() or task.cancelling():
+                # a cancelled read is only removed once it finished, it can't be shared anymore
+                continue
+            if in_flight_holding == holding and in_flight_start <= start and end <= in_flight_end:
+                self.device_metrics.coalesced += 1
+                values = await self._join(in_flight_key, task)
+                return values[start - in_flight_start:end - in_flight_start]
+
+        read = self.modbus.read_holding_registers if holding else self.modbus.read_input_registers
+        key = (holding, start, end)
+        task = self._in_flight[key] = asyncio.create_task(read(start_index=start, length=length, unit=self.unit))
+
+        def finished(done: asyncio.Task[list[int]]) -> None:
+            # a cancelled read may already be replaced by a new read of the same range
+            if self._in_flight.get(key) is done:
+                del self._in_flight[key]
+
+        task.add_done_callback(finished)
+
+        return await self._join(key, task)
+
+    async def _join(self, key: tuple[bool, int, int], task: asyncio.Task[list[int]]) -> list[int]:
+        """Waits for a shared read, the read is only cancelled when all callers waiting for it are."""
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1:
+                if self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def plan(self, keys: set[int], holding: bool = False) -> ReadPlan:
+        """
+        Determines the read plan for the given keys of the input or holding registers, leaving out the registers
+        the device doesn't have. The result is cached as the set of requested keys hardly changes.
+        """
+        self._expire_profile()
+        cache = self._holding_cache if holding else self._input_cache
+
+        if (cache_key := frozenset(keys)) in cache:
+            self.device_metrics.plan_cache_hits += 1
         else:
-            key_sequences = self._input_cache[key_hash]
+            self.device_metrics.plan_cache_misses += 1
+            cache[cache_key] = self.create_plan(keys, holding)
 
-        register_values = {}
+        return cache[cache_key]
 
-        for item in key_sequences:
-            register_values.update(
-                await self.modbus.read_holding_registers(start_index=item[0], length=item[1], unit=self.unit)
+    def create_plan(self, keys: set[int], holding: bool = False) -> ReadPlan:
+        """
+        Determines the read plan like `plan` does, without caching it or counting it in the metrics.
+        Used to show the plan without affecting the planning of the updates.
+        """
+        holes = self.holding_holes if holding else self.input_holes
+        registers = self.holding_register if holding else self.input_register
+        # blocks never span a register the device doesn't have, it answers those with an exception
+        blocks = [
+            block
+            for group in split_keys(set(keys).difference(holes), holes.keys())
+            for block in create_read_plan(registers, set(group), self.max_length, holding).blocks
+        ]
+        return ReadPlan(holding, tuple(sorted(blocks, key=lambda block: block[0])))
+
+    async def read_plan(
+            self,
+            plan: ReadPlan,
+            fingerprints: dict[tuple[int, int], bytes] | None = None
+    ) -> dict[str, Any]:
+        """
+        Reads the blocks of the plan into the register image and decodes the registers they cover.
+        When fingerprints are given only the registers of the blocks of which the raw content changed
+        since the previous read with the same fingerprints are decoded.
+
+        returns a dictionary of register name and value
+        """
+        if plan.holding:
+            image, read = self.holding_image, self.read_holding_registers
+        else:
+            image, read = self.input_image, self.read_input_registers
+
+        changed = []
+
+        for item, registers in plan.blocks:
+            try:
+                values = await read(start_index=item[0], length=item[1])
+            except ModbusException as error:
+                if error.exception_code not in MISSING_REGISTER_CODES:
+                    raise
+                # the registers of the block are decoded again once the plans are adapted to the device
+                await self._learn_block(plan.holding, item, registers, error)
+                continue
+            image.write(item[0], values)
+
+            if fingerprints is None:
+                changed.append((item, None, registers))
+            elif fingerprints.get(item) != (fingerprint := array("H", values).tobytes()):
+                changed.append((item, fingerprint, registers))
+
+        # fingerprints are only stored once all blocks are read, a failing read leaves them to be decoded next time
+        results = {}
+        started = time.perf_counter()
+        with TRACER.span("decode", "device", self.trace_name, blocks=len(changed)):
+            for item, fingerprint, registers in changed:
+                if fingerprints is not None:
+                    fingerprints[item] = fingerprint
+                results.update(process_registers(registers, image))
+        self.device_metrics.decodes += len(changed)
+        self.device_metrics.decode_time += time.perf_counter() - started
+
+        today = date.today()
+
+        for item, fingerprint, registers in changed:
+            for register in registers:
+                if not register.monotonic or (value := results.get(register.name)) is None:
+                    continue
+
+                if not self._counter_plausible(register, value, today):
+                    # a counter going backwards is likely a glitch, the register is read again before publishing
+                    try:
+                        values = await read(start_index=register.register, length=register.length)
+                    except (ModbusException, ModbusIOException, asyncio.TimeoutError) as error:
+                        # the previous value is kept, forgetting the fingerprint decodes and checks the block
+                        # again next cycle, also when its content didn't change
+                        _LOGGER.warning(
+                            "Unable to confirm value %s for %s, keeping previous value %s: %s",
+                            value, register.name, self._counters[register.name][0], error or "timeout"
+                        )
+                        del results[register.name]
+                        if fingerprints is not None:
+                            fingerprints.pop(item, None)
+                        continue
+                    image.write(register.register, values)
+                    reread = process_registers((register,), image).get(register.name)
+                    self.modbus.metrics.rereads += 1
+
+                    if reread != value and not self._counter_plausible(register, reread, today):
+                        _LOGGER.warning(
+                            "Ignoring implausible value %s for %s, previous value %s",
+                            value, register.name, self._counters[register.name][0]
+                        )
+                        del results[register.name]
+                        continue
+
+                    results[register.name] = value = reread
+
+                self._counters[register.name] = (value, today)
+
+        return results
+
+    async def _learn_block(
+            self,
+            holding: bool,
+            item: tuple[int, int],
+            registers: tuple[GrowattDeviceRegisters, ...],
+            error: ModbusException,
+    ) -> None:
+        """
+        Reads the registers of a block the device answered with an illegal address exception one by one.
+        Registers answered with an illegal address exception twice are left out of the plans from now on, when
+        all registers answer the block was too long and the maximum block length is halved, down to the minimum.
+        Any other failure is raised without learning anything.
+        """
+        read = self.read_holding_registers if holding else self.read_input_registers
+        holes = self.holding_holes if holding else self.input_holes
+        missing = set()
+
+        async def is_missing(register: GrowattDeviceRegisters) -> bool:
+            try:
+                await read(start_index=register.register, length=register.length)
+            except ModbusException as register_error:
+                if register_error.exception_code not in MISSING_REGISTER_CODES:
+                    raise
+                return True
+            return False
+
+        for register in registers:
+            # a second read confirms the register is really missing
+            if await is_missing(register) and await is_missing(register):
+                missing.add(register.register)
+
+        now = time.time()
+        if missing:
+            _LOGGER.info(
+                "Device doesn't have the %s registers %s", "holding" if holding else "input", sorted(missing)
             )
+            holes.update(dict.fromkeys(missing, now))
+        elif item[1] > MINIMUM_BLOCK_LENGTH:
+            self.max_length = min(self.max_length, max(MINIMUM_BLOCK_LENGTH, item[1] // 2))
+            self._max_length_learned = now
+            _LOGGER.info("Device refused a block of %d registers, maximum block length %d", item[1], self.max_length)
+        else:
+            raise error
+
+        self._update_expiry()
+        self._input_cache.clear()
+        self._holding_cache.clear()
+
+    def _counter_plausible(self, register: GrowattDeviceRegisters, value: Any, today: date) -> bool:
+        """
+        Counters should never decrease, except for the daily counters which reset once the day changed.
+        """
+        if (previous := self._counters.get(register.name)) is None or value >= previous[0]:
+            return True
+
+        return register.daily_reset and previous[1] != today
+
+    async def stream(self, plan: ReadPlan, interval: float) -> AsyncIterator[GrowattSnapshot]:
+        """
+        Reads the plan every interval seconds and yields an immutable snapshot of the values after each read.
 
-        return process_registers(self.holding_register, register_values)
+        Reads are scheduled on fixed deadlines so the interval doesn't drift, deadlines that passed while
+        reading are skipped. A consumer slower than the interval doesn't queue snapshots but only receives
+        the latest one. Errors while reading end the stream. Once the stream is closed the pending read is
+        cancelled, use `contextlib.aclosing` to close it as soon as the consumer stops iterating.
+        """
+        loop = asyncio.get_running_loop()
+        available = asyncio.Event()
+        latest: GrowattSnapshot | None = None
+
+        async def poll() -> None:
+            nonlocal latest
+            values = GrowattSnapshot(self.catalog)
+            fingerprints: dict[tuple[int, int], bytes] = {}
+            deadline = loop.time()
+
+            while True:
+                values.update(await self.read_plan(plan, fingerprints))
+                latest = values.copy(frozen=True)
+                available.set()
+
+                deadline += interval
+                if (now := loop.time()) > deadline:
+                    deadline += (now - deadline) // interval * interval + interval
+                await asyncio.sleep(deadline - now)
+
+        task = asyncio.create_task(poll())
+        waiter: asyncio.Task | None = None
+
+        try:
+            while True:
+                waiter = asyncio.create_task(available.wait())
+                await asyncio.wait((waiter, task), return_when=asyncio.FIRST_COMPLETED)
+
+                if task.done():
+                    task.result()
+
+                available.clear()
+                yield latest
+        finally:
+            if waiter is not None:
+                waiter.cancel()
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
 
     def get_keys_by_name(self, names: Sequence[str]) -> set[int]:
         if ATTR_STATUS in names:
@@ -356,20 +1107,74 @@ class GrowattDevice:
         _LOGGER.info("Write response done")
         return data
 
+    async def write_bit_fields(self, register: GrowattDeviceRegisters, values: dict[str, Any]) -> None:
+        """
+        Writes the given bit field values of a bit field register.
+        The other bits are kept as they were last read from the device.
+        """
+        current = [self.holding_image.get(i) for i in range(register.register, register.register + register.length)]
+        if None in current:
+            current = await self.read_holding_registers(start_index=register.register, length=register.length)
+
+        payload = encode_bit_fields(register, values, current)
+
+        for i, item in enumerate(payload):
+            if item == current[i]:
+                continue
+            await self.write_register(register.register + i, item)
+            self.holding_image.write(register.register + i, (item,))
+
     async def read_holding_register(self, registers: tuple[GrowattDeviceRegisters, ...]) -> dict[str, Any]:
         _LOGGER.info("Read holding registers")
         key_sequences = keys_sequences(get_keys_from_register(registers), MAXIMUM_DATA_LENGTH)
-        register_values = {}
+        image = RegisterImage(registers)
 
         for item in key_sequences:
-            register_values.update(
-                await self.modbus.read_holding_registers(start_index=item[0], length=item[1], unit=self.unit)
-            )
+            values = await self.read_holding_registers(start_index=item[0], length=item[1])
+            image.write(item[0], values)
+            self.holding_image.write(item[0], values)
 
-        results = process_registers(registers, register_values)
+        results = process_registers(registers, image)
         _LOGGER.info("Read holding register response %s", json.dumps(results))
         return results
 
 
+async def detect_serial_settings(
+        port: str,
+        unit: int = 1,
+        settings: Sequence[tuple[int, int, str, int]] = SERIAL_SETTINGS,
+        timeout: float = 0.3,
+) -> tuple[int, int, str, int] | None:
+    """
+    Tries the serial settings in order until the device responds with a valid frame to a single register read.
+    A setting the port can't be opened with or that loses the connection counts as a setting without response.
+    returns the baudrate, bytesize, parity and stopbits the device responded to
+    """
+    for baudrate, bytesize, parity, stopbits in settings:
+        serial = GrowattSerial(port, baudrate, stopbits, parity, bytesize)
+        try:
+            try:
+                connected = await serial.connect()
+            except Exception:  # noqa: the serial driver raises its own errors for settings the port doesn't support
+                connected = False
+            if not connected:
+                _LOGGER.debug("Unable to open the port at %d baud %d%s%d", baudrate, bytesize, parity[:1], stopbits)
+                continue
+
+            try:
+                with serial._limit(timeout):
+                    responded = await serial.probe(unit)
+            except (ConnectionException, ModbusIOException):
+                _LOGGER.debug("Connection lost at %d baud %d%s%d", baudrate, bytesize, parity[:1], stopbits)
+                continue
+            if responded:
+                _LOGGER.info("Device responded at %d baud %d%s%d", baudrate, bytesize, parity[:1], stopbits)
+                return baudrate, bytesize, parity, stopbits
+        finally:
+            await serial.close()
+
+    return None
+
+
 async def get_device_info(device: GrowattModbusBase, unit: int) -> GrowattDeviceInfo | None:
-    return await device.get_device_info(HOLDING_REGISTERS, MAXIMUM_DATA_LENGTH, unit)
+    return await device.identify(unit)
@@ -0,0 +1,262 @@
+"""
+Rolling metrics of the Modbus transactions of a transport and of the processing of a device.
+"""
+from collections import Counter, deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+# Upper bounds in seconds of the transaction latency histogram buckets, the last bucket holds the rest
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LATENCY_WINDOW = 200
+
+# Size in bytes of a read or write single register request PDU
+REQUEST_PDU_SIZE = 5
+
+
+@dataclass
+class GrowattBlockTiming:
+    """Timing of the transactions of a single block, latency as exponential moving average."""
+
+    count: int = 0
+    last: float = 0.0
+    average: float = 0.0
+
+    def add(self, latency: float) -> None:
+        self.count += 1
+        self.last = latency
+        self.average = latency if self.count == 1 else self.average + (latency - self.average) / min(self.count, 20)
+
+
+class GrowattTransportMetrics:
+    """
+    Counters and latencies of the transactions on a transport, together with the duration of the update cycles.
+    Blocks are identified by the kind of request ("input", "holding" or "write"), start and length.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.transactions = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.exceptions = 0
+        self.exception_codes: Counter[int] = Counter()
+        self.rereads = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.blocks: dict[tuple[str, int, int], GrowattBlockTiming] = {}
+        self.waiting = 0
+        self.cycles = 0
+        self.dropped_cycles = 0
+        self.cycle_duration: float | None = None
+        self.cycle_interval: float | None = None
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def response(
+            self, kind: str, start: int, length: int, latency: float, size: int, exception_code: int | None = None
+    ) -> None:
+        """
+        Adds an answered transaction, size is the number of bytes received including the framing.
+        """
+        self.transactions += 1
+        self.bytes_in += size
+
+        if exception_code is not None:
+            self.exceptions += 1
+            self.exception_codes[exception_code] += 1
+
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+
+        self.latency_buckets[index] += 1
+        self.latency_sum += latency
+        self._latencies.append(latency)
+
+        if (block := self.blocks.get((kind, start, length))) is None:
+            block = self.blocks[(kind, start, length)] = GrowattBlockTiming()
+        block.add(latency)
+
+    def failure(self, timeout: bool) -> None:
+        """Adds a transaction that wasn't answered, either by a timeout or a lost connection."""
+        self.transactions += 1
+        if timeout:
+            self.timeouts += 1
+        else:
+            self.disconnects += 1
+
+    def request(self, size: int) -> None:
+        """Adds a sent request, size is the number of bytes send including the framing."""
+        self.bytes_out += size
+
+    def cycle(self, duration: float, interval: float | None, failed: bool = False) -> None:
+        """
+        Adds the duration of an update cycle and the interval it is scheduled at.
+        A failed cycle or a cycle taking longer than the interval counts as dropped.
+        """
+        self.cycles += 1
+        if failed or (interval and duration > interval):
+            self.dropped_cycles += 1
+        self.cycle_duration = duration
+        self.cycle_interval = interval
+
+    @property
+    def cycle_utilization(self) -> float | None:
+        """Fraction of the interval used by the last update cycle."""
+        if self.cycle_duration is None or not self.cycle_interval:
+            return None
+
+        return self.cycle_duration / self.cycle_interval
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        """Latency in seconds at the given percentile (0 - 100) of the most recent transactions."""
+        if not self._latencies:
+            return None
+
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(percentile / 100 * len(latencies)))]
+
+    def histogram(self) -> dict[str, int]:
+        """Cumulative latency histogram keyed by the upper bound of the bucket."""
+        result = {}
+        total = 0
+        for bound, count in zip((*LATENCY_BUCKETS, float("inf")), self.latency_buckets):
+            total += count
+            result[f"le_{bound:g}"] = total
+
+        return result
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "transactions": self.transactions,
+            "timeouts": self.timeouts,
+            "disconnects": self.disconnects,
+            "exceptions": self.exceptions,
+            "exception_codes": dict(self.exception_codes),
+            "rereads": self.rereads,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "latency_sum": self.latency_sum,
+            "latency_histogram": self.histogram(),
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "waiting": self.waiting,
+            "cycles": self.cycles,
+            "dropped_cycles": self.dropped_cycles,
+            "cycle_duration": self.cycle_duration,
+            "cycle_interval": self.cycle_interval,
+            "blocks": {
+                f"{kind} {start}-{start + length - 1}": {
+                    "count": block.count, "last": block.last, "average": block.average
+                }
+                for (kind, start, length), block in self.blocks.items()
+            },
+        }
+
+
+class GrowattDeviceMetrics:
+    """Counters of the processing of the values of a device, times in seconds."""
+
+    def __init__(self) -> None:
+        self.decodes = 0
+        self.decode_time = 0.0
+        self.plan_cache_hits = 0
+        self.plan_cache_misses = 0
+        self.coalesced = 0
+        self.dispatches = 0
+        self.dispatch_time = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "decodes": self.decodes,
+            "decode_time": self.decode_time,
+            "plan_cache_hits": self.plan_cache_hits,
+            "plan_cache_misses": self.plan_cache_misses,
+            "coalesced": self.coalesced,
+            "dispatches": self.dispatches,
+            "dispatch_time": self.dispatch_time,
+        }
+
+
+# name, type, help and value of the metric families with a single sample per device
+_PROMETHEUS_TRANSPORT = (
+    ("growatt_transactions_total", "counter", "Modbus transactions", lambda t: t.transactions),
+    ("growatt_transaction_timeouts_total", "counter", "Transactions without response", lambda t: t.timeouts),
+    ("growatt_transaction_disconnects_total", "counter", "Transactions failed on a lost connection",
+     lambda t: t.disconnects),
+    ("growatt_counter_rereads_total", "counter", "Counter registers read again as implausible", lambda t: t.rereads),
+    ("growatt_bytes_sent_total", "counter", "Bytes sent including framing", lambda t: t.bytes_out),
+    ("growatt_bytes_received_total", "counter", "Bytes received including framing", lambda t: t.bytes_in),
+    ("growatt_transport_queue_depth", "gauge", "Requests waiting for the transport", lambda t: t.waiting),
+    ("growatt_poll_cycles_total", "counter", "Update cycles", lambda t: t.cycles),
+    ("growatt_dropped_cycles_total", "counter", "Update cycles failed or exceeding the interval",
+     lambda t: t.dropped_cycles),
+    ("growatt_poll_cycle_duration_seconds", "gauge", "Duration of the last update cycle",
+     lambda t: t.cycle_duration),
+)
+_PROMETHEUS_DEVICE = (
+    ("growatt_decodes_total", "counter", "Decoded register blocks", lambda d: d.decodes),
+    ("growatt_decode_seconds_total", "counter", "Time spent decoding register blocks", lambda d: d.decode_time),
+    ("growatt_plan_cache_hits_total", "counter", "Read plans taken from the cache", lambda d: d.plan_cache_hits),
+    ("growatt_plan_cache_misses_total", "counter", "Read plans created", lambda d: d.plan_cache_misses),
+    ("growatt_coalesced_reads_total", "counter", "Reads sharing an in-flight transaction", lambda d: d.coalesced),
+    ("growatt_listener_dispatches_total", "counter", "Listener dispatches", lambda d: d.dispatches),
+    ("growatt_listener_dispatch_seconds_total", "counter", "Time spent dispatching to listeners",
+     lambda d: d.dispatch_time),
+)
+_LATENCY_BOUNDS = tuple(f"{bound:g}" for bound in LATENCY_BUCKETS) + ("+Inf",)
+
+
+def format_prometheus(sources: Sequence[tuple[str, GrowattTransportMetrics, GrowattDeviceMetrics]]) -> str:
+    """
+    Formats the metrics in the Prometheus text exposition format.
+    Sources are tuples of the label set (like 'serial="ABC"'), the transport and the device metrics.
+    """
+    lines: list[str] = []
+
+    for name, kind, description, value in _PROMETHEUS_TRANSPORT:
+        lines.append(f"# HELP {name} {description}\n# TYPE {name} {kind}")
+        for labels, transport, _ in sources:
+            if (sample := value(transport)) is not None:
+                lines.append(f"{name}{{{labels}}} {sample}")
+
+    for name, kind, description, value in _PROMETHEUS_DEVICE:
+        lines.append(f"# HELP {name} {description}\n# TYPE {name} {kind}")
+        for labels, _, device in sources:
+            lines.append(f"{name}{{{labels}}} {value(device)}")
+
+    lines.append(
+        "# HELP growatt_exception_responses_total Exception responses by exception code\n"
+        "# TYPE growatt_exception_responses_total counter"
+    )
+    for labels, transport, _ in sources:
+        for code, count in transport.exception_codes.items():
+            lines.append(f'growatt_exception_responses_total{{{labels},code="{code}"}} {count}')
+
+    lines.append(
+        "# HELP growatt_transaction_latency_seconds Latency of the answered transactions\n"
+        "# TYPE growatt_transaction_latency_seconds histogram"
+    )
+    for labels, transport, _ in sources:
+        total = 0
+        for bound, count in zip(_LATENCY_BOUNDS, transport.latency_buckets):
+            total += count
+            lines.append(f'growatt_transaction_latency_seconds_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f"growatt_transaction_latency_seconds_sum{{{labels}}} {transport.latency_sum}")
+        lines.append(f"growatt_transaction_latency_seconds_count{{{labels}}} {total}")
+
+    lines.append(
+        "# HELP growatt_block_latency_seconds Moving average latency per register block\n"
+        "# TYPE growatt_block_latency_seconds gauge"
+    )
+    for labels, transport, _ in sources:
+        for (kind, start, length), block in transport.blocks.items():
+            lines.append(
+                f'growatt_block_latency_seconds{{{labels},block="{kind} {start}-{start + length - 1}"}} {block.average}'
+            )
+
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,453 @@
+"""
+Poller owning the transport of a device in a process of its own, isolating the bus timing from the event loop
+of Home Assistant.
+
+The poller reads the configured keys on its own schedule and publishes the decoded values in a ring of slots in
+shared memory. Every published snapshot is announced with a line on stdout, which acts as the notification pipe
+of the reader. Commands of the reader (keys to poll, writes) are received as JSON lines on stdin and answered on
+stdout.
+
+Run standalone from the directory of the integration, without importing Home Assistant, with for example
+`python -m API.poller --tcp 192.168.1.2 502 --unit 1 --ring NAME`.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import struct
+import sys
+from collections.abc import Callable, Iterable
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from .device_type.base import ATTR_STATUS
+from .exception import ModbusException
+from .cli import add_transport_arguments, create_transport
+from .growatt import GrowattDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+# magic, version, number of slots, slot size and sequence of the last published snapshot
+RING_HEADER = struct.Struct("<4sBHIQ")
+RING_MAGIC = b"GWRG"
+RING_VERSION = 1
+# sequence of the snapshot in the slot, 0 while being written, and length of the payload
+SLOT_HEADER = struct.Struct("<QI")
+
+DEFAULT_SLOTS = 8
+DEFAULT_SLOT_SIZE = 16384
+
+COMMAND_TIMEOUT = 30
+
+
+class GrowattSnapshotRing:
+    """
+    Ring of snapshots in shared memory, written by a single process and read by another.
+
+    Every slot holds all values together with the names of the values changed since the previous snapshot.
+    A slot is cleared before it is written, the reader copies a slot and checks its sequence again afterwards,
+    detecting a slot overwritten while reading. A reader falling behind more than the number of slots
+    continues with the latest snapshot and treats all values as changed.
+    """
+
+    def __init__(self, memory: SharedMemory, slots: int, slot_size: int) -> None:
+        self.memory = memory
+        self.slots = slots
+        self.slot_size = slot_size
+        self._sequence = 0
+
+    @classmethod
+    def create(cls, slots: int = DEFAULT_SLOTS, slot_size: int = DEFAULT_SLOT_SIZE) -> "GrowattSnapshotRing":
+        memory = SharedMemory(create=True, size=RING_HEADER.size + slots * slot_size)
+        RING_HEADER.pack_into(memory.buf, 0, RING_MAGIC, RING_VERSION, slots, slot_size, 0)
+        return cls(memory, slots, slot_size)
+
+    @classmethod
+    def attach(cls, name: str) -> "GrowattSnapshotRing":
+        """Attaches to the ring created by another process, which remains responsible for removing it."""
+        memory = SharedMemory(name=name)
+        # the creating process unlinks the memory, the resource tracker would otherwise remove it on exit
+        resource_tracker.unregister(memory._name, "shared_memory")  # noqa
+
+        magic, version, slots, slot_size, sequence = RING_HEADER.unpack_from(memory.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            memory.close()
+            raise ValueError(f"Shared memory {name} doesn't hold a snapshot ring")
+
+        ring = cls(memory, slots, slot_size)
+        ring._sequence = sequence
+        return ring
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def sequence(self) -> int:
+        return RING_HEADER.unpack_from(self.memory.buf, 0)[4]
+
+    def _offset(self, sequence: int) -> int:
+        return RING_HEADER.size + (sequence % self.slots) * self.slot_size
+
+    def publish(self, values: dict[str, Any], changed: Iterable[str]) -> int:
+        """
+        Writes a snapshot into the next slot.
+        returns sequence of the snapshot
+        """
+        payload = json.dumps({"values": values, "changed": list(changed)}, default=str).encode()
+        if len(payload) > self.slot_size - SLOT_HEADER.size:
+            raise ValueError(f"Snapshot of {len(payload)} bytes doesn't fit in a slot of {self.slot_size} bytes")
+
+        sequence = self._sequence + 1
+        offset = self._offset(sequence)
+        buffer = self.memory.buf
+
+        SLOT_HEADER.pack_into(buffer, offset, 0, 0)
+        buffer[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(payload)] = payload
+        SLOT_HEADER.pack_into(buffer, offset, sequence, len(payload))
+        struct.pack_into("<Q", buffer, RING_HEADER.size - 8, sequence)
+
+        self._sequence = sequence
+        return sequence
+
+    def _read_slot(self, sequence: int) -> dict[str, Any] | None:
+        offset = self._offset(sequence)
+        buffer = self.memory.buf
+
+        slot_sequence, length = SLOT_HEADER.unpack_from(buffer, offset)
+        if slot_sequence != sequence:
+            return None
+
+        payload = bytes(buffer[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + length])
+        if SLOT_HEADER.unpack_from(buffer, offset)[0] != sequence:
+            return None
+
+        return json.loads(payload)
+
+    def read(self) -> tuple[dict[str, Any], set[str] | None] | None:
+        """
+        Reads the snapshots published since the previous read.
+        returns None when nothing was published, otherwise the latest values and the names of the values changed
+        since the previous read, the names are None when all values should be considered changed
+        """
+        latest = self.sequence
+        if latest == self._sequence:
+            return None
+
+        changed: set[str] | None = set()
+        if self._sequence == 0 or latest - self._sequence >= self.slots:
+            changed = None
+        else:
+            for sequence in range(self._sequence + 1, latest):
+                if (snapshot := self._read_slot(sequence)) is None:
+                    changed = None
+                    break
+                changed.update(snapshot["changed"])
+
+        while (snapshot := self._read_slot(latest)) is None:
+            # overwritten by a faster writer, continue with its latest snapshot
+            latest = self.sequence
+            changed = None
+
+        if changed is not None:
+            changed.update(snapshot["changed"])
+
+        self._sequence = latest
+        return snapshot["values"], changed
+
+    def close(self) -> None:
+        self.memory.close()
+
+    def unlink(self) -> None:
+        self.memory.unlink()
+
+
+class GrowattPoller:
+    """
+    Polls a device like the coordinator does, the input and holding keys every `ratio` ticks and the power keys
+    on the ticks in between, publishing the changed values after every tick.
+    """
+
+    def __init__(self, device: GrowattDevice, ring: GrowattSnapshotRing, notify: Callable[[str], None]) -> None:
+        self.device = device
+        self.ring = ring
+        self.notify = notify
+        self.keys: set[int] = set()
+        self.holding_keys: set[int] = set()
+        self.power_keys: set[int] = set()
+        self.interval = 60.0
+        self.ratio = 0
+        self.values: dict[str, Any] = {}
+        self._counter = 0
+        self._failed = False
+        self._wake = asyncio.Event()
+        self._configured = asyncio.Event()
+
+    def configure(
+            self, keys: Iterable[int], holding_keys: Iterable[int], power_keys: Iterable[int], interval: float, ratio: int
+    ) -> None:
+        self.keys = set(keys)
+        self.holding_keys = set(holding_keys)
+        self.power_keys = set(power_keys)
+        self.interval = interval
+        self.ratio = ratio
+        self._configured.set()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Reads all keys on the next tick, which starts right away."""
+        self._counter = self.ratio
+        self._wake.set()
+
+    async def tick(self) -> None:
+        status = None
+        data = {}
+
+        try:
+            if self._counter >= self.ratio or self._failed:
+                self._counter = 0
+                data = await self.device.update(self.keys)
+                data.update(await self.device.update_holding(self.holding_keys))
+            else:
+                self._counter += 1
+                data = await self.device.update(self.power_keys)
+            self._failed = False
+        except ConnectionException as error:
+            _LOGGER.warning("Poll failed: %s", error)
+            self._failed = True
+            status = "not_connected"
+        except (asyncio.TimeoutError, ModbusIOException) as error:
+            _LOGGER.warning("Poll failed: %s", error or "timeout")
+            self._failed = True
+            status = "no_response"
+        except ModbusException as error:
+            _LOGGER.warning("Poll failed: %s", error)
+            self._failed = True
+
+        self.values.update(data)
+
+        if status is None:
+            status = self.device.status(self.values)
+
+        if status and status != self.values.get(ATTR_STATUS):
+            self.values[ATTR_STATUS] = status
+            data[ATTR_STATUS] = status
+
+        if data:
+            self.notify(f"S {self.ring.publish(self.values, data)}")
+
+    async def run(self) -> None:
+        await self._configured.wait()
+
+        while True:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.interval
+            self._wake.clear()
+            await self.tick()
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def execute(self, command: dict[str, Any]) -> dict[str, Any]:
+        """Executes a command of the reader, returns the reply."""
+        operation = command.get("op")
+
+        if operation == "configure":
+            self.configure(
+                command["keys"], command["holding_keys"], command["power_keys"], command["interval"], command["ratio"]
+            )
+        elif operation == "refresh":
+            self.refresh()
+        elif operation == "write_register":
+            response = await self.device.write_register(command["register"], command["value"])
+            if response.isError():
+                return {"error": str(response)}
+            self.device.holding_image.write(command["register"], (command["value"],))
+        elif operation == "write_bit_fields":
+            await self.device.write_bit_fields(
+                self.device.get_holding_register_by_name(command["register"]), command["values"]
+            )
+        else:
+            return {"error": f"Unknown operation {operation}"}
+
+        return {}
+
+
+class GrowattPollerProcess:
+    """
+    Reader side of the poller, starts the poller process and takes the snapshots it publishes.
+    The `snapshot` callback is called on the event loop for every snapshot announced by the poller.
+    """
+
+    def __init__(
+            self,
+            arguments: list[str],
+            snapshot: Callable[[], None],
+            slots: int = DEFAULT_SLOTS,
+            slot_size: int = DEFAULT_SLOT_SIZE,
+    ) -> None:
+        self.arguments = arguments
+        self.snapshot = snapshot
+        self.ring = GrowattSnapshotRing.create(slots, slot_size)
+        self.process: asyncio.subprocess.Process | None = None
+        self._configuration: dict[str, Any] | None = None
+        self._requests: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._ids = itertools.count(1)
+        self._reader: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        # imported as top level API package, the package of the integration around it would import Home Assistant
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "API.poller", *self.arguments, "--ring", self.ring.name,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=Path(__file__).parents[1],
+        )
+        self._configuration = None
+        self._reader = asyncio.create_task(self._read(self.process))
+
+    async def _read(self, process: asyncio.subprocess.Process) -> None:
+        while line := await process.stdout.readline():
+            kind, _, content = line.decode().rstrip("\n").partition(" ")
+            if kind == "S":
+                self.snapshot()
+            elif kind == "R":
+                reply = json.loads(content)
+                if (future := self._requests.pop(reply.pop("id"), None)) is not None and not future.done():
+                    future.set_result(reply)
+
+        await process.wait()
+        if not self._stopping:
+            _LOGGER.error("Poller process exited with code %s", process.returncode)
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(ConnectionException("Poller process exited"))
+        self._requests.clear()
+
+    async def request(self, operation: str, **arguments: Any) -> None:
+        """Sends a command to the poller and waits for it to be executed."""
+        if not self.running:
+            raise ConnectionException("Poller process is not running")
+
+        request_id = next(self._ids)
+        future = self._requests[request_id] = asyncio.get_running_loop().create_future()
+        self.process.stdin.write(json.dumps({"id": request_id, "op": operation, **arguments}).encode() + b"\n")
+        await self.process.stdin.drain()
+
+        try:
+            reply = await asyncio.wait_for(future, COMMAND_TIMEOUT)
+        finally:
+            self._requests.pop(request_id, None)
+
+        if error := reply.get("error"):
+            raise ModbusException(error)
+
+    async def configure(
+            self, keys: set[int], holding_keys: set[int], power_keys: set[int], interval: float, ratio: int
+    ) -> None:
+        """Sends the keys to poll and the schedule, only when they changed since they were last sent."""
+        configuration = {
+            "keys": sorted(keys),
+            "holding_keys": sorted(holding_keys),
+            "power_keys": sorted(power_keys),
+            "interval": interval,
+            "ratio": ratio,
+        }
+        if configuration != self._configuration:
+            await self.request("configure", **configuration)
+            self._configuration = configuration
+
+    def take(self) -> tuple[dict[str, Any], set[str] | None] | None:
+        """Takes the values published since the previous call, see `GrowattSnapshotRing.read`."""
+        return self.ring.read()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self.running:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+        self.ring.close()
+        self.ring.unlink()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Growatt poller publishing snapshots in shared memory")
+    add_transport_arguments(parser)
+    parser.add_argument("--ring", required=True, help="name of the shared memory of the snapshot ring")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    modbus = create_transport(args)
+
+    def notify(line: str) -> None:
+        sys.stdout.write(f"{line}\n")
+        sys.stdout.flush()
+
+    async def run() -> bool:
+        ring = GrowattSnapshotRing.attach(args.ring)
+        device = GrowattDevice(modbus, args.unit)
+        poller = GrowattPoller(device, ring, notify)
+        await device.connect()
+
+        loop = asyncio.get_running_loop()
+        commands = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(commands), sys.stdin)
+
+        async def execute(command: dict[str, Any]) -> None:
+            try:
+                reply = await poller.execute(command)
+            except Exception as error:  # noqa: the reader waits for a reply to every command
+                _LOGGER.exception("Command %s failed", command.get("op"))
+                reply = {"error": str(error) or type(error).__name__}
+            notify(f"R {json.dumps({'id': command.get('id'), **reply})}")
+
+        tasks = set()
+
+        async def read_commands() -> None:
+            while line := await commands.readline():
+                task = asyncio.create_task(execute(json.loads(line)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        polling = asyncio.create_task(poller.run())
+        reading = asyncio.create_task(read_commands())
+        try:
+            # the poller stops once the reader closes stdin, or exits when polling failed so the reader restarts it
+            await asyncio.wait((polling, reading), return_when=asyncio.FIRST_COMPLETED)
+            if polling.done() and not polling.cancelled() and (error := polling.exception()) is not None:
+                _LOGGER.error("Polling stopped", exc_info=error)
+                return False
+            return True
+        finally:
+            polling.cancel()
+            reading.cancel()
+            await asyncio.gather(polling, reading, *tasks, return_exceptions=True)
+            await modbus.close()
+            ring.close()
+
+    if not asyncio.run(run()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
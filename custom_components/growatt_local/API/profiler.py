@@ -0,0 +1,134 @@
+"""
+Profiling of the update cycles for a limited number of cycles, with cProfile and tracemalloc snapshots.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+MEMORY_TOP = 50
+MEMORY_FRAMES = 10
+
+
+class GrowattProfiler:
+    """
+    Profiles the sections run within `section` until the given number of cycles completed.
+
+    Sections of several devices can overlap while awaiting the transport, the profiler stays enabled as long as
+    any section is active. Everything running on the event loop in the meantime is profiled as well, which shows
+    what else stalls the loop during an update.
+
+    cProfile only profiles the thread it was enabled on, sections and `stop` are to be used on the thread running
+    the event loop.
+    """
+
+    def __init__(self, cycles: int, memory: bool = True) -> None:
+        self.remaining = cycles
+        self.cycles = 0
+        self.memory = memory
+        self.started = time.time()
+        self._profile = cProfile.Profile()
+        self._active = 0
+        self._tracing = False
+        self._snapshot: tracemalloc.Snapshot | None = None
+
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+                self._tracing = True
+            self._snapshot = tracemalloc.take_snapshot()
+
+    @property
+    def done(self) -> bool:
+        return self.remaining <= 0
+
+    @property
+    def active(self) -> bool:
+        """Whether a section started before stopping is still running, keeping the profiler enabled."""
+        return self._active > 0
+
+    @contextmanager
+    def section(self) -> Iterator[None]:
+        if self.done:
+            yield
+            return
+
+        if self._active == 0:
+            self._profile.enable()
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if self._active == 0:
+                self._profile.disable()
+
+    def cycle(self) -> bool:
+        """
+        Marks the end of a cycle.
+        returns whether the last cycle completed
+        """
+        if self.done:
+            return False
+
+        self.cycles += 1
+        self.remaining -= 1
+        return self.done
+
+    def stop(self) -> None:
+        """Stops profiling, the profiler is disabled once the running sections are left."""
+        self.remaining = 0
+
+    def finish(self) -> tracemalloc.Snapshot | None:
+        """
+        Finishes profiling once stopped and no longer active, can run in any thread.
+        returns the memory snapshot at the end when tracing memory
+        """
+        if not self.done or self.active:
+            raise RuntimeError("Profiler is still running")
+
+        if not self.memory:
+            return None
+
+        snapshot = tracemalloc.take_snapshot()
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+        return snapshot
+
+    def write(self, directory: str, snapshot: tracemalloc.Snapshot | None = None) -> list[str]:
+        """
+        Writes the profile as .prof file together with text reports of the profile and memory allocations.
+        returns list of written files
+        """
+        base = os.path.join(directory, f"growatt_local_profile_{time.strftime('%Y%m%d_%H%M%S')}")
+        files = [f"{base}.prof", f"{base}.txt"]
+
+        self._profile.dump_stats(files[0])
+
+        report = io.StringIO()
+        report.write(f"Profile of {self.cycles} update cycles\n\n")
+        stats = pstats.Stats(self._profile, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(50)
+        with open(files[1], "w") as file:
+            file.write(report.getvalue())
+
+        if snapshot is not None and self._snapshot is not None:
+            files.append(f"{base}_memory.txt")
+            with open(files[2], "w") as file:
+                file.write(f"Memory allocated during {self.cycles} update cycles, top {MEMORY_TOP} by line\n\n")
+                for statistic in snapshot.compare_to(self._snapshot, "lineno")[:MEMORY_TOP]:
+                    file.write(f"{statistic}\n")
+
+                file.write(f"\nTop {MEMORY_TOP} by traceback\n\n")
+                for statistic in snapshot.compare_to(self._snapshot, "traceback")[:MEMORY_TOP // 5]:
+                    file.write(f"{statistic}\n")
+                    file.writelines(f"    {line}\n" for line in statistic.traceback.format())
+
+        return files
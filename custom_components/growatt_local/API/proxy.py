@@ -0,0 +1,154 @@
+"""
+Modbus proxy answering requests of other local consumers from the register image of a device.
+
+Reads of registers in the image that are younger than the maximum age are answered without touching the device,
+other reads are forwarded over the transport of the device, waiting for its turn like the requests of the
+integration itself. Writes are only relayed for the allowed registers.
+"""
+import asyncio
+import logging
+import struct
+import time
+from collections.abc import Collection
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from .exception import ModbusException
+from .growatt import GrowattDevice
+from .const import (
+    READ_HOLDING_REGISTERS,
+    READ_INPUT_REGISTERS,
+    WRITE_SINGLE_REGISTER,
+    WRITE_MULTIPLE_REGISTERS,
+    ILLEGAL_FUNCTION,
+    ILLEGAL_DATA_ADDRESS,
+    ILLEGAL_DATA_VALUE,
+    SLAVE_DEVICE_FAILURE,
+    GATEWAY_TARGET_FAILED,
+)
+from .server import (
+    ModbusTcpServer,
+    exception_response,
+    read_response,
+)
+from .utils import RegisterImage
+
+_LOGGER = logging.getLogger(__name__)
+
+MAXIMUM_READ_LENGTH = 125
+
+
+def parse_register_ranges(value: str) -> set[int]:
+    """
+    Parses a comma separated list of registers and inclusive register ranges like "3049, 3038-3045".
+    """
+    registers = set()
+    for item in value.split(","):
+        if not (item := item.strip()):
+            continue
+
+        start, _, end = item.partition("-")
+        first = int(start)
+        last = int(end) if end else first
+        if not 0 <= first <= last <= 0xFFFF:
+            raise ValueError(f"Invalid register range {item}")
+
+        registers.update(range(first, last + 1))
+
+    return registers
+
+
+class GrowattModbusProxy:
+    """Answers Modbus requests on behalf of a device, served on Modbus TCP with `start`."""
+
+    def __init__(
+            self,
+            device: GrowattDevice,
+            max_age: float,
+            writable: Collection[int] = (),
+            host: str = "127.0.0.1",
+            port: int = 502,
+    ) -> None:
+        self.device = device
+        self.max_age = max_age
+        self.writable = frozenset(writable)
+        self.hits = 0
+        self.misses = 0
+        self.server = ModbusTcpServer(self.handle, host, port)
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    async def handle(self, unit: int, pdu: bytes) -> bytes | None:
+        """Answers a request, the server only passes requests of which the size matches the function code."""
+        if unit not in (0, self.device.unit):
+            return None
+
+        function = pdu[0]
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            return await self._read(function, *struct.unpack(">HH", pdu[1:5]))
+
+        if function == WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack(">HH", pdu[1:5])
+            return await self._write(function, address, (value,), pdu[:5])
+
+        if function == WRITE_MULTIPLE_REGISTERS:
+            address, count = struct.unpack(">HH", pdu[1:5])
+            values = struct.unpack(f">{count}H", pdu[6:6 + 2 * count])
+            return await self._write(function, address, values, pdu[:5])
+
+        return exception_response(function, ILLEGAL_FUNCTION)
+
+    def _cached(self, image: RegisterImage, address: int, count: int) -> list[int] | None:
+        now = time.monotonic()
+        values = []
+        for key in range(address, address + count):
+            if (age := image.age(key, now)) is None or age > self.max_age:
+                return None
+            values.append(image.get(key))
+
+        return values
+
+    async def _read(self, function: int, address: int, count: int) -> bytes:
+        if not 0 < count <= MAXIMUM_READ_LENGTH:
+            return exception_response(function, ILLEGAL_DATA_VALUE)
+
+        if function == READ_HOLDING_REGISTERS:
+            image, read = self.device.holding_image, self.device.read_holding_registers
+        else:
+            image, read = self.device.input_image, self.device.read_input_registers
+
+        if (values := self._cached(image, address, count)) is not None:
+            self.hits += 1
+            return read_response(function, values)
+
+        self.misses += 1
+        try:
+            values = await read(start_index=address, length=count)
+        except ModbusException as error:
+            # relay the refusal of the device, a response that isn't a refusal is a failure of the device
+            return exception_response(function, error.exception_code or SLAVE_DEVICE_FAILURE)
+        except (asyncio.TimeoutError, ModbusIOException, ConnectionException):
+            return exception_response(function, GATEWAY_TARGET_FAILED)
+
+        image.write(address, values)
+        return read_response(function, values)
+
+    async def _write(self, function: int, address: int, values: tuple[int, ...], response: bytes) -> bytes:
+        if not all(key in self.writable for key in range(address, address + len(values))):
+            _LOGGER.warning("Refused proxied write to registers %d-%d", address, address + len(values) - 1)
+            return exception_response(function, ILLEGAL_DATA_ADDRESS)
+
+        try:
+            for offset, value in enumerate(values):
+                result = await self.device.write_register(address + offset, value)
+                if result.isError():
+                    return exception_response(function, SLAVE_DEVICE_FAILURE)
+                self.device.holding_image.write(address + offset, (value,))
+        except (asyncio.TimeoutError, ModbusIOException, ConnectionException):
+            return exception_response(function, GATEWAY_TARGET_FAILED)
+
+        return response
@@ -0,0 +1,229 @@
+"""
+Minimal asyncio Modbus server for TCP and for RTU over a pseudo terminal.
+
+The servers only take care of the framing, every request PDU is passed together with the unit to
+the handler which returns the response PDU or None when the request shouldn't be answered. Requests of
+which the size doesn't match their function code are answered with an illegal data value exception
+without passing them to the handler.
+"""
+import asyncio
+import logging
+import os
+import struct
+from collections.abc import Awaitable, Callable
+
+from .const import (
+    READ_HOLDING_REGISTERS,
+    READ_INPUT_REGISTERS,
+    WRITE_SINGLE_REGISTER,
+    WRITE_MULTIPLE_REGISTERS,
+    ILLEGAL_FUNCTION,
+    ILLEGAL_DATA_ADDRESS,
+    ILLEGAL_DATA_VALUE,
+    SLAVE_DEVICE_FAILURE,
+    GATEWAY_TARGET_FAILED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+ModbusHandler = Callable[[int, bytes], Awaitable[bytes | None]]
+
+# Largest PDU of a Modbus request
+MAXIMUM_PDU_SIZE = 253
+MAXIMUM_WRITE_COUNT = 123
+
+# Requests a TCP server handles at the same time, reading further requests waits until one completes
+MAXIMUM_PENDING = 16
+# Frames waiting for the RTU server, frames beyond are dropped like a busy device on a bus would
+MAXIMUM_QUEUED = 16
+
+
+def crc16(frame: bytes) -> int:
+    """Modbus RTU CRC of the given frame."""
+    crc = 0xFFFF
+    for byte in frame:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def exception_response(function: int, code: int) -> bytes:
+    return struct.pack(">BB", function | 0x80, code)
+
+
+def read_response(function: int, values) -> bytes:
+    return struct.pack(f">BB{len(values)}H", function, 2 * len(values), *values)
+
+
+def request_valid(pdu: bytes) -> bool:
+    """Whether the size of the request PDU matches its function code, PDUs of other functions are passed on."""
+    if not 0 < len(pdu) <= MAXIMUM_PDU_SIZE:
+        return False
+
+    function = pdu[0]
+    if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, WRITE_SINGLE_REGISTER):
+        return len(pdu) == 5
+    if function == WRITE_MULTIPLE_REGISTERS:
+        if len(pdu) < 6:
+            return False
+        count = struct.unpack(">H", pdu[3:5])[0]
+        return 0 < count <= MAXIMUM_WRITE_COUNT and pdu[5] == 2 * count and len(pdu) == 6 + 2 * count
+
+    return True
+
+
+async def handle_request(handler: ModbusHandler, unit: int, pdu: bytes) -> bytes | None:
+    if not request_valid(pdu):
+        _LOGGER.debug("Malformed request %s", pdu.hex())
+        return exception_response(pdu[0], ILLEGAL_DATA_VALUE)
+
+    return await handler(unit, pdu)
+
+
+class ModbusTcpServer:
+    """Modbus TCP server, a port of 0 binds to a free port."""
+
+    def __init__(self, handler: ModbusHandler, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._responses: set[asyncio.Task] = set()
+        self._pending = asyncio.Semaphore(MAXIMUM_PENDING)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        _LOGGER.info("Modbus TCP server listening on %s:%d", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+
+        self._server.close()
+        # closing the connections ends their tasks, cancelling them would upset the stream callback
+        for writer in self._connections.values():
+            writer.close()
+        for task in self._responses:
+            task.cancel()
+        await asyncio.gather(*self._connections, *self._responses, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[asyncio.current_task()] = writer
+        lock = asyncio.Lock()
+
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                tid, pid, length, unit = struct.unpack(">HHHB", header)
+                if length < 2:
+                    # there is no function code to answer an exception for, the stream can't be trusted anymore
+                    _LOGGER.debug("Invalid MBAP length %d, closing the connection", length)
+                    break
+                pdu = await reader.readexactly(length - 1)
+                # requests are handled concurrently like a gateway would, the responses carry the transaction id
+                await self._pending.acquire()
+                task = asyncio.create_task(self._respond(writer, lock, tid, pid, unit, pdu))
+                self._responses.add(task)
+                task.add_done_callback(self._responses.discard)
+                task.add_done_callback(lambda _: self._pending.release())
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(
+            self, writer: asyncio.StreamWriter, lock: asyncio.Lock, tid: int, pid: int, unit: int, pdu: bytes
+    ) -> None:
+        if (response := await handle_request(self.handler, unit, pdu)) is None or writer.is_closing():
+            return
+
+        async with lock:
+            writer.write(struct.pack(">HHHB", tid, pid, len(response) + 1, unit) + response)
+            await writer.drain()
+
+
+class ModbusRtuPtyServer:
+    """
+    Modbus RTU server on a pseudo terminal, the path of the terminal to connect a serial client to is given by port.
+    Requests are answered one at a time like on a RS485 bus.
+    """
+
+    def __init__(self, handler: ModbusHandler) -> None:
+        self.handler = handler
+        self.port: str | None = None
+        self._master: int | None = None
+        self._slave: int | None = None
+        self._buffer = bytearray()
+        self._queue: asyncio.Queue[tuple[int, bytes]] = asyncio.Queue(MAXIMUM_QUEUED)
+        self._worker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        # pseudo terminals are only available on Unix
+        import tty
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+
+        asyncio.get_running_loop().add_reader(self._master, self._read)
+        self._worker = asyncio.create_task(self._work())
+        _LOGGER.info("Modbus RTU server listening on %s", self.port)
+
+    async def stop(self) -> None:
+        if self._master is None:
+            return
+
+        asyncio.get_running_loop().remove_reader(self._master)
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        os.close(self._master)
+        os.close(self._slave)
+        self._master = self._slave = None
+
+    def _read(self) -> None:
+        try:
+            self._buffer += os.read(self._master, 1024)
+        except BlockingIOError:
+            return
+
+        while len(self._buffer) >= 8:
+            function = self._buffer[1]
+            if function == WRITE_MULTIPLE_REGISTERS:
+                length = 9 + self._buffer[6]
+            else:
+                length = 8
+
+            if len(self._buffer) < length:
+                return
+
+            frame = bytes(self._buffer[:length])
+            if crc16(frame[:-2]) != struct.unpack("<H", frame[-2:])[0]:
+                # out of sync, skip a byte until a valid frame is found
+                del self._buffer[0]
+                continue
+
+            del self._buffer[:length]
+            try:
+                self._queue.put_nowait((frame[0], frame[1:-2]))
+            except asyncio.QueueFull:
+                _LOGGER.debug("Dropped a request, %d requests are waiting", MAXIMUM_QUEUED)
+
+    async def _work(self) -> None:
+        while True:
+            unit, pdu = await self._queue.get()
+            if (response := await handle_request(self.handler, unit, pdu)) is None:
+                continue
+
+            frame = bytes((unit,)) + response
+            os.write(self._master, frame + struct.pack("<H", crc16(frame)))
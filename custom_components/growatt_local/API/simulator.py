@@ -0,0 +1,461 @@
+"""
+Simulated Growatt inverter serving the register map over Modbus TCP or RTU on a pseudo terminal.
+
+The values follow a diurnal power curve with counters that only increase and daily counters that
+reset at midnight. Faults like latency, timeouts, illegal address ranges, block size limits and
+dropped frames can be injected to reproduce problematic devices.
+
+Run from the directory of the integration, without importing Home Assistant:
+
+    cd custom_components/growatt_local
+    python -m API.simulator --tcp 5020 --rtu --time-scale 60
+"""
+import argparse
+import asyncio
+import logging
+import math
+import random
+import struct
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from .device_type.base import (
+    GrowattDeviceRegisters,
+    bit_field,
+    custom_function,
+    ATTR_FIRMWARE,
+    ATTR_SERIAL_NUMBER,
+    ATTR_INVERTER_MODEL,
+    ATTR_DEVICE_TYPE_CODE,
+    ATTR_NUMBER_OF_TRACKERS_AND_PHASES,
+    ATTR_MODBUS_VERSION,
+    ATTR_STATUS_CODE,
+    ATTR_DERATING_MODE,
+    ATTR_FAULT_CODE,
+    ATTR_WARNING_CODE,
+    ATTR_INPUT_POWER,
+    ATTR_INPUT_ENERGY_TOTAL,
+    ATTR_OUTPUT_POWER,
+    ATTR_OUTPUT_ENERGY_TODAY,
+    ATTR_OUTPUT_ENERGY_TOTAL,
+    ATTR_OPERATION_HOURS,
+    ATTR_FREQUENCY,
+    ATTR_TEMPERATURE,
+    ATTR_IPM_TEMPERATURE,
+    ATTR_BOOST_TEMPERATURE,
+    ATTR_P_BUS_VOLTAGE,
+    ATTR_N_BUS_VOLTAGE,
+    ATTR_OUTPUT_PERCENTAGE,
+    ATTR_SOC_PERCENTAGE,
+    ATTR_DISCHARGE_POWER,
+    ATTR_CHARGE_POWER,
+    ATTR_ENERGY_TO_USER_TODAY,
+    ATTR_ENERGY_TO_USER_TOTAL,
+    ATTR_ENERGY_TO_GRID_TODAY,
+    ATTR_ENERGY_TO_GRID_TOTAL,
+    ATTR_DISCHARGE_ENERGY_TODAY,
+    ATTR_DISCHARGE_ENERGY_TOTAL,
+    ATTR_CHARGE_ENERGY_TODAY,
+    ATTR_CHARGE_ENERGY_TOTAL,
+    ATTR_AC_CHARGE_ENABLED,
+    ATTR_TIME_1,
+)
+from .device_type.inverter import INPUT_REGISTERS, HOLDING_REGISTERS
+from .const import (
+    READ_HOLDING_REGISTERS,
+    READ_INPUT_REGISTERS,
+    WRITE_SINGLE_REGISTER,
+    WRITE_MULTIPLE_REGISTERS,
+    ILLEGAL_FUNCTION,
+    ILLEGAL_DATA_ADDRESS,
+    ILLEGAL_DATA_VALUE,
+)
+from .server import (
+    ModbusTcpServer,
+    ModbusRtuPtyServer,
+    exception_response,
+    read_response,
+)
+from .utils import encode_bit_fields
+
+_LOGGER = logging.getLogger(__name__)
+
+SUNRISE_HOUR = 6.0
+SUNSET_HOUR = 20.0
+HOUSE_LOAD = 800.0  # W
+BATTERY_CAPACITY = 10000.0  # Wh
+BATTERY_POWER = 2500.0  # W
+
+
+@dataclass
+class SimulatorFaults:
+    """
+    Faults injected by the simulator.
+    Holes are tuples of start address and length answered with an illegal data address exception.
+    """
+
+    latency: float = 0.0  # s added to every response
+    jitter: float = 0.0  # s random latency added on top
+    timeout_rate: float = 0.0  # probability a response is delayed by the timeout delay
+    timeout_delay: float = 5.0  # s
+    drop_rate: float = 0.0  # probability a request is never answered
+    input_holes: tuple[tuple[int, int], ...] = ()
+    holding_holes: tuple[tuple[int, int], ...] = ()
+    max_block_length: int = 125
+    sleep_at_night: bool = False  # no response at all while there is no sun
+
+
+def encode_register(register: GrowattDeviceRegisters, value: Any) -> list[int]:
+    """
+    Encodes a value into the register values of the register config, the inverse of `process_registers`.
+    Values of custom function registers are taken as raw register value or list of register values.
+    """
+    if register.value_type == str:
+        data = value.encode("latin-1").ljust(2 * register.length, b"\x00")[:2 * register.length]
+        return list(struct.unpack(f">{register.length}H", data))
+
+    if register.value_type == bit_field:
+        return encode_bit_fields(register, value)
+
+    if register.value_type == float:
+        raw = round(value * register.scale)
+    elif register.value_type == custom_function and isinstance(value, (list, tuple)):
+        return list(value)
+    else:
+        raw = int(value)
+
+    return [(raw >> (16 * i)) & 0xFFFF for i in reversed(range(register.length))]
+
+
+class GrowattSimulator:
+    """
+    Simulated Growatt inverter with a battery.
+    The simulated time runs time_scale times faster than the real time, starting at the given start.
+    """
+
+    def __init__(
+            self,
+            unit: int = 1,
+            serial_number: str = "SIM0000001",
+            peak_power: float = 5000.0,
+            trackers: int = 2,
+            phases: int = 1,
+            time_scale: float = 1.0,
+            start: datetime | None = None,
+            seed: int | None = None,
+            faults: SimulatorFaults | None = None,
+    ) -> None:
+        self.unit = unit
+        self.peak_power = peak_power
+        self.trackers = trackers
+        self.phases = phases
+        self.time_scale = time_scale
+        self.faults = faults or SimulatorFaults()
+        self.requests = 0
+
+        self._random = random.Random(seed)
+        self._start = start or datetime.now()
+        self._started = time.monotonic()
+        self._input = array("H", bytes(2 * 0x10000))
+        self._holding = array("H", bytes(2 * 0x10000))
+        self._input_registers = {register.name: register for register in INPUT_REGISTERS}
+        self._holding_registers = {register.name: register for register in HOLDING_REGISTERS}
+
+        self._updated = self._start
+        self._cloud = 1.0
+        self._soc = 50.0
+        self._energy: dict[str, float] = {
+            ATTR_OUTPUT_ENERGY_TOTAL: 1000.0,
+            ATTR_INPUT_ENERGY_TOTAL: 1030.0,
+            ATTR_ENERGY_TO_GRID_TOTAL: 400.0,
+            ATTR_ENERGY_TO_USER_TOTAL: 600.0,
+            ATTR_CHARGE_ENERGY_TOTAL: 150.0,
+            ATTR_DISCHARGE_ENERGY_TOTAL: 140.0,
+            **{f"input_{i}_energy_total": 1030.0 / trackers for i in range(1, trackers + 1)},
+        }
+        self._today: dict[str, float] = {}
+        self._operation = 0.0
+
+        self._set_holding(ATTR_FIRMWARE, "SIM1.0")
+        self._set_holding(ATTR_SERIAL_NUMBER, serial_number)
+        self._set_holding(ATTR_INVERTER_MODEL, [0x0001, 0x2000])
+        self._set_holding(ATTR_DEVICE_TYPE_CODE, 0x200 if trackers > 1 else 0x100)
+        self._set_holding(ATTR_NUMBER_OF_TRACKERS_AND_PHASES, (trackers << 8) + phases)
+        self._set_holding(ATTR_MODBUS_VERSION, 1.24)
+        self._set_holding(ATTR_AC_CHARGE_ENABLED, 0)
+        self._set_holding(ATTR_TIME_1, {
+            "start_hour": 23, "start_minutes": 0, "priority": "Battery", "enabled": "Yes",
+            "end_hour": 6, "end_minutes": 0,
+        })
+
+        self.update()
+
+    def now(self) -> datetime:
+        return self._start + timedelta(seconds=(time.monotonic() - self._started) * self.time_scale)
+
+    def irradiance(self, moment: datetime) -> float:
+        """Relative irradiance between 0 and 1 following the sun between sunrise and sunset."""
+        hour = moment.hour + moment.minute / 60 + moment.second / 3600
+        if not SUNRISE_HOUR < hour < SUNSET_HOUR:
+            return 0.0
+
+        return math.sin(math.pi * (hour - SUNRISE_HOUR) / (SUNSET_HOUR - SUNRISE_HOUR)) ** 2
+
+    def update(self) -> None:
+        """Advances the simulation to the current simulated time and updates the register values."""
+        now = self.now()
+        seconds = (now - self._updated).total_seconds()
+
+        if now.date() != self._updated.date():
+            self._today.clear()
+
+        self._updated = now
+        self._cloud = min(1.0, max(0.3, self._cloud + self._random.gauss(0, 0.02)))
+        irradiance = self.irradiance(now)
+
+        input_power = self.peak_power * irradiance * self._cloud
+        output_power = 0.97 * input_power
+        surplus = output_power - HOUSE_LOAD
+
+        charge_power = discharge_power = 0.0
+        if surplus > 0 and self._soc < 100:
+            charge_power = min(surplus, BATTERY_POWER)
+        elif surplus < 0 and self._soc > 10:
+            discharge_power = min(-surplus, BATTERY_POWER)
+
+        self._soc = min(100.0, max(10.0, self._soc + (charge_power - discharge_power) * seconds / 3600 / BATTERY_CAPACITY * 100))
+        to_grid = max(0.0, surplus - charge_power)
+        to_user = max(0.0, -surplus - discharge_power)
+
+        self._count(ATTR_OUTPUT_ENERGY_TODAY, ATTR_OUTPUT_ENERGY_TOTAL, output_power, seconds)
+        self._count(None, ATTR_INPUT_ENERGY_TOTAL, input_power, seconds)
+        self._count(ATTR_ENERGY_TO_GRID_TODAY, ATTR_ENERGY_TO_GRID_TOTAL, to_grid, seconds)
+        self._count(ATTR_ENERGY_TO_USER_TODAY, ATTR_ENERGY_TO_USER_TOTAL, to_user, seconds)
+        self._count(ATTR_CHARGE_ENERGY_TODAY, ATTR_CHARGE_ENERGY_TOTAL, charge_power, seconds)
+        self._count(ATTR_DISCHARGE_ENERGY_TODAY, ATTR_DISCHARGE_ENERGY_TOTAL, discharge_power, seconds)
+
+        producing = input_power > 20
+        if producing:
+            self._operation += seconds
+
+        self._set_input(ATTR_STATUS_CODE, 1 if producing else 0)
+        self._set_input(ATTR_DERATING_MODE, 0)
+        self._set_input(ATTR_FAULT_CODE, 0)
+        self._set_input(ATTR_WARNING_CODE, 0)
+        self._set_input(ATTR_INPUT_POWER, input_power)
+
+        for i in range(1, self.trackers + 1):
+            power = input_power / self.trackers
+            voltage = 300 + 80 * irradiance + self._random.uniform(-2, 2) if producing else 0.0
+            self._set_input(f"input_{i}_voltage", voltage)
+            self._set_input(f"input_{i}_amperage", power / voltage if voltage else 0.0)
+            self._set_input(f"input_{i}_power", power)
+            self._count(f"input_{i}_energy_today", f"input_{i}_energy_total", power, seconds)
+
+        self._set_input(ATTR_OUTPUT_POWER, output_power)
+        self._set_input(ATTR_FREQUENCY, 50 + self._random.uniform(-0.03, 0.03))
+
+        for i in range(1, self.phases + 1):
+            power = output_power / self.phases
+            voltage = 230 + self._random.uniform(-3, 3)
+            self._set_input(f"output_{i}_voltage", voltage)
+            self._set_input(f"output_{i}_amperage", power / voltage)
+            self._set_input(f"output_{i}_power", power)
+
+        for name, value in self._energy.items():
+            self._set_input(name, value)
+        for name, value in self._today.items():
+            self._set_input(name, value)
+
+        self._set_input(ATTR_OPERATION_HOURS, self._operation / 3600)
+        self._set_input(ATTR_TEMPERATURE, 20 + 25 * irradiance)
+        self._set_input(ATTR_IPM_TEMPERATURE, 25 + 25 * irradiance)
+        self._set_input(ATTR_BOOST_TEMPERATURE, 23 + 25 * irradiance)
+        self._set_input(ATTR_P_BUS_VOLTAGE, 360 if producing else 0)
+        self._set_input(ATTR_N_BUS_VOLTAGE, 360 if producing else 0)
+        self._set_input(ATTR_OUTPUT_PERCENTAGE, round(100 * output_power / self.peak_power))
+        self._set_input(ATTR_SOC_PERCENTAGE, round(self._soc))
+        self._set_input(ATTR_CHARGE_POWER, charge_power)
+        self._set_input(ATTR_DISCHARGE_POWER, discharge_power)
+
+    def _count(self, today: str | None, total: str, power: float, seconds: float) -> None:
+        energy = power * seconds / 3600000
+        self._energy[total] = self._energy.get(total, 0.0) + energy
+        if today is not None:
+            self._today[today] = self._today.get(today, 0.0) + energy
+
+    def _set_input(self, name: str, value: Any) -> None:
+        self._set(self._input, self._input_registers[name], value)
+
+    def _set_holding(self, name: str, value: Any) -> None:
+        self._set(self._holding, self._holding_registers[name], value)
+
+    @staticmethod
+    def _set(table: array, register: GrowattDeviceRegisters, value: Any) -> None:
+        for i, item in enumerate(encode_register(register, value)):
+            table[register.register + i] = item
+
+    @staticmethod
+    def _in_holes(address: int, count: int, holes: tuple[tuple[int, int], ...]) -> bool:
+        return any(address < start + length and start < address + count for start, length in holes)
+
+    async def handle(self, unit: int, pdu: bytes) -> bytes | None:
+        """Handles a request PDU, returns the response PDU or None when it isn't answered."""
+        if unit != self.unit:
+            return None
+
+        self.requests += 1
+        faults = self.faults
+
+        if faults.drop_rate and self._random.random() < faults.drop_rate:
+            return None
+
+        if faults.sleep_at_night and self.irradiance(self.now()) == 0:
+            return None
+
+        delay = faults.latency + (self._random.uniform(0, faults.jitter) if faults.jitter else 0)
+        if faults.timeout_rate and self._random.random() < faults.timeout_rate:
+            delay += faults.timeout_delay
+        if delay:
+            await asyncio.sleep(delay)
+
+        return self.respond(pdu)
+
+    def respond(self, pdu: bytes) -> bytes:
+        function = pdu[0]
+
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            address, count = struct.unpack(">HH", pdu[1:5])
+            table, holes = (
+                (self._holding, self.faults.holding_holes)
+                if function == READ_HOLDING_REGISTERS
+                else (self._input, self.faults.input_holes)
+            )
+
+            if not 0 < count <= self.faults.max_block_length:
+                return exception_response(function, ILLEGAL_DATA_VALUE)
+            if address + count > 0x10000 or self._in_holes(address, count, holes):
+                return exception_response(function, ILLEGAL_DATA_ADDRESS)
+
+            if function == READ_INPUT_REGISTERS:
+                self.update()
+            return read_response(function, table[address:address + count])
+
+        if function == WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack(">HH", pdu[1:5])
+            if self._in_holes(address, 1, self.faults.holding_holes):
+                return exception_response(function, ILLEGAL_DATA_ADDRESS)
+
+            self._holding[address] = value
+            return pdu[:5]
+
+        if function == WRITE_MULTIPLE_REGISTERS:
+            address, count = struct.unpack(">HH", pdu[1:5])
+            if self._in_holes(address, count, self.faults.holding_holes):
+                return exception_response(function, ILLEGAL_DATA_ADDRESS)
+
+            self._holding[address:address + count] = array("H", struct.unpack(f">{count}H", pdu[6:6 + 2 * count]))
+            return pdu[:5]
+
+        return exception_response(function, ILLEGAL_FUNCTION)
+
+
+class GrowattSimulatorBus:
+    """Multiple simulated devices sharing one bus or gateway, each answering on its own unit."""
+
+    def __init__(self, devices: list[GrowattSimulator]) -> None:
+        self.devices = {device.unit: device for device in devices}
+
+    async def handle(self, unit: int, pdu: bytes) -> bytes | None:
+        if (device := self.devices.get(unit)) is None:
+            return None
+
+        return await device.handle(unit, pdu)
+
+
+async def serve(
+        devices: list[GrowattSimulator],
+        tcp_port: int | None = None,
+        rtu: bool = False,
+        host: str = "127.0.0.1",
+) -> list[ModbusTcpServer | ModbusRtuPtyServer]:
+    """Starts the requested servers for the given devices, returns the started servers."""
+    bus = GrowattSimulatorBus(devices)
+    servers = []
+
+    if tcp_port is not None:
+        servers.append(ModbusTcpServer(bus.handle, host, tcp_port))
+    if rtu:
+        servers.append(ModbusRtuPtyServer(bus.handle))
+
+    for server in servers:
+        await server.start()
+
+    return servers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulated Growatt inverter")
+    parser.add_argument("--tcp", type=int, metavar="PORT", help="serve Modbus TCP on the given port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rtu", action="store_true", help="serve Modbus RTU on a pseudo terminal")
+    parser.add_argument("--units", type=int, default=1, help="number of devices, using unit 1 and up")
+    parser.add_argument("--peak-power", type=float, default=5000.0)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--start", type=datetime.fromisoformat, help="simulated start time")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--max-block-length", type=int, default=125)
+    parser.add_argument("--sleep-at-night", action="store_true")
+    args = parser.parse_args()
+
+    if args.tcp is None and not args.rtu:
+        parser.error("at least one of --tcp or --rtu is required")
+
+    logging.basicConfig(level=logging.INFO)
+
+    faults = SimulatorFaults(
+        latency=args.latency,
+        jitter=args.jitter,
+        timeout_rate=args.timeout_rate,
+        drop_rate=args.drop_rate,
+        max_block_length=args.max_block_length,
+        sleep_at_night=args.sleep_at_night,
+    )
+    devices = [
+        GrowattSimulator(
+            unit=unit,
+            serial_number=f"SIM{unit:07d}",
+            peak_power=args.peak_power,
+            time_scale=args.time_scale,
+            start=args.start,
+            seed=None if args.seed is None else args.seed + unit,
+            faults=faults,
+        )
+        for unit in range(1, args.units + 1)
+    ]
+
+    async def run() -> None:
+        servers = await serve(devices, args.tcp, args.rtu, args.host)
+        for server in servers:
+            print(f"{type(server).__name__} listening on {server.port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for server in servers:
+                await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Opt-in tracer recording spans of the update cycles and Modbus transactions in a bounded ring.
+
+The recorded spans are exported in the Chrome trace event format, which can be opened in Perfetto
+(https://ui.perfetto.dev) or chrome://tracing. Every transport and device gets its own track.
+"""
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from collections.abc import Iterator
+from typing import Any
+
+DEFAULT_CAPACITY = 20000
+
+
+class GrowattTracer:
+    """
+    Records completed spans while enabled, once the ring is full the oldest spans are dropped.
+    Spans are kept as tuples of name, category, track, start and duration in µs and arguments.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.enabled = False
+        self._spans: deque[tuple[str, str, str, int, int, dict[str, Any] | None]] = deque(maxlen=capacity)
+
+    def start(self, capacity: int | None = None) -> None:
+        if capacity is not None and capacity != self._spans.maxlen:
+            self._spans = deque(maxlen=capacity)
+        self._spans.clear()
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    @contextmanager
+    def span(self, name: str, category: str, track: str, **args: Any) -> Iterator[None]:
+        """Records the time spent in the with block, nothing is recorded while disabled."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self._spans.append((name, category, track, start // 1000, (end - start) // 1000, args or None))
+
+    def events(self) -> list[dict[str, Any]]:
+        """Chrome trace events of the recorded spans, with the track names as thread names."""
+        tracks: dict[str, int] = {}
+        events = []
+
+        for name, category, track, start, duration, args in list(self._spans):
+            if (tid := tracks.get(track)) is None:
+                tid = tracks[track] = len(tracks) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": track}})
+
+            event = {"ph": "X", "name": name, "cat": category, "pid": 1, "tid": tid, "ts": start, "dur": duration}
+            if args:
+                event["args"] = args
+            events.append(event)
+
+        events.append({"ph": "M", "name": "process_name", "pid": 1, "args": {"name": "growatt_local"}})
+        return events
+
+    def export(self, path: str) -> int:
+        """
+        Writes the recorded spans to a Chrome trace JSON file.
+        returns number of exported spans
+        """
+        events = self.events()
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        os.replace(temporary, path)
+
+        return sum(1 for event in events if event["ph"] == "X")
+
+
+# Shared by all transports and devices, putting them on a single timeline
+TRACER = GrowattTracer()
@@ -2,13 +2,18 @@
 Utility functions.
 """
 import logging
+import time
+from array import array
+from dataclasses import dataclass
+from bisect import bisect_right
 from typing import Any, List, Iterable, Iterator, TypeVar, Generic, Union, Optional
 from collections import OrderedDict
-from collections.abc import MutableMapping, Set
+from collections.abc import Mapping, MutableMapping, Sequence, Set
 
 
 from .device_type.base import (
     GrowattDeviceRegisters,
+    bit_field,
     custom_function,
 )
 
@@ -16,7 +21,20 @@ K = TypeVar('K')
 V = TypeVar('V')
 D = TypeVar('D')
 
-__all__ = ('LRUCache', 'get_keys_from_register', 'get_all_keys_from_register', 'keys_sequences', 'split_sequence', 'process_registers')
+__all__ = (
+    'LRUCache',
+    'ReadPlan',
+    'RegisterImage',
+    'get_keys_from_register',
+    'get_all_keys_from_register',
+    'get_continuation_keys',
+    'keys_sequences',
+    'split_sequence',
+    'registers_in_sequences',
+    'create_read_plan',
+    'process_registers',
+    'encode_bit_fields',
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,37 +54,78 @@ def get_keys_from_register(register: tuple[GrowattDeviceRegisters, ...]) -> set[
 def get_all_keys_from_register(registers: tuple[GrowattDeviceRegisters, ...], keys: set[int]) -> set[int]:
     """
     Lookup all related keys from the given keys based on the register config.
-    returns list a sorted list of all keys.
+    Registers spanning multiple keys add all of their keys.
+    returns set of all keys.
     """
-    result = set()
+    lengths: dict[int, int] = {}
+    for item in registers:
+        if item.register in keys:
+            lengths[item.register] = max(item.length, lengths.get(item.register, 1))
 
-    for key in keys:
-        result.add(key)
-        if (register := [item for item in registers if item.register == key]) is None:
-            continue
+    result = set(keys)
 
-        if len(register) > 1:
-            for i in range(len(register)):
-                result.add(key + i)
+    for key, length in lengths.items():
+        for i in range(1, length):
+            result.add(key + i)
 
     return result
 
 
-def keys_sequences(keys: Iterable[int], maximum_length: int) -> Set[tuple[int, int]]:
+def get_continuation_keys(registers: tuple[GrowattDeviceRegisters, ...]) -> set[int]:
+    """
+    Lookup all keys that hold a following part of a register spanning multiple keys.
+    A sequence should never start at such a key as the register value would be read in two requests.
+    returns set of keys.
+    """
+    return {
+        register.register + i
+        for register in registers
+        for i in range(1, register.length)
+    }
+
+
+def keys_sequences(
+        keys: Iterable[int],
+        maximum_length: int,
+        continuation_keys: Set[int] = frozenset()
+) -> Set[tuple[int, int]]:
     """
     Creates the set of sequences based on the given keys.
+    None of the sequences starts at one of the continuation keys, keeping registers spanning multiple keys in a single request.
     returns set containing tuples with start_key and length.
     """
     sorted_keys = sorted(keys)
-    indexes = split_sequence(sorted_keys, maximum_length)
+    length = maximum_length
+
+    while True:
+        indexes = set()
+        for index in split_sequence(sorted_keys, length):
+            while index > 0 and sorted_keys[index] in continuation_keys:
+                index -= 1
+            if index > 0:
+                indexes.add(index)
 
-    sequence = set()
+        sequence = set()
 
-    start = 0
-    indexes.append(len(sorted_keys))
-    for end in indexes:
-        sequence.add((sorted_keys[start], max(sorted_keys[start:end]) - min(sorted_keys[start:end]) + 1))
-        start = end
+        start = 0
+        for end in (*sorted(indexes), len(sorted_keys)):
+            sequence.add((sorted_keys[start], sorted_keys[end - 1] - sorted_keys[start] + 1))
+            start = end
+
+        # moving a split in front of a register can extend the next sequence beyond the maximum length
+        if (longest := max(item[1] for item in sequence)) <= maximum_length:
+            break
+
+        if length <= 1:
+            # splitting can't get any finer, falling back to a sequence per register
+            starts = [index for index, key in enumerate(sorted_keys) if index == 0 or key not in continuation_keys]
+            sequence = {
+                (sorted_keys[start], sorted_keys[end - 1] - sorted_keys[start] + 1)
+                for start, end in zip(starts, (*starts[1:], len(sorted_keys)))
+            }
+            break
+
+        length = max(1, length - (longest - maximum_length))
 
     _LOGGER.debug("determined key seqences %s", [f"start: {s[0]}, end: {s[0] + s[1]}" for s in sequence])
     return sequence
@@ -85,12 +144,11 @@ def split_sequence(keys: list[int], maximum_length: int) -> list[int]:
     seperation_treshold = maximum_length / 4
 
     key_differences = [j - i for i, j in zip(keys[:-1], keys[1:])]
-    sorted_key_differences = sorted(key_differences, reverse=True)
 
-    for key_diff in sorted_key_differences:
-        if key_diff < seperation_treshold:
-            break
-        diff_key_seperation_index.add(key_differences.index(key_diff) + 1)
+    # every gap at least the treshold separates, also when gaps of the same size occur more than once
+    for index, key_diff in enumerate(key_differences, 1):
+        if key_diff >= seperation_treshold:
+            diff_key_seperation_index.add(index)
 
     _LOGGER.debug(f"split sequence indexes based on key seperation: {diff_key_seperation_index}")
 
@@ -178,9 +236,82 @@ def split_sequence(keys: list[int], maximum_length: int) -> list[int]:
     return sorted(common_index)
 
 
+def registers_in_sequences(
+        registers: tuple[GrowattDeviceRegisters, ...],
+        sequences: Iterable[tuple[int, int]]
+) -> tuple[GrowattDeviceRegisters, ...]:
+    """
+    Filters the register config on the registers which are completely read by one of the given sequences.
+    returns tuple of registers in the original order
+    """
+    return tuple(
+        register
+        for register in registers
+        if any(
+            start <= register.register and register.register + register.length <= start + length
+            for start, length in sequences
+        )
+    )
+
+
+@dataclass(frozen=True)
+class ReadPlan:
+    """
+    Compiled set of requests to read the input or holding registers of a device.
+    Each block consists of the start key and length of a request together with the registers it completely covers.
+    """
+
+    holding: bool
+    blocks: tuple[tuple[tuple[int, int], tuple[GrowattDeviceRegisters, ...]], ...]
+
+    @property
+    def registers(self) -> tuple[GrowattDeviceRegisters, ...]:
+        return tuple(register for _, registers in self.blocks for register in registers)
+
+
+def split_keys(keys: Iterable[int], boundaries: Set[int]) -> list[list[int]]:
+    """
+    Splits the keys into groups of which the range doesn't include any of the boundary keys.
+    returns list of groups of sorted keys
+    """
+    groups: list[list[int]] = []
+
+    for key in sorted(keys):
+        if groups and not any(groups[-1][-1] < boundary < key for boundary in boundaries):
+            groups[-1].append(key)
+        else:
+            groups.append([key])
+
+    return groups
+
+
+def create_read_plan(
+        registers: tuple[GrowattDeviceRegisters, ...],
+        keys: set[int],
+        maximum_length: int,
+        holding: bool = False
+) -> ReadPlan:
+    """
+    Creates the read plan for the given keys based on the register config.
+    Registers spanning multiple keys are always read by a single request, preventing torn values.
+    returns read plan
+    """
+    # only the requested registers keep their keys together, a key can also be the start of a register on its own
+    key_sequences = keys_sequences(
+        get_all_keys_from_register(registers, keys),
+        maximum_length,
+        get_continuation_keys(tuple(register for register in registers if register.register in keys)),
+    )
+
+    return ReadPlan(
+        holding,
+        tuple((item, registers_in_sequences(registers, (item,))) for item in sorted(key_sequences))
+    )
+
+
 def process_registers(
         registers: tuple[GrowattDeviceRegisters, ...],
-        register_values: dict[int, int]
+        register_values: Union[Mapping[int, int], "RegisterImage"]
 ) -> dict[str, Any]:
     """
     Processes the register value corresponding to the given register dict.
@@ -219,6 +350,21 @@ def process_registers(
         elif register.value_type == bool:
             result[register.name] = bool(value)
 
+        elif register.value_type == bit_field:
+            for i in range(register.register + 1, register.register + register.length):
+                if (item := register_values.get(i)) is None:
+                    break
+                value = (value << 16) + item
+            else:
+                fields = {field.name: field.decode(value) for field in register.fields}
+
+                if register.function is not None:
+                    result[register.name] = register.function(fields)
+                elif len(register.fields) == 1:
+                    result[register.name] = fields[register.fields[0].name]
+                else:
+                    result[register.name] = fields
+
         elif register.value_type == custom_function:
             _LOGGER.debug("using custom function for %s", register.name)
             if register.function is None:
@@ -234,6 +380,149 @@ def process_registers(
     return result
 
 
+def encode_bit_fields(
+        register: GrowattDeviceRegisters,
+        values: Mapping[str, Any],
+        current: Sequence[int] | None = None
+) -> list[int]:
+    """
+    Encodes the given bit field values into the register values of a bit field register.
+    Bits not covered by the given values are taken from the current register values.
+    returns list of register values
+    """
+    if register.value_type != bit_field:
+        raise ValueError(f"Register {register.name} is not a bit field register")
+
+    value = 0
+    for item in current or ():
+        value = (value << 16) + item
+
+    fields = {field.name: field for field in register.fields}
+    for name, field_value in values.items():
+        if (field := fields.get(name)) is None:
+            raise ValueError(f"Register {register.name} has no bit field {name}")
+        value = field.encode(value, field_value)
+
+    return [(value >> (16 * i)) & 0xFFFF for i in reversed(range(register.length))]
+
+
+class _RegisterSegment:
+    """Continuous range of register addresses within a `RegisterImage`."""
+
+    __slots__ = ("start", "end", "values", "updated")
+
+    def __init__(self, start: int, end: int) -> None:
+        self.start = start
+        self.end = end
+        self.values = array("H", bytes(2 * (end - start)))
+        self.updated = array("d", bytes(8 * (end - start)))
+
+
+class RegisterImage:
+    """
+    Persistent image of the registers of a device.
+
+    The mapped address ranges of the register config are stored in ``array('H')`` segments, with a
+    parallel array holding the monotonic time each register was last written. Block reads are
+    written into the segments in place, addresses outside the mapped ranges are ignored.
+    A register that has never been written has no value.
+    """
+
+    def __init__(self, registers: tuple[GrowattDeviceRegisters, ...] = ()) -> None:
+        self._segments: list[_RegisterSegment] = []
+
+        start = end = None
+        for key in sorted(get_keys_from_register(registers)):
+            if end is not None and key == end:
+                end += 1
+                continue
+
+            if start is not None:
+                self._segments.append(_RegisterSegment(start, end))
+            start, end = key, key + 1
+
+        if start is not None:
+            self._segments.append(_RegisterSegment(start, end))
+
+        self._starts = [segment.start for segment in self._segments]
+
+    def _segment(self, address: int) -> _RegisterSegment | None:
+        index = bisect_right(self._starts, address) - 1
+        if index < 0:
+            return None
+
+        segment = self._segments[index]
+        return segment if address < segment.end else None
+
+    def ranges(self) -> list[tuple[int, int]]:
+        """returns the mapped address ranges as tuples of start address and length."""
+        return [(segment.start, segment.end - segment.start) for segment in self._segments]
+
+    def write(self, start: int, values: Sequence[int], timestamp: float | None = None) -> None:
+        """Writes a block of register values starting at the given address into the image."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        end = start + len(values)
+        index = max(bisect_right(self._starts, start) - 1, 0)
+
+        for segment in self._segments[index:]:
+            if segment.start >= end:
+                break
+            if segment.end <= start:
+                continue
+
+            first = max(start, segment.start)
+            last = min(end, segment.end)
+            segment.values[first - segment.start:last - segment.start] = array("H", values[first - start:last - start])
+            segment.updated[first - segment.start:last - segment.start] = array("d", (timestamp,)) * (last - first)
+
+    def get(self, address: int, default: D = None) -> Union[int, D]:
+        if (segment := self._segment(address)) is None or not segment.updated[address - segment.start]:
+            return default
+
+        return segment.values[address - segment.start]
+
+    def updated(self, address: int) -> float | None:
+        """returns the monotonic time the register was last written."""
+        if (segment := self._segment(address)) is None or not segment.updated[address - segment.start]:
+            return None
+
+        return segment.updated[address - segment.start]
+
+    def age(self, address: int, now: float | None = None) -> float | None:
+        """returns the number of seconds since the register was last written."""
+        if (updated := self.updated(address)) is None:
+            return None
+
+        return (time.monotonic() if now is None else now) - updated
+
+    def copy(self) -> "RegisterImage":
+        """returns an independent copy of the image."""
+        image = RegisterImage.__new__(RegisterImage)
+        image._starts = self._starts
+        image._segments = []
+
+        for segment in self._segments:
+            copy = _RegisterSegment.__new__(_RegisterSegment)
+            copy.start = segment.start
+            copy.end = segment.end
+            copy.values = array("H", segment.values)
+            copy.updated = array("d", segment.updated)
+            image._segments.append(copy)
+
+        return image
+
+    def __contains__(self, address: object) -> bool:
+        return isinstance(address, int) and self.get(address) is not None
+
+    def __getitem__(self, address: int) -> int:
+        if (value := self.get(address)) is None:
+            raise KeyError(address)
+
+        return value
+
+
 class LRUCache(MutableMapping, Generic[K, V]):
     """
     A least-recently used (LRU) cache with a fixed cache size.
@@ -1,11 +1,14 @@
 """The Growatt server PV inverter sensor integration."""
 import asyncio
 import logging
+import time
 from collections.abc import Callable, Sequence
+from contextlib import AbstractContextManager, nullcontext
 from datetime import timedelta
 from typing import Any, Optional
 
-from pymodbus.exceptions import ConnectionException
+import voluptuous as vol
+from pymodbus.exceptions import ConnectionException, ModbusIOException
 
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry
@@ -17,20 +20,30 @@ from homeassistant.const import (
     SUN_EVENT_SUNRISE,
     SUN_EVENT_SUNSET,
     EVENT_HOMEASSISTANT_STARTED,
+    EVENT_HOMEASSISTANT_STOP,
 )
-from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.event import (
     async_track_sunrise,
     async_track_sunset,
     async_track_time_change,
+    async_track_time_interval,
 )
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.sun import get_astral_event_next
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
 )
 from homeassistant.util import dt as dt_util
-from .API.device_type.base import GrowattDeviceRegisters
+from .API.device_type.base import GrowattDeviceRegisters, GrowattSnapshot, ValueQuality
+from .API.exception import ModbusException
 from .API.growatt import GrowattDevice, GrowattSerial, GrowattNetwork
+from .API.poller import GrowattPollerProcess
+from .API.profiler import GrowattProfiler
+from .API.proxy import GrowattModbusProxy, parse_register_ranges
+from .API.trace import TRACER
 from .const import (
     CONF_LAYER,
     CONF_SERIAL,
@@ -40,13 +53,39 @@ from .const import (
     CONF_SERIAL_PORT,
     CONF_BAUDRATE,
     CONF_BYTESIZE,
+    CONF_IO_THREAD,
     CONF_PARITY,
     CONF_STOPBITS,
     CONF_POWER_SCAN_ENABLED,
     CONF_POWER_SCAN_INTERVAL,
+    CONF_POLLER_PROCESS,
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_PROXY_WRITABLE,
+    ATTR_CAPACITY,
+    ATTR_CYCLES,
+    ATTR_FILENAME,
+    ATTR_MEMORY,
+    ATTR_STOP,
+    DATA_METRICS_VIEW,
+    DATA_PROFILER,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_TRACE_FILENAME,
     DOMAIN,
+    METRICS_CONTEXT,
     PLATFORMS,
+    PROFILE_SAVE_INTERVAL,
+    PROFILE_STORAGE_VERSION,
+    PROFILER_WAIT,
+    SNAPSHOT_STORAGE_VERSION,
+    SERVICE_EXPORT_TRACE,
+    SERVICE_PROFILE,
+    SERVICE_START_TRACE,
 )
+from .view import GrowattMetricsView
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -69,6 +108,8 @@ async def async_setup_entry(
             entry.data[CONF_STOPBITS],
             entry.data[CONF_PARITY],
             entry.data[CONF_BYTESIZE],
+            # the transport is only used in this process when not polling in a process of its own
+            io_thread=options.get(CONF_IO_THREAD, False) and not options.get(CONF_POLLER_PROCESS, False),
         )
     elif entry.data[CONF_LAYER] in (CONF_TCP, CONF_UDP):
         device_layer = GrowattNetwork(
@@ -98,13 +139,51 @@ async def async_setup_entry(
 
     hass.data.setdefault(DOMAIN, {})[entry.data[CONF_SERIAL_NUMBER]] = coordinator
 
+    if not hass.data.get(DATA_METRICS_VIEW):
+        hass.http.register_view(GrowattMetricsView)
+        hass.data[DATA_METRICS_VIEW] = True
+
+    async_register_services(hass)
+
+    # the entities start with the values of before the restart, also while the device is asleep
+    await coordinator.async_load_snapshot(snapshot_store(hass, entry))
+    if not options.get(CONF_POLLER_PROCESS, False):
+        # the first cycle already uses the block length and read plans learned before the restart
+        await coordinator.async_load_profile(profile_store(hass, entry))
+
+    entry.async_on_unload(
+        async_track_time_interval(hass, coordinator.async_save, timedelta(seconds=PROFILE_SAVE_INTERVAL))
+    )
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, coordinator.async_save))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    if hass.is_running:
-        await device.connect()
+    if options.get(CONF_POLLER_PROCESS, False):
+        coordinator.poller = GrowattPollerProcess(poller_arguments(entry), coordinator.poller_snapshot)
+        # the first refresh starts the poller process and sends the keys of the entities just set up
+        await coordinator.async_refresh()
+    elif hass.is_running:
+        await coordinator.async_connect()
     else:
-        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, device.connect)
-    
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, coordinator.async_connect)
+
+    if coordinator.poller is not None:
+        if options.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT):
+            _LOGGER.warning("The Modbus proxy isn't available while polling in a separate process")
+    elif proxy_port := options.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT):
+        coordinator.proxy = GrowattModbusProxy(
+            device,
+            options.get(CONF_PROXY_MAX_AGE, DEFAULT_PROXY_MAX_AGE),
+            parse_register_ranges(options.get(CONF_PROXY_WRITABLE, "")),
+            host=options.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST),
+            port=proxy_port,
+        )
+        try:
+            await coordinator.proxy.start()
+        except OSError as error:
+            _LOGGER.error("Unable to start the Modbus proxy on port %d: %s", proxy_port, error)
+            coordinator.proxy = None
+
     entry.async_on_unload(entry.add_update_listener(config_entry_update_listener))
     return True
 
@@ -113,13 +192,130 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
-    await hass.data[DOMAIN][entry.data[CONF_SERIAL_NUMBER]].growatt_api.close()
+    coordinator = hass.data[DOMAIN][entry.data[CONF_SERIAL_NUMBER]]
+    if coordinator.proxy is not None:
+        await coordinator.proxy.stop()
+
+    await coordinator.async_save()
+
+    if coordinator.poller is not None:
+        await coordinator.poller.stop()
+    # also in poller mode, closing stops the I/O thread of the transport
+    await coordinator.growatt_api.close()
 
     if unload_ok:
         hass.data[DOMAIN].pop(entry.data[CONF_SERIAL_NUMBER])
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored profile and values of a removed config entry."""
+    await profile_store(hass, entry).async_remove()
+    await snapshot_store(hass, entry).async_remove()
+
+
+def profile_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Store of the profile learned from the device of the entry."""
+    return Store(hass, PROFILE_STORAGE_VERSION, f"{DOMAIN}.profile.{entry.entry_id}")
+
+
+def snapshot_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Store of the last values of the device of the entry."""
+    return Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.snapshot.{entry.entry_id}")
+
+
+def poller_arguments(entry: ConfigEntry) -> list[str]:
+    """Command line arguments of the poller process for the transport of the entry."""
+    options = entry.options
+    data = entry.data
+
+    if data[CONF_LAYER] == CONF_SERIAL:
+        arguments = [
+            "--serial", data[CONF_SERIAL_PORT],
+            "--baudrate", str(data[CONF_BAUDRATE]),
+            "--stopbits", str(data[CONF_STOPBITS]),
+            "--parity", str(data[CONF_PARITY]),
+            "--bytesize", str(data[CONF_BYTESIZE]),
+        ]
+    else:
+        arguments = [
+            f"--{options.get(CONF_LAYER, data[CONF_LAYER])}",
+            options.get(CONF_IP_ADDRESS, data.get(CONF_IP_ADDRESS)),
+            str(options.get(CONF_PORT, data.get(CONF_PORT))),
+        ]
+
+    return [*arguments, "--unit", str(data[CONF_ADDRESS])]
+
+
+@callback
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the services shared by all entries."""
+    if hass.services.has_service(DOMAIN, SERVICE_START_TRACE):
+        return
+
+    async def start_trace(call: ServiceCall) -> None:
+        TRACER.start(call.data.get(ATTR_CAPACITY))
+        _LOGGER.info("Tracing started")
+
+    async def export_trace(call: ServiceCall) -> None:
+        path = call.data.get(ATTR_FILENAME, hass.config.path(DEFAULT_TRACE_FILENAME))
+        if not hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Writing to {path} is not allowed")
+
+        if call.data[ATTR_STOP]:
+            TRACER.stop()
+
+        spans = await hass.async_add_executor_job(TRACER.export, path)
+        _LOGGER.info("Exported %d trace spans to %s", spans, path)
+
+    async def profile(call: ServiceCall) -> None:
+        if DATA_PROFILER in hass.data:
+            raise HomeAssistantError("Profiling is already running")
+
+        hass.data[DATA_PROFILER] = await hass.async_add_executor_job(
+            GrowattProfiler, call.data[ATTR_CYCLES], call.data[ATTR_MEMORY]
+        )
+        _LOGGER.info("Profiling the next %d update cycles", call.data[ATTR_CYCLES])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        profile,
+        vol.Schema({
+            vol.Optional(ATTR_CYCLES, default=10): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(ATTR_MEMORY, default=True): cv.boolean,
+        }),
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_TRACE,
+        start_trace,
+        vol.Schema({vol.Optional(ATTR_CAPACITY): vol.All(vol.Coerce(int), vol.Range(min=100))}),
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_TRACE,
+        export_trace,
+        vol.Schema({vol.Optional(ATTR_FILENAME): cv.string, vol.Optional(ATTR_STOP, default=True): cv.boolean}),
+    )
+
+
+async def async_write_profile(hass: HomeAssistant) -> None:
+    """Stops the running profiler and writes its reports to the config directory."""
+    if (profiler := hass.data.pop(DATA_PROFILER, None)) is None:
+        return
+
+    # disabling only works on the event loop thread the sections enabled the profiler on
+    profiler.stop()
+    while profiler.active:
+        # a section of another device is still awaiting its transport
+        await asyncio.sleep(PROFILER_WAIT)
+
+    snapshot = await hass.async_add_executor_job(profiler.finish)
+    files = await hass.async_add_executor_job(profiler.write, hass.config.path(), snapshot)
+    _LOGGER.info("Profile of %d update cycles written to %s", profiler.cycles, ", ".join(files))
+
+
 class GrowattLocalCoordinator(DataUpdateCoordinator):
     """My custom coordinator."""
 
@@ -139,12 +335,21 @@ class GrowattLocalCoordinator(DataUpdateCoordinator):
             # Polling interval. Will only be polled if there are subscribers.
             update_interval=self.interval,
         )
-        self.data = {}
         self.growatt_api = growatt_api
+        self.proxy: GrowattModbusProxy | None = None
+        self.store: Store | None = None
+        self.snapshot_store: Store | None = None
+        self.poller: GrowattPollerProcess | None = None
+        self._poller_pending = False
+        self._poller_refresh: asyncio.Task | None = None
+        self.catalog = growatt_api.catalog
+        self.data = GrowattSnapshot(self.catalog)
         self._failed_update_count = 0
         self.keys = set()
         self.holding_keys = set()
         self.p_keys = set()
+        self._updated_keys: set[str] = set()
+        self._new_contexts: set[str] = set()
         self._midnight_listeners: dict[
             CALLBACK_TYPE, tuple[CALLBACK_TYPE, object | None]
         ] = {}
@@ -161,51 +366,210 @@ class GrowattLocalCoordinator(DataUpdateCoordinator):
 
         async_track_time_change(self.hass, self.midnight, 0, 0, 0)
 
+    @callback
+    def async_add_listener(
+        self, update_callback: CALLBACK_TYPE, context: Any = None
+    ) -> Callable[[], None]:
+        """Listen for data updates, a new listener receives its value on the next update."""
+        self._new_contexts.add(context)
+        return super().async_add_listener(update_callback, context)
+
     @callback
     def async_update_listeners(self) -> None:
         """Update only the registered listeners for which we have new data."""
-        for update_callback, context in set(self._listeners.values()):
-            if context in self.data.keys():
-                update_callback()
+        started = time.perf_counter()
+        with self._profile(), TRACER.span(
+                "dispatch", "coordinator", self.growatt_api.trace_name, keys=len(self._updated_keys)
+        ):
+            for update_callback, context in set(self._listeners.values()):
+                if context in self._updated_keys:
+                    update_callback()
+
+        metrics = self.growatt_api.device_metrics
+        metrics.dispatches += 1
+        metrics.dispatch_time += time.perf_counter() - started
+
+        if (profiler := self.hass.data.get(DATA_PROFILER)) is not None and profiler.cycle():
+            self.hass.async_create_task(async_write_profile(self.hass))
+
+    async def async_load_profile(self, store: Store) -> None:
+        """Restores the profile of the device from the store, the profile is saved in the same store."""
+        self.store = store
+        if (profile := await store.async_load()) is None:
+            return
+
+        try:
+            self.growatt_api.load_profile(profile)
+        except (KeyError, TypeError, ValueError) as error:
+            _LOGGER.warning("Ignoring the stored device profile: %s", error)
+
+    async def async_save_profile(self) -> None:
+        if self.store is not None:
+            await self.store.async_save(self.growatt_api.profile())
+
+    async def async_load_snapshot(self, store: Store) -> None:
+        """
+        Restores the values saved in the store into the data, before the entities are added they take their
+        initial value from. The values are saved in the same store.
+        """
+        self.snapshot_store = store
+        if (values := await store.async_load()) is None:
+            return
+
+        try:
+            self.data.restore(values)
+        except (TypeError, ValueError) as error:
+            _LOGGER.warning("Ignoring the stored values: %s", error)
+
+    async def async_save_snapshot(self) -> None:
+        if self.snapshot_store is not None:
+            await self.snapshot_store.async_save(self.data.export())
+
+    async def async_save(self, *_: Any) -> None:
+        """Saves the profile and the values, called periodically and on shutdown."""
+        await self.async_save_profile()
+        await self.async_save_snapshot()
+
+    async def async_connect(self, *_: Any) -> None:
+        """Connects the device, its device information is read in the background to validate the profile."""
+        await self.growatt_api.connect()
+        self.hass.async_create_task(self._async_identify())
+
+    async def _async_identify(self) -> None:
+        try:
+            await self.growatt_api.get_device_into()
+        except (ConnectionException, ModbusException, ModbusIOException, asyncio.TimeoutError) as error:
+            # a sleeping device keeps the stored profile until it is read next time
+            _LOGGER.debug("Unable to read the device information: %s", error)
+            return
+
+        await self.async_save_profile()
+
+    @callback
+    def poller_snapshot(self) -> None:
+        """Called for every snapshot published by the poller process."""
+        self._poller_pending = True
+        if self._poller_refresh is None or self._poller_refresh.done():
+            self._poller_refresh = self.hass.async_create_task(self._async_poller_refresh())
+
+    async def _async_poller_refresh(self) -> None:
+        while self._poller_pending:
+            self._poller_pending = False
+            await self.async_refresh()
+
+    async def _async_update_poller(self) -> GrowattSnapshot:
+        """Takes the values the poller process published since the previous update."""
+        data = {}
+        status = None
+
+        try:
+            if not self.poller.running:
+                await self.poller.start()
+            await self.poller.configure(
+                self.keys,
+                self.holding_keys,
+                self.p_keys,
+                self.update_interval.total_seconds(),
+                int(self._max_counter),
+            )
+        except (ConnectionException, ModbusException, asyncio.TimeoutError, OSError) as error:
+            _LOGGER.warning("Unable to configure the poller process: %s", error)
+            status = "not_connected"
+
+        if (snapshot := self.poller.take()) is not None:
+            values, changed = snapshot
+            data = {key: values[key] for key in (values if changed is None else changed) if key in values}
+
+        self.data.update(data)
+
+        if status and status != self.data.get("status"):
+            self.data.update({"status": status})
+            data["status"] = status
+
+        self._updated_keys = self._new_contexts.union(data)
+        self._updated_keys.add(METRICS_CONTEXT)
+        self._new_contexts.clear()
+
+        return self.data
+
+    def _profile(self) -> AbstractContextManager:
+        """Profiling section when profiling was requested."""
+        if (profiler := self.hass.data.get(DATA_PROFILER)) is None:
+            return nullcontext()
+
+        return profiler.section()
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
 
         This is the place to pre-process the data to lookup tables
         so entities can quickly look up their data.
+
+        The device only returns the values of blocks that changed, these are set in the snapshot
+        kept as data and only the listeners of those values are updated.
         """
+        if self.poller is not None:
+            return await self._async_update_poller()
+
         status = None
         data = {}
+        started = time.monotonic()
 
 #        if self._sun_is_down:
  #           return {"status": "Offline"}
+        track = self.growatt_api.trace_name
         try:
-            if self._counter >= self._max_counter or self._failed_update_count > 0:
-                self._counter = 0
-                data = await self.growatt_api.update(self.keys)
-                holding_data = await self.growatt_api.update_holding(self.holding_keys)
-                data.update(holding_data)
-                _LOGGER.debug(f"Updated data: {data}")
-            else:
-                self._counter += 1
-                data = await self.growatt_api.update(self.p_keys)
+            with self._profile(), TRACER.span("cycle", "coordinator", track):
+                if self._counter >= self._max_counter or self._failed_update_count > 0:
+                    self._counter = 0
+                    with TRACER.span("update input", "coordinator", track):
+                        data = await self.growatt_api.update(self.keys)
+                    with TRACER.span("update holding", "coordinator", track):
+                        holding_data = await self.growatt_api.update_holding(self.holding_keys)
+                    data.update(holding_data)
+                    _LOGGER.debug(f"Updated data: {data}")
+                else:
+                    self._counter += 1
+                    with TRACER.span("update power", "coordinator", track):
+                        data = await self.growatt_api.update(self.p_keys)
             self._failed_update_count = 0
         except ConnectionException:
             self._failed_update_count += 1
             status = "not_connected"
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, ModbusIOException) as error:
+            _LOGGER.debug("Update failed: %s", error or "timeout")
             self._failed_update_count += 1
             status = "no_response"
+        except ModbusException as error:
+            _LOGGER.warning("Update failed: %s", error)
+            self._failed_update_count += 1
+
+        self.data.update(data)
 
         if status is None:
-            status = self.growatt_api.status(data)
+            status = self.growatt_api.status(self.data)
 
-        if status:
+        if status and status != self.data.get("status"):
+            self.data.update({"status": status})
             data["status"] = status
 
-        return data
+        self._updated_keys = self._new_contexts.union(data)
+        self._updated_keys.add(METRICS_CONTEXT)
+        self._new_contexts.clear()
+
+        self.growatt_api.metrics.cycle(
+            time.monotonic() - started,
+            self.update_interval.total_seconds() if self.update_interval else None,
+            failed=self._failed_update_count > 0,
+        )
+
+        return self.data
 
     async def force_refresh(self):
+        if self.poller is not None:
+            await self.poller.request("refresh")
+            return
+
         self._counter = 999
         await self.async_request_refresh()
         
@@ -242,7 +606,7 @@ class GrowattLocalCoordinator(DataUpdateCoordinator):
     @callback
     def midnight(self, datetime=None):
         for update_callback, context in set(self._midnight_listeners.values()):
-            self.data.update({context: 0})
+            self.data.update({context: 0}, quality=ValueQuality.Substituted)
             update_callback()
 
     @callback
@@ -303,4 +667,13 @@ class GrowattLocalCoordinator(DataUpdateCoordinator):
         return self.growatt_api.get_holding_register_by_name(name)
 
     async def write_register(self, register, payload):
-        await self.growatt_api.write_register(register, payload)
+        if self.poller is not None:
+            await self.poller.request("write_register", register=register, value=payload)
+        else:
+            await self.growatt_api.write_register(register, payload)
+
+    async def write_bit_fields(self, register: GrowattDeviceRegisters, values: dict[str, Any]):
+        if self.poller is not None:
+            await self.poller.request("write_bit_fields", register=register.name, values=values)
+        else:
+            await self.growatt_api.write_bit_fields(register, values)
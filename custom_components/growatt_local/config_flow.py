@@ -20,7 +20,9 @@ from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import selector
 from .API.exception import ModbusPortException
-from .API.growatt import GrowattModbusBase, GrowattSerial, GrowattNetwork, get_device_info
+from .API.device_type.base import GrowattDeviceInfo
+from .API.growatt import GrowattModbusBase, GrowattSerial, GrowattNetwork, detect_serial_settings, get_device_info
+from .API.proxy import parse_register_ranges
 from .const import (
     CONF_AC_PHASES,
     CONF_DC_STRING,
@@ -31,12 +33,23 @@ from .const import (
     CONF_SERIAL_PORT,
     CONF_BAUDRATE,
     CONF_BYTESIZE,
+    CONF_DETECT,
+    CONF_IO_THREAD,
     CONF_PARITY,
     CONF_STOPBITS,
     CONF_POWER_SCAN_ENABLED,
     CONF_POWER_SCAN_INTERVAL,
+    CONF_POLLER_PROCESS,
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_PROXY_WRITABLE,
     CONF_SERIAL_NUMBER,
     CONF_FIRMWARE,
+    DISCOVERY_UNITS,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_PROXY_PORT,
     ParityOptions,
     DOMAIN,
 )
@@ -62,6 +75,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self.server: GrowattModbusBase | None = None
         self.user_id = None
         self.data: dict[str, Any] = {}
+        self.discovered: dict[int, GrowattDeviceInfo | None] = {}
         self.force_next_page = False
 
     @callback
@@ -79,6 +93,21 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=data_schema, errors=errors
         )
 
+    @callback
+    def _async_show_serial_detect_form(self, default_values=(None, None), errors=None):
+        """Show the form to the user to detect the serial port parameters."""
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_SERIAL_PORT, default=default_values[0]): str,
+                vol.Optional(CONF_ADDRESS, description={"suggested_value": default_values[1]}): int,
+                vol.Required(CONF_DETECT, default=True): bool,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="serial_detect", data_schema=data_schema, errors=errors
+        )
+
     @callback
     def _async_show_serial_form(self, default_values=(None, 9600, 1, ParityOptions.NONE, 8, None), errors=None):
         """Show the serial form to the user."""
@@ -105,7 +134,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         mode=selector.NumberSelectorMode.BOX,
                     ),
                 ),
-                vol.Required(CONF_ADDRESS, default=default_values[5]): int,
+                vol.Optional(CONF_ADDRESS, description={"suggested_value": default_values[5]}): int,
             }
         )
 
@@ -120,7 +149,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             {
                 vol.Required(CONF_IP_ADDRESS, default=default_values[0]): str,
                 vol.Required(CONF_PORT, default=default_values[1]): int,
-                vol.Required(CONF_ADDRESS, default=default_values[2]): int,
+                vol.Optional(CONF_ADDRESS, description={"suggested_value": default_values[2]}): int,
             }
         )
 
@@ -188,10 +217,47 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if CONF_LAYER in user_input:
             self.data = user_input
             if user_input[CONF_LAYER] == CONF_SERIAL:
-                return self._async_show_serial_form()
+                return self._async_show_serial_detect_form()
             else:
                 return self._async_show_network_form()
 
+    async def async_step_serial_detect(self, user_input=None) -> FlowResult:
+        """Handle the detection of the serial port parameters."""
+        if user_input is None:
+            return self._async_show_serial_detect_form()
+
+        port = user_input[CONF_SERIAL_PORT]
+        address = user_input.get(CONF_ADDRESS)
+
+        if not user_input[CONF_DETECT]:
+            return self._async_show_serial_form(default_values=(port, 9600, 1, ParityOptions.NONE, 8, address))
+
+        try:
+            settings = await detect_serial_settings(port, address or 1)
+        except (ModbusPortException, ConnectionException, OSError):
+            _LOGGER.error("Unable to detect the serial port parameters", exc_info=True)
+            return self._async_show_serial_detect_form((port, address), errors={CONF_SERIAL_PORT: "serial_port"})
+
+        if settings is None:
+            return self._async_show_serial_form(
+                default_values=(port, 9600, 1, ParityOptions.NONE, 8, address),
+                errors={"base": "serial_detect"},
+            )
+
+        baudrate, bytesize, parity, stopbits = settings
+        serial_input = {
+            CONF_SERIAL_PORT: port,
+            CONF_BAUDRATE: baudrate,
+            CONF_STOPBITS: stopbits,
+            CONF_PARITY: parity,
+            CONF_BYTESIZE: bytesize,
+        }
+        if address is not None:
+            serial_input[CONF_ADDRESS] = address
+
+        # continues as if the detected parameters were entered, reading the device information once
+        return await self.async_step_serial(serial_input)
+
     async def async_step_serial(self, user_input=None) -> FlowResult:
         """Handle the serial config flow."""
 
@@ -217,10 +283,46 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         user_input[CONF_STOPBITS],
                         user_input[CONF_PARITY],
                         user_input[CONF_BYTESIZE],
-                        user_input[CONF_ADDRESS],
+                        user_input.get(CONF_ADDRESS),
                     ),
                     errors={CONF_SERIAL_PORT: "serial_port"})
 
+            if user_input.get(CONF_ADDRESS) is None:
+                try:
+                    self.discovered = await server.scan_units(DISCOVERY_UNITS)
+                except ConnectionException:
+                    _LOGGER.error("Unexpected error when searching for devices", exc_info=True)
+                    return self._async_show_serial_form(
+                        default_values=(
+                            user_input[CONF_SERIAL_PORT],
+                            user_input[CONF_BAUDRATE],
+                            user_input[CONF_STOPBITS],
+                            user_input[CONF_PARITY],
+                            user_input[CONF_BYTESIZE],
+                            None,
+                        ),
+                        errors={"base": "device_disconnect"},
+                    )
+                finally:
+                    await server.close()
+
+                if not self.discovered:
+                    return self._async_show_serial_form(
+                        default_values=(
+                            user_input[CONF_SERIAL_PORT],
+                            user_input[CONF_BAUDRATE],
+                            user_input[CONF_STOPBITS],
+                            user_input[CONF_PARITY],
+                            user_input[CONF_BYTESIZE],
+                            None,
+                        ),
+                        errors={"base": "no_devices"},
+                    )
+
+                self.server = server
+                self.data.update(user_input)
+                return await self.async_step_unit()
+
             try:
                 device_info = await get_device_info(server, user_input[CONF_ADDRESS])
             except TimeoutError:
@@ -235,7 +337,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         user_input[CONF_STOPBITS],
                         user_input[CONF_PARITY],
                         user_input[CONF_BYTESIZE],
-                        user_input[CONF_ADDRESS],
+                        user_input.get(CONF_ADDRESS),
                     ),
                     errors={CONF_ADDRESS: "device_address", "base": "device_timeout"},
                 )
@@ -250,7 +352,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         user_input[CONF_STOPBITS],
                         user_input[CONF_PARITY],
                         user_input[CONF_BYTESIZE],
-                        user_input[CONF_ADDRESS],
+                        user_input.get(CONF_ADDRESS),
                     ),
                     errors={"base": "device_disconnect"},
                 )
@@ -288,7 +390,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     default_values=(
                         user_input[CONF_IP_ADDRESS],
                         user_input[CONF_PORT],
-                        user_input[CONF_ADDRESS]
+                        user_input.get(CONF_ADDRESS)
                     ),
                     errors={"base": "network_connection"},
                 )
@@ -298,7 +400,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     default_values=(
                         user_input[CONF_IP_ADDRESS],
                         user_input[CONF_PORT],
-                        user_input[CONF_ADDRESS]
+                        user_input.get(CONF_ADDRESS)
                     ),
                     errors={"base": "network_custom"},
                 )
@@ -309,11 +411,34 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     default_values=(
                         user_input[CONF_IP_ADDRESS],
                         user_input[CONF_PORT],
-                        user_input[CONF_ADDRESS]
+                        user_input.get(CONF_ADDRESS)
                     ),
                     errors={"base": "network_connection"},
                 )
 
+            if user_input.get(CONF_ADDRESS) is None:
+                try:
+                    # most Modbus TCP gateways handle multiple outstanding requests, other transports probe one by one
+                    self.discovered = await server.scan_units(DISCOVERY_UNITS, concurrency=8)
+                except ConnectionException:
+                    _LOGGER.error("Unexpected error when searching for devices", exc_info=True)
+                    return self._async_show_network_form(
+                        default_values=(user_input[CONF_IP_ADDRESS], user_input[CONF_PORT], None),
+                        errors={"base": "device_disconnect"},
+                    )
+                finally:
+                    await server.close()
+
+                if not self.discovered:
+                    return self._async_show_network_form(
+                        default_values=(user_input[CONF_IP_ADDRESS], user_input[CONF_PORT], None),
+                        errors={"base": "no_devices"},
+                    )
+
+                self.server = server
+                self.data.update(user_input)
+                return await self.async_step_unit()
+
             try:
                 device_info = None
                 if not self.force_next_page:
@@ -327,7 +452,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     default_values=(
                         user_input[CONF_IP_ADDRESS],
                         user_input[CONF_PORT],
-                        user_input[CONF_ADDRESS]
+                        user_input.get(CONF_ADDRESS)
                     ),
                     errors={CONF_ADDRESS: "device_address", "base": "device_timeout"},
                 )
@@ -339,7 +464,7 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     default_values=(
                         user_input[CONF_IP_ADDRESS],
                         user_input[CONF_PORT],
-                        user_input[CONF_ADDRESS]
+                        user_input.get(CONF_ADDRESS)
                     ),
                     errors={"base": "device_disconnect"},
                 )
@@ -360,6 +485,39 @@ class GrowattLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             else:
                 return self._async_show_device_form()
 
+    async def async_step_unit(self, user_input=None) -> FlowResult:
+        """Handle the selection of one of the discovered devices."""
+        if user_input is None and len(self.discovered) > 1:
+            options = [
+                selector.SelectOptionDict(
+                    value=str(unit),
+                    label=f"{unit}: {info.model} {info.serial_number}" if info else f"{unit}: unknown device",
+                )
+                for unit, info in self.discovered.items()
+            ]
+            data_schema = vol.Schema(
+                {
+                    vol.Required(CONF_ADDRESS): selector.SelectSelector(
+                        selector.SelectSelectorConfig(options=options, mode=selector.SelectSelectorMode.LIST)
+                    ),
+                }
+            )
+            return self.async_show_form(step_id="unit", data_schema=data_schema)
+
+        unit = int(user_input[CONF_ADDRESS]) if user_input is not None else next(iter(self.discovered))
+        self.data[CONF_ADDRESS] = unit
+
+        if device_info := self.discovered[unit]:
+            return self._async_show_device_form(
+                model=device_info.model,
+                mppt_trackers=device_info.mppt_trackers,
+                grid_phases=device_info.grid_phases,
+                modbus_version=device_info.modbus_version,
+                detected_type=device_info.device_type
+            )
+        else:
+            return self._async_show_device_form()
+
     async def async_step_device(self, user_input=None) -> FlowResult:
         """Handle the device config flow."""
 
@@ -443,8 +601,14 @@ class GrowattLocalOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage the options for the custom integration."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                parse_register_ranges(user_input.get(CONF_PROXY_WRITABLE, ""))
+            except ValueError:
+                errors[CONF_PROXY_WRITABLE] = "register_ranges"
+            else:
+                return self.async_create_entry(title="", data=user_input)
 
         options = self.config_entry.options
         data = self.config_entry.data
@@ -457,8 +621,14 @@ class GrowattLocalOptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Optional(CONF_POWER_SCAN_ENABLED, default=options.get(CONF_POWER_SCAN_ENABLED, data.get(CONF_POWER_SCAN_ENABLED, False))): bool,
                 vol.Optional(CONF_POWER_SCAN_INTERVAL, default=options.get(CONF_POWER_SCAN_INTERVAL, data.get(CONF_POWER_SCAN_INTERVAL, 5))): int,
                 vol.Optional(CONF_ADDRESS, default=options.get(CONF_ADDRESS, data.get(CONF_ADDRESS, None))): int,
+                vol.Optional(CONF_IO_THREAD, default=options.get(CONF_IO_THREAD, False)): bool,
+                vol.Optional(CONF_POLLER_PROCESS, default=options.get(CONF_POLLER_PROCESS, False)): bool,
+                vol.Optional(CONF_PROXY_HOST, default=options.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST)): str,
+                vol.Optional(CONF_PROXY_PORT, default=options.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT)): vol.All(int, vol.Range(min=0, max=65535)),
+                vol.Optional(CONF_PROXY_MAX_AGE, default=options.get(CONF_PROXY_MAX_AGE, DEFAULT_PROXY_MAX_AGE)): vol.All(int, vol.Range(min=0)),
+                vol.Optional(CONF_PROXY_WRITABLE, default=options.get(CONF_PROXY_WRITABLE, "")): str,
             }
         )
 
-        return self.async_show_form(step_id="init", data_schema=data_schema)
+        return self.async_show_form(step_id="init", data_schema=data_schema, errors=errors)
 
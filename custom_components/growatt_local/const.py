@@ -12,6 +12,8 @@ CONF_BAUDRATE = "baudrate"
 CONF_STOPBITS = "stopbits"
 CONF_PARITY = "parity"
 CONF_BYTESIZE = "bytesize"
+CONF_IO_THREAD = "io_thread"
+CONF_DETECT = "detect"
 
 CONF_DC_STRING = "dc_string"
 CONF_AC_PHASES = "ac_phases"
@@ -19,6 +21,13 @@ CONF_AC_PHASES = "ac_phases"
 CONF_POWER_SCAN_INTERVAL = "power_scan_interval"
 CONF_POWER_SCAN_ENABLED = "power_scan_enabled"
 
+CONF_POLLER_PROCESS = "poller_process"
+
+CONF_PROXY_HOST = "proxy_host"
+CONF_PROXY_PORT = "proxy_port"
+CONF_PROXY_MAX_AGE = "proxy_max_age"
+CONF_PROXY_WRITABLE = "proxy_writable"
+
 CONF_SERIAL_NUMBER = "serial_number"
 CONF_FIRMWARE = "firmware"
 
@@ -35,6 +44,41 @@ DEFAULT_PLANT_ID = "0"
 
 DEFAULT_NAME = "Growatt Modbus"
 
+# Unit addresses searched when no address is given in the config flow
+DISCOVERY_UNITS = range(1, 33)
+
+# Proxy port 0 disables the Modbus proxy
+DEFAULT_PROXY_HOST = "127.0.0.1"
+DEFAULT_PROXY_PORT = 0
+DEFAULT_PROXY_MAX_AGE = 5
+
+# Storage of the profile learned from the device and of the last values, saved periodically (s) and on shutdown
+PROFILE_STORAGE_VERSION = 1
+SNAPSHOT_STORAGE_VERSION = 1
+PROFILE_SAVE_INTERVAL = 900
+
 DOMAIN = "growatt_local"
 
+# Coordinator listener context updated on every cycle with the transport metrics
+METRICS_CONTEXT = "transport_metrics"
+
+# hass.data key set once the metrics view is registered, views can't be unregistered
+DATA_METRICS_VIEW = f"{DOMAIN}_metrics_view"
+
+# hass.data key of the running GrowattProfiler, and the interval (s) to check it stopped
+DATA_PROFILER = f"{DOMAIN}_profiler"
+PROFILER_WAIT = 0.1
+
 PLATFORMS = [Platform.SENSOR, Platform.SWITCH]
+
+SERVICE_START_TRACE = "start_trace"
+SERVICE_EXPORT_TRACE = "export_trace"
+SERVICE_PROFILE = "profile"
+
+ATTR_CAPACITY = "capacity"
+ATTR_FILENAME = "filename"
+ATTR_STOP = "stop"
+ATTR_CYCLES = "cycles"
+ATTR_MEMORY = "memory"
+
+DEFAULT_TRACE_FILENAME = "growatt_local_trace.json"
@@ -0,0 +1,88 @@
+"""Diagnostics support for the Growatt integration."""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_IP_ADDRESS
+from homeassistant.core import HomeAssistant
+
+from .API.device_type.base import GrowattDeviceRegisters, ATTR_SERIAL_NUMBER
+from .API.utils import ReadPlan, RegisterImage
+from .const import CONF_SERIAL_NUMBER, DOMAIN
+
+TO_REDACT = {CONF_SERIAL_NUMBER, CONF_IP_ADDRESS, ATTR_SERIAL_NUMBER}
+
+
+def _plan(device, keys: set[int], holding: bool = False) -> list[dict[str, Any]]:
+    if not keys:
+        return []
+
+    # the plan is determined apart from the cache, leaving the planning of the updates and its metrics untouched
+    plan: ReadPlan = device.create_plan(keys, holding)
+    return [
+        {"start": start, "length": length, "registers": [register.name for register in registers]}
+        for (start, length), registers in plan.blocks
+    ]
+
+
+def _image(image: RegisterImage, registers: tuple[GrowattDeviceRegisters, ...]) -> list[dict[str, Any]]:
+    """Raw register values and their age per mapped range, the registers holding identifiers are redacted."""
+    redacted = {
+        register.register + i
+        for register in registers
+        if register.name in TO_REDACT
+        for i in range(register.length)
+    }
+    now = time.monotonic()
+
+    return [
+        {
+            "start": start,
+            "length": length,
+            "values": [
+                REDACTED if address in redacted else image.get(address)
+                for address in range(start, start + length)
+            ],
+            "age": [
+                None if (age := image.age(address, now)) is None else round(age, 3)
+                for address in range(start, start + length)
+            ],
+        }
+        for start, length in image.ranges()
+    ]
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.data[CONF_SERIAL_NUMBER]]
+    device = coordinator.growatt_api
+    diagnostics = {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": async_redact_data(entry.options, TO_REDACT),
+        },
+        "poller_process": coordinator.poller is not None,
+        "values": async_redact_data(dict(coordinator.data), TO_REDACT),
+    }
+
+    if coordinator.poller is not None:
+        # the device in this process never polls, its plans, register image and metrics would be empty
+        return diagnostics
+
+    return diagnostics | {
+        "read_plan": {
+            "input": _plan(device, coordinator.keys),
+            "power": _plan(device, coordinator.p_keys),
+            "holding": _plan(device, coordinator.holding_keys, holding=True),
+        },
+        "register_image": {
+            "input": _image(device.input_image, device.input_register),
+            "holding": _image(device.holding_image, device.holding_register),
+        },
+        "transport": device.metrics.as_dict(),
+        "device": device.device_metrics.as_dict(),
+        "profile": async_redact_data(device.profile(), TO_REDACT),
+    }
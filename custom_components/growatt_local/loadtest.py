@@ -0,0 +1,245 @@
+"""
+Load test of the integration with many simulated inverters in a headless Home Assistant test instance.
+
+For every fleet size a simulator serving one unit per device is started in a separate process, a config entry
+per device is set up and after a warm up the event loop lag, the CPU time per update cycle, the state writes
+per second and the memory in use are measured.
+
+Requires the Home Assistant test helpers of pytest-homeassistant-custom-component, run from the repository root:
+
+    python -m custom_components.growatt_local.loadtest --devices 20 50 100 --interval 2 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import resource
+import socket
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from homeassistant import loader
+from homeassistant.const import (
+    CONF_ADDRESS,
+    CONF_IP_ADDRESS,
+    CONF_MODEL,
+    CONF_NAME,
+    CONF_PORT,
+    CONF_SCAN_INTERVAL,
+    EVENT_STATE_CHANGED,
+)
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.setup import async_setup_component
+
+from .const import (
+    CONF_AC_PHASES,
+    CONF_DC_STRING,
+    CONF_FIRMWARE,
+    CONF_LAYER,
+    CONF_POWER_SCAN_ENABLED,
+    CONF_POWER_SCAN_INTERVAL,
+    CONF_SERIAL_NUMBER,
+    CONF_TCP,
+    DOMAIN,
+)
+
+try:
+    from pytest_homeassistant_custom_component.common import MockConfigEntry, async_test_home_assistant
+except ImportError:  # pragma: no cover
+    MockConfigEntry = async_test_home_assistant = None
+
+LAG_PROBE_INTERVAL = 0.1  # s
+
+
+@dataclass
+class LoadTestResult:
+    devices: int
+    entities: int
+    cycles: int
+    loop_lag_mean_ms: float
+    loop_lag_p99_ms: float
+    loop_lag_max_ms: float
+    cpu_per_cycle_ms: float
+    state_writes_per_sec: float
+    memory_mb: float
+    max_rss_mb: float
+
+
+class LoopLagProbe:
+    """Measures how late the event loop runs a callback scheduled at a fixed interval."""
+
+    def __init__(self, interval: float = LAG_PROBE_INTERVAL) -> None:
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        self.lags.clear()
+        self._task = asyncio.create_task(self._probe())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def start_simulator(devices: int) -> tuple[asyncio.subprocess.Process, int]:
+    """Starts the simulator in its own process, keeping its load out of the measurements."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", f"{__package__}.API.simulator",
+        "--tcp", str(port), "--units", str(devices), "--seed", "1",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    await process.stdout.readline()
+    return process, port
+
+
+def entry_data(unit: int, port: int, interval: int) -> dict:
+    return {
+        CONF_LAYER: CONF_TCP,
+        CONF_IP_ADDRESS: "127.0.0.1",
+        CONF_PORT: port,
+        CONF_ADDRESS: unit,
+        CONF_NAME: f"Inverter {unit}",
+        CONF_MODEL: "Simulator",
+        CONF_FIRMWARE: "SIM1.0",
+        CONF_SERIAL_NUMBER: f"SIM{unit:07d}",
+        CONF_DC_STRING: 2,
+        CONF_AC_PHASES: 1,
+        CONF_SCAN_INTERVAL: interval,
+        CONF_POWER_SCAN_ENABLED: False,
+        CONF_POWER_SCAN_INTERVAL: interval,
+    }
+
+
+async def run_fleet(hass: HomeAssistant, devices: int, interval: int, warmup: float, duration: float) -> LoadTestResult:
+    process, port = await start_simulator(devices)
+    try:
+        hass.data.pop(loader.DATA_CUSTOM_COMPONENTS, None)
+        await async_setup_component(hass, "sun", {})
+
+        for unit in range(1, devices + 1):
+            entry = MockConfigEntry(domain=DOMAIN, data=entry_data(unit, port, interval), unique_id=f"SIM{unit:07d}")
+            entry.add_to_hass(hass)
+            await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+        cycles = 0
+        for coordinator in hass.data[DOMAIN].values():
+            update = coordinator._async_update_data
+
+            async def counted(update=update):
+                nonlocal cycles
+                cycles += 1
+                return await update()
+
+            coordinator._async_update_data = counted
+
+        state_writes = 0
+
+        @callback
+        def state_changed(event: Event) -> None:
+            nonlocal state_writes
+            state_writes += 1
+
+        await asyncio.sleep(warmup)
+
+        remove = hass.bus.async_listen(EVENT_STATE_CHANGED, state_changed)
+        probe = LoopLagProbe()
+        tracemalloc.start()
+        cycles = 0
+        probe.start()
+        cpu = time.process_time()
+        started = time.monotonic()
+
+        await asyncio.sleep(duration)
+
+        cpu = time.process_time() - cpu
+        elapsed = time.monotonic() - started
+        await probe.stop()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        remove()
+
+        lags = sorted(probe.lags) or [0.0]
+        entities = len(hass.states.async_entity_ids())
+
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            await hass.config_entries.async_unload(entry.entry_id)
+    finally:
+        process.terminate()
+        await process.wait()
+
+    return LoadTestResult(
+        devices=devices,
+        entities=entities,
+        cycles=cycles,
+        loop_lag_mean_ms=1000 * statistics.fmean(lags),
+        loop_lag_p99_ms=1000 * lags[min(len(lags) - 1, int(0.99 * len(lags)))],
+        loop_lag_max_ms=1000 * lags[-1],
+        cpu_per_cycle_ms=1000 * cpu / cycles if cycles else 0.0,
+        state_writes_per_sec=state_writes / elapsed,
+        memory_mb=memory / 2 ** 20,
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+async def run(fleets: list[int], interval: int, warmup: float, duration: float) -> list[LoadTestResult]:
+    results = []
+    for devices in fleets:
+        async with async_test_home_assistant() as hass:
+            results.append(await run_fleet(hass, devices, interval, warmup, duration))
+            await hass.async_stop(force=True)
+
+        print_result(results[-1])
+
+    return results
+
+
+def print_result(result: LoadTestResult) -> None:
+    print(
+        f"{result.devices:>4} devices {result.entities:>6} entities {result.cycles:>6} cycles | "
+        f"lag mean {result.loop_lag_mean_ms:6.1f} ms p99 {result.loop_lag_p99_ms:6.1f} ms "
+        f"max {result.loop_lag_max_ms:6.1f} ms | cpu {result.cpu_per_cycle_ms:6.2f} ms/cycle | "
+        f"{result.state_writes_per_sec:8.1f} writes/s | {result.memory_mb:7.1f} MB traced "
+        f"{result.max_rss_mb:7.1f} MB rss"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Growatt integration load test")
+    parser.add_argument("--devices", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--interval", type=int, default=2, help="scan interval in seconds")
+    parser.add_argument("--warmup", type=float, default=10.0, help="seconds before measuring")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds measured per fleet size")
+    parser.add_argument("--json", type=Path, help="write the scaling report to this file")
+    args = parser.parse_args()
+
+    if async_test_home_assistant is None:
+        parser.error("pytest-homeassistant-custom-component is required for the load test")
+
+    results = asyncio.run(run(args.devices, args.interval, args.warmup, args.duration))
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "interval": args.interval,
+            "duration": args.duration,
+            "results": [asdict(result) for result in results],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
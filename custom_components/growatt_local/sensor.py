@@ -2,14 +2,13 @@ from datetime import timedelta
 
 import logging
 import re
-from typing import Optional
+from typing import Any, Optional
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.const import (
     CONF_MODEL,
     CONF_NAME,
@@ -18,6 +17,7 @@ from homeassistant.const import (
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
 )
+from homeassistant.util import dt as dt_util
 
 from .API.device_type.base import (
     ATTR_INPUT_POWER,
@@ -27,8 +27,12 @@ from .API.device_type.base import (
     ATTR_CHARGE_POWER
 )
 
-from .sensor_types.sensor_entity_description import GrowattSensorEntityDescription
+from .sensor_types.sensor_entity_description import (
+    GrowattSensorEntityDescription,
+    GrowattDiagnosticSensorEntityDescription,
+)
 from .sensor_types.inverter import INVERTER_SENSOR_TYPES
+from .sensor_types.diagnostic import DIAGNOSTIC_SENSOR_TYPES
 from .const import (
     CONF_AC_PHASES,
     CONF_DC_STRING,
@@ -36,6 +40,7 @@ from .const import (
     CONF_SERIAL_NUMBER,
     CONF_POWER_SCAN_ENABLED,
     DOMAIN,
+    METRICS_CONTEXT,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -84,18 +89,36 @@ async def async_setup_entry(
         ]
     )
 
+    entities.extend(
+        GrowattDiagnosticEntity(coordinator, description=description, entry=config_entry)
+        for description in DIAGNOSTIC_SENSOR_TYPES
+    )
+
     async_add_entities(entities, True)
 
 
-class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SensorEntity):
-    """An entity using CoordinatorEntity."""
+class GrowattDeviceEntity(CoordinatorEntity, SensorEntity):
+    """
+    An entity using CoordinatorEntity.
+    The initial value is taken from the coordinator data, holding the values restored from before the restart.
+    """
 
     def __init__(self, coordinator, description, entry):
         """Pass coordinator to CoordinatorEntity."""
         super().__init__(coordinator, description.key)
+        self._index = coordinator.catalog.index[description.key]
         self.entity_description = description
         self._config_entry = entry
 
+        self._attr_native_value = coordinator.data.value(self._index)
+        if (
+            description.midnight_reset
+            and (updated := coordinator.data.updated(self._index)) is not None
+            and updated < dt_util.start_of_local_day().timestamp()
+        ):
+            # the value was restored from before midnight
+            self._attr_native_value = 0
+
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, entry.data[CONF_SERIAL_NUMBER])},
             manufacturer="Growatt",
@@ -123,15 +146,10 @@ class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SensorEntity):
                 )
             )
 
-        if (state := await self.async_get_last_state()) is None:
-            return
-
-        self._attr_native_value = state.state
-
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        if (state := self.coordinator.data.get(self.entity_description.key)) is None:
+        if (state := self.coordinator.data.value(self._index)) is None:
             return
         self._attr_native_value = state
         self.async_write_ha_state()
@@ -139,7 +157,47 @@ class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SensorEntity):
     @callback
     def _handle_midnight_update(self) -> None:
         """Handle updated data from the coordinator."""
-        if (state := self.coordinator.data.get(self.entity_description.key)) is None:
+        if (state := self.coordinator.data.value(self._index)) is None:
             return
         self._attr_native_value = state
         self.async_write_ha_state()
+
+
+class GrowattDiagnosticEntity(CoordinatorEntity, SensorEntity):
+    """Diagnostic entity showing a metric of the transport to the device."""
+
+    entity_description: GrowattDiagnosticSensorEntityDescription
+
+    def __init__(self, coordinator, description, entry):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, METRICS_CONTEXT)
+        self.entity_description = description
+        self._config_entry = entry
+
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.data[CONF_SERIAL_NUMBER])},
+        )
+
+    @property
+    def name(self):
+        return f"{self._config_entry.data[CONF_NAME]} {self.entity_description.name}"
+
+    @property
+    def unique_id(self) -> Optional[str]:
+        return f"{DOMAIN}_{self._config_entry.data[CONF_SERIAL_NUMBER]}_{self.entity_description.key}"
+
+    @property
+    def available(self) -> bool:
+        # the poller process owns the transport, the metrics of the transport in this process stay empty
+        return super().available and self.coordinator.poller is None
+
+    @property
+    def native_value(self) -> Any:
+        return self.entity_description.value(self.coordinator.growatt_api.metrics)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        if self.entity_description.attributes is None:
+            return None
+
+        return self.entity_description.attributes(self.coordinator.growatt_api.metrics)
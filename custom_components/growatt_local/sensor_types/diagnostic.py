@@ -0,0 +1,124 @@
+"""Growatt diagnostic sensor definitions based on the transport metrics."""
+from __future__ import annotations
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorStateClass,
+)
+from homeassistant.const import (
+    DATA_BYTES,
+    PERCENTAGE,
+    TIME_MILLISECONDS,
+)
+from homeassistant.helpers.entity import EntityCategory
+
+from .sensor_entity_description import GrowattDiagnosticSensorEntityDescription
+
+
+def _milliseconds(value: float | None) -> float | None:
+    return None if value is None else round(1000 * value, 1)
+
+
+DIAGNOSTIC_SENSOR_TYPES: tuple[GrowattDiagnosticSensorEntityDescription, ...] = (
+    GrowattDiagnosticSensorEntityDescription(
+        key="transaction_latency_p50",
+        name="Transaction latency",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: _milliseconds(metrics.latency_percentile(50)),
+        attributes=lambda metrics: {"histogram": metrics.histogram()},
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="transaction_latency_p95",
+        name="Transaction latency 95th percentile",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: _milliseconds(metrics.latency_percentile(95)),
+        attributes=lambda metrics: {
+            "blocks": {
+                f"{kind} {start}-{start + length - 1}": _milliseconds(block.average)
+                for (kind, start, length), block in metrics.blocks.items()
+            }
+        },
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="transactions",
+        name="Transactions",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.transactions,
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="transaction_timeouts",
+        name="Transaction timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.timeouts,
+        attributes=lambda metrics: {"disconnects": metrics.disconnects},
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="transaction_exceptions",
+        name="Exception responses",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.exceptions,
+        attributes=lambda metrics: {"exception_codes": dict(metrics.exception_codes)},
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="transaction_rereads",
+        name="Counter rereads",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.rereads,
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="bytes_in",
+        name="Bytes received",
+        native_unit_of_measurement=DATA_BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.bytes_in,
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="bytes_out",
+        name="Bytes sent",
+        native_unit_of_measurement=DATA_BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: metrics.bytes_out,
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="cycle_duration",
+        name="Update cycle duration",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: _milliseconds(metrics.cycle_duration),
+        attributes=lambda metrics: {"interval": metrics.cycle_interval},
+    ),
+    GrowattDiagnosticSensorEntityDescription(
+        key="cycle_utilization",
+        name="Update cycle utilization",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value=lambda metrics: None if (value := metrics.cycle_utilization) is None else round(100 * value, 1),
+    ),
+)
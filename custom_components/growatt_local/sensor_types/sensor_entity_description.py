@@ -1,7 +1,9 @@
 """Sensor Entity Description for the Growatt integration."""
 from __future__ import annotations
 
+from collections.abc import Callable
 from dataclasses import dataclass
+from typing import Any
 
 from homeassistant.components.sensor import SensorEntityDescription
 
@@ -17,3 +19,11 @@ class GrowattSensorRequiredKeysMixin:
 @dataclass
 class GrowattSensorEntityDescription(GrowattSensorRequiredKeysMixin, SensorEntityDescription):
     """Describes Growatt sensor entity."""
+
+
+@dataclass
+class GrowattDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describes Growatt diagnostic sensor entity based on the transport metrics."""
+
+    value: Callable[[Any], Any] = lambda metrics: None
+    attributes: Callable[[Any], dict[str, Any]] | None = None
@@ -7,12 +7,10 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     CONF_MODEL,
     CONF_NAME,
-    STATE_ON,
 )
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
 )
@@ -58,15 +56,19 @@ async def async_setup_entry(
     async_add_entities(entities, True)
 
 
-class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SwitchEntity):
-    """An entity using CoordinatorEntity."""
+class GrowattDeviceEntity(CoordinatorEntity, SwitchEntity):
+    """An entity using CoordinatorEntity, starting with the value restored in the coordinator data."""
 
     def __init__(self, coordinator, description, entry):
         """Pass coordinator to CoordinatorEntity."""
         super().__init__(coordinator, description.key)
+        self._index = coordinator.catalog.index[description.key]
         self.entity_description: GrowattSelectEntityDescription = description
         self._config_entry = entry
 
+        if (state := coordinator.data.value(self._index)) is not None:
+            self._attr_is_on = int(state) == 1
+
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, entry.data[CONF_SERIAL_NUMBER])},
             manufacturer="Growatt",
@@ -94,16 +96,10 @@ class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SwitchEntity):
         await self.coordinator.write_register(register.register, 0)
         await self.coordinator.force_refresh()
 
-    async def async_added_to_hass(self) -> None:
-        """Call when entity is about to be added to Home Assistant."""
-        await super().async_added_to_hass()
-        if state := await self.async_get_last_state():
-            self._attr_is_on = state.state == STATE_ON
-
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        if (state := self.coordinator.data.get(self.entity_description.key)) is None:
+        if (state := self.coordinator.data.value(self._index)) is None:
             _LOGGER.debug("Device type %s state %s", self._attr_unique_id, state)
             return
 
@@ -118,7 +114,7 @@ class GrowattDeviceEntity(CoordinatorEntity, RestoreEntity, SwitchEntity):
     @callback
     def _handle_midnight_update(self) -> None:
         """Handle updated data from the coordinator."""
-        if (state := self.coordinator.data.get(self.entity_description.key)) is None:
+        if (state := self.coordinator.data.value(self._index)) is None:
             _LOGGER.debug("Device type %s state %s", self._attr_unique_id, state)
             return
 
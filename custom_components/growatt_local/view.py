@@ -0,0 +1,29 @@
+"""HTTP view exporting the metrics of all devices in the Prometheus text format."""
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+
+from .API.metrics import format_prometheus
+from .const import DOMAIN
+
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class GrowattMetricsView(HomeAssistantView):
+    """
+    Metrics of the transports and devices of all configured entries, scraped at /api/growatt_local/metrics.
+    Entries polling in a separate process are left out, their transport isn't part of this process.
+    """
+
+    url = f"/api/{DOMAIN}/metrics"
+    name = f"api:{DOMAIN}:metrics"
+
+    async def get(self, request: web.Request) -> web.Response:
+        coordinators = request.app["hass"].data.get(DOMAIN, {})
+        body = format_prometheus([
+            (f'serial="{serial_number}"', coordinator.growatt_api.metrics, coordinator.growatt_api.device_metrics)
+            for serial_number, coordinator in coordinators.items()
+            if coordinator.poller is None
+        ])
+
+        return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE_PROMETHEUS})
@@ -0,0 +1,7 @@
+"""
+The API package is imported as top level package `API`, the integration package around it requires Home Assistant.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "custom_components" / "growatt_local"))
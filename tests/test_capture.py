@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from API.capture import (
+    CAPTURE_HEADER,
+    CAPTURE_MAGIC,
+    CAPTURE_RECORD_V1,
+    CaptureStatus,
+    GrowattRecorder,
+    GrowattReplay,
+    read_capture,
+)
+from API.const import ILLEGAL_DATA_ADDRESS, READ_INPUT_REGISTERS
+from API.exception import ModbusException
+from API.growatt import GrowattDevice, GrowattNetwork, get_device_info
+from API.simulator import GrowattSimulator, SimulatorFaults, serve
+
+
+async def record(path, devices, session):
+    """Runs the session against the simulated devices over TCP while recording it to the capture file."""
+    servers = await serve(devices, 0)
+    recorder = GrowattRecorder(GrowattNetwork("tcp", "127.0.0.1", servers[0].port), str(path))
+    try:
+        await recorder.connect()
+        return await session(recorder)
+    finally:
+        await recorder.close()
+        for server in servers:
+            await server.stop()
+
+
+async def replay(path, session):
+    replay = GrowattReplay(str(path), time_scale=0)
+    await replay.connect()
+    try:
+        return await session(replay)
+    finally:
+        await replay.close()
+
+
+def test_identify_recorded_and_replayed(tmp_path):
+    path = tmp_path / "identify.gwcap"
+
+    async def session(modbus):
+        return await get_device_info(modbus, 1)
+
+    recorded = asyncio.run(record(path, [GrowattSimulator(1)], session))
+    replayed = asyncio.run(replay(path, session))
+
+    assert recorded.serial_number
+    assert replayed == recorded
+
+
+def test_updates_recorded_and_replayed(tmp_path):
+    path = tmp_path / "updates.gwcap"
+
+    async def session(modbus):
+        device = GrowattDevice(modbus, 1)
+        keys = {register.register for register in device.input_register}
+        return [await device.update(keys) for _ in range(2)]
+
+    recorded = asyncio.run(record(path, [GrowattSimulator(1)], session))
+    replayed = asyncio.run(replay(path, session))
+
+    assert recorded[0]
+    assert replayed == recorded
+
+
+def test_hole_learning_replayed(tmp_path):
+    path = tmp_path / "holes.gwcap"
+    faults = SimulatorFaults(input_holes=((3000, 200),))
+
+    async def session(modbus):
+        device = GrowattDevice(modbus, 1)
+        keys = {register.register for register in device.input_register}
+        results = [await device.update(keys) for _ in range(2)]
+        return results, device.input_holes.keys()
+
+    recorded, recorded_holes = asyncio.run(record(path, [GrowattSimulator(1, faults=faults)], session))
+    replayed, replayed_holes = asyncio.run(replay(path, session))
+
+    assert recorded_holes
+    assert replayed_holes == recorded_holes
+    assert replayed == recorded
+
+
+def test_version_1_capture(tmp_path):
+    path = tmp_path / "v1.gwcap"
+    with open(path, "wb") as file:
+        file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, 1, 1000.0))
+        file.write(CAPTURE_RECORD_V1.pack(0.0, 0.01, READ_INPUT_REGISTERS, 1, CaptureStatus.Ok, 0, 2) + b"\x01\x00\x02\x00")
+        file.write(CAPTURE_RECORD_V1.pack(0.1, 0.01, READ_INPUT_REGISTERS, 1, CaptureStatus.Error, 5, 1))
+
+    with open(path, "rb") as file:
+        start, records = read_capture(file)
+        records = list(records)
+
+    assert start == 1000.0
+    assert records[0].values == (1, 2)
+    assert records[1].status == CaptureStatus.Error
+    assert records[1].exception_code is None
+
+
+def test_exception_code_replayed(tmp_path):
+    path = tmp_path / "refused.gwcap"
+
+    async def session(modbus):
+        with pytest.raises(ModbusException) as error:
+            await modbus.read_input_registers(3000, 1, 1)
+        return error.value.exception_code
+
+    faults = SimulatorFaults(input_holes=((3000, 1),))
+    assert asyncio.run(record(path, [GrowattSimulator(1, faults=faults)], session)) == ILLEGAL_DATA_ADDRESS
+    assert asyncio.run(replay(path, session)) == ILLEGAL_DATA_ADDRESS
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+INTEGRATION = Path(__file__).parents[1] / "custom_components" / "growatt_local"
+
+
+@pytest.mark.parametrize("command", [
+    ["API", "plan", "--keys", "input_power,output_power"],
+    ["API.benchmark", "--help"],
+    ["API.simulator", "--help"],
+    ["API.poller", "--help"],
+])
+def test_entry_points_without_home_assistant(command):
+    """The documented entry points run from the directory of the integration without importing it."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", *command],
+        cwd=INTEGRATION,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in result.stderr.splitlines() if "|" in line}
+    assert not imported & {"homeassistant", "voluptuous", "growatt_local"}
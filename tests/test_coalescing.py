@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from API.growatt import GrowattDevice
+from API.metrics import GrowattTransportMetrics
+
+
+class SlowTransport:
+    """Transport answering reads with the addresses after a delay, counting the transactions."""
+
+    trace_name = "slow"
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.requests = 0
+        self.metrics = GrowattTransportMetrics()
+
+    async def read_input_registers(self, start_index, length, unit):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        return list(range(start_index, start_index + length))
+
+    read_holding_registers = read_input_registers
+
+
+def test_overlapping_reads_share_a_transaction():
+    device = GrowattDevice(SlowTransport(), 1)
+
+    async def run():
+        return await asyncio.gather(device.read_input_registers(0, 10), device.read_input_registers(2, 3))
+
+    whole, part = asyncio.run(run())
+
+    assert whole == list(range(10))
+    assert part == [2, 3, 4]
+    assert device.modbus.requests == 1
+    assert device.device_metrics.coalesced == 1
+
+
+def test_shared_read_survives_cancelled_caller():
+    device = GrowattDevice(SlowTransport(), 1)
+
+    async def run():
+        first = asyncio.create_task(device.read_input_registers(0, 10))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(device.read_input_registers(0, 10))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == list(range(10))
+    assert device.modbus.requests == 1
+
+
+def test_read_after_cancelled_read():
+    device = GrowattDevice(SlowTransport(), 1)
+    keys = {register.register for register in device.input_register}
+
+    async def run():
+        update = asyncio.create_task(device.update(keys))
+        await asyncio.sleep(0.01)
+        update.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await update
+        # the cancelled transaction hasn't finished yet, the new read mustn't join it
+        return await device.update(keys)
+
+    assert asyncio.run(run())
+    assert not device._in_flight
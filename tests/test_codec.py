@@ -0,0 +1,92 @@
+import pytest
+
+from API.device_type.base import ATTR_TIME_1, ATTR_TIME_1_START, GrowattDeviceRegisters
+from API.device_type.inverter import HOLDING_REGISTERS, INPUT_REGISTERS
+from API.proxy import parse_register_ranges
+from API.utils import RegisterImage, encode_bit_fields, process_registers
+
+TIME_1 = next(register for register in HOLDING_REGISTERS if register.name == ATTR_TIME_1)
+TIME_1_START = next(register for register in HOLDING_REGISTERS if register.name == ATTR_TIME_1_START)
+
+
+def test_image_maps_register_ranges():
+    image = RegisterImage((
+        GrowattDeviceRegisters(name="a", register=0, value_type=int, length=2),
+        GrowattDeviceRegisters(name="b", register=2, value_type=int),
+        GrowattDeviceRegisters(name="c", register=10, value_type=int),
+    ))
+
+    assert image.ranges() == [(0, 3), (10, 1)]
+    assert 0 not in image
+    assert image.get(0, -1) == -1
+
+
+def test_image_write_ignores_unmapped_addresses():
+    image = RegisterImage(INPUT_REGISTERS)
+    image.write(0, list(range(200)), timestamp=5.0)
+
+    mapped = {address for start, length in image.ranges() for address in range(start, start + length)}
+    for address in range(200):
+        if address in mapped:
+            assert image[address] == address
+            assert image.updated(address) == 5.0
+            assert image.age(address, now=7.0) == 2.0
+        else:
+            assert address not in image
+            assert image.updated(address) is None
+            with pytest.raises(KeyError):
+                image[address]
+
+
+def test_image_copy_is_independent():
+    image = RegisterImage(INPUT_REGISTERS)
+    image.write(0, [1, 2])
+    copy = image.copy()
+    image.write(0, [3, 4])
+
+    assert (copy[0], copy[1]) == (1, 2)
+    assert (image[0], image[1]) == (3, 4)
+
+
+def test_bit_fields_round_trip():
+    fields = {
+        "start_hour": 7, "start_minutes": 30, "priority": "Battery", "enabled": "Yes", "end_hour": 16, "end_minutes": 5
+    }
+    values = encode_bit_fields(TIME_1, fields)
+    image = RegisterImage((TIME_1,))
+    image.write(TIME_1.register, values)
+
+    assert len(values) == 2
+    assert process_registers((TIME_1,), image) == {
+        ATTR_TIME_1: "Start: 07:30, End: 16:05, Priority: Battery, Enabled: Yes"
+    }
+
+
+def test_bit_fields_keep_current_bits():
+    current = encode_bit_fields(TIME_1_START, {"hour": 7, "minutes": 30})
+    # priority and enabled bits are set on the register next to the time
+    current = [current[0] | 0xE000]
+
+    values = encode_bit_fields(TIME_1_START, {"minutes": 45}, current)
+
+    assert values == [current[0] - 30 + 45]
+
+
+def test_bit_fields_reject_unknown():
+    with pytest.raises(ValueError):
+        encode_bit_fields(TIME_1_START, {"seconds": 1})
+
+    with pytest.raises(ValueError):
+        encode_bit_fields(GrowattDeviceRegisters(name="a", register=0, value_type=int), {"minutes": 1})
+
+
+def test_parse_register_ranges():
+    assert parse_register_ranges("") == set()
+    assert parse_register_ranges("3049, 3038-3040,,") == {3038, 3039, 3040, 3049}
+    assert parse_register_ranges("0-0,65535") == {0, 65535}
+
+
+@pytest.mark.parametrize("value", ("5-3", "-1", "65536", "a", "1-2-3"))
+def test_parse_register_ranges_invalid(value):
+    with pytest.raises(ValueError):
+        parse_register_ranges(value)
@@ -0,0 +1,52 @@
+import asyncio
+
+from pymodbus.exceptions import ConnectionException
+
+from API.growatt import GrowattSerial, detect_serial_settings
+from API.simulator import GrowattSimulator, serve
+
+SETTINGS = ((19200, 8, "None", 1), (9600, 8, "None", 1))
+
+
+async def detect(unit=1, settings=SETTINGS):
+    """Runs the detection against a simulated device on a pseudo terminal."""
+    servers = await serve([GrowattSimulator(1)], rtu=True)
+    try:
+        return await detect_serial_settings(servers[0].port, unit, settings)
+    finally:
+        for server in servers:
+            await server.stop()
+
+
+def test_detects_responding_setting():
+    assert asyncio.run(detect(settings=SETTINGS[1:])) == (9600, 8, "None", 1)
+
+
+def test_silent_unit_not_detected():
+    assert asyncio.run(detect(unit=2)) is None
+
+
+def test_port_not_opened_moves_on(monkeypatch):
+    connect = GrowattSerial.connect
+
+    async def refuse(self):
+        if self.client.comm_params.baudrate == 19200:
+            return False
+        return await connect(self)
+
+    monkeypatch.setattr(GrowattSerial, "connect", refuse)
+
+    assert asyncio.run(detect()) == (9600, 8, "None", 1)
+
+
+def test_connection_lost_moves_on(monkeypatch):
+    probe = GrowattSerial.probe
+
+    async def drop(self, unit):
+        if self.client.comm_params.baudrate == 19200:
+            raise ConnectionException("Connection lost")
+        return await probe(self, unit)
+
+    monkeypatch.setattr(GrowattSerial, "probe", drop)
+
+    assert asyncio.run(detect()) == (9600, 8, "None", 1)
@@ -0,0 +1,275 @@
+import asyncio
+import json
+from contextlib import aclosing
+from datetime import date, datetime
+
+import pytest
+from pymodbus.register_read_message import ReadHoldingRegistersResponse
+from pymodbus.register_write_message import WriteSingleRegisterResponse
+
+from API.exception import ModbusException
+from API.growatt import (
+    LEARNED_EXPIRY,
+    MINIMUM_BLOCK_LENGTH,
+    GrowattDevice,
+    GrowattModbusBase,
+    GrowattNetwork,
+    GrowattSerial,
+)
+from API.metrics import GrowattTransportMetrics
+from API.const import ILLEGAL_DATA_ADDRESS, ILLEGAL_DATA_VALUE
+from API.simulator import GrowattSimulator, SimulatorFaults, serve
+
+BUSY = 0x06
+
+
+class FakeTransport:
+    """
+    Transport answering reads with the given values or zeros,
+    except for the given missing keys and the maximum block length.
+    """
+
+    trace_name = "fake"
+
+    def __init__(self, missing=(), max_length=125, busy=0):
+        self.missing = set(missing)
+        self.max_length = max_length
+        self.busy = busy
+        self.requests = 0
+        self.values = {}
+        self.metrics = GrowattTransportMetrics()
+
+    async def read_input_registers(self, start_index, length, unit):
+        self.requests += 1
+        if self.busy:
+            self.busy -= 1
+            raise ModbusException("busy", BUSY)
+        if length > self.max_length:
+            raise ModbusException("too long", ILLEGAL_DATA_VALUE)
+        if self.missing.intersection(range(start_index, start_index + length)):
+            raise ModbusException("missing", ILLEGAL_DATA_ADDRESS)
+        return [self.values.get(key, 0) for key in range(start_index, start_index + length)]
+
+    read_holding_registers = read_input_registers
+
+
+def update(device):
+    return asyncio.run(device.update({register.register for register in device.input_register}))
+
+
+def test_missing_registers_are_left_out():
+    device = GrowattDevice(FakeTransport(missing={40}), 1)
+    update(device)
+
+    assert set(device.input_holes) == {40}
+    requests = device.modbus.requests
+    update(device)
+    assert device.modbus.requests - requests == len(device.plan({r.register for r in device.input_register}).blocks)
+
+
+def test_unchanged_blocks_are_not_decoded():
+    transport = FakeTransport()
+    device = GrowattDevice(transport, 1)
+    blocks = device.plan({register.register for register in device.input_register}).blocks
+
+    assert update(device)
+    assert device.device_metrics.decodes == len(blocks)
+    assert update(device) == {}
+    assert device.device_metrics.decodes == len(blocks)
+
+    (start, _), registers = blocks[-1]
+    transport.values[start] = 1
+    results = update(device)
+
+    assert results
+    assert set(results) <= {register.name for register in registers}
+    assert device.device_metrics.decodes == len(blocks) + 1
+
+
+def test_created_plan_leaves_cache_untouched():
+    device = GrowattDevice(FakeTransport(missing={40}), 1)
+    update(device)
+    keys = {register.register for register in device.input_register}
+    cached = device.plan(keys)
+    metrics = device.device_metrics.as_dict()
+
+    assert device.create_plan({40, 41}) == device.create_plan({41})
+    assert device.create_plan(keys) == cached
+    assert device.device_metrics.as_dict() == metrics
+    assert len(device._input_cache) == 1
+
+
+def test_refused_block_halves_maximum_length():
+    device = GrowattDevice(FakeTransport(max_length=40), 1)
+    update(device)
+    update(device)
+
+    assert MINIMUM_BLOCK_LENGTH <= device.max_length <= 40
+    assert not device.input_holes
+
+
+def test_busy_device_learns_nothing():
+    device = GrowattDevice(FakeTransport(busy=1), 1)
+
+    with pytest.raises(ModbusException):
+        update(device)
+
+    assert device.max_length == 100
+    assert not device.input_holes
+
+
+def test_maximum_length_has_a_floor():
+    device = GrowattDevice(FakeTransport(max_length=2), 1)
+
+    for _ in range(5):
+        with pytest.raises(ModbusException):
+            update(device)
+
+    assert device.max_length == MINIMUM_BLOCK_LENGTH
+
+
+def test_profile_round_trip_and_expiry():
+    device = GrowattDevice(FakeTransport(missing={40}, max_length=40), 1)
+    update(device)
+    update(device)
+    profile = json.loads(json.dumps(device.profile()))
+
+    restored = GrowattDevice(FakeTransport(), 1)
+    restored.load_profile(profile)
+    assert restored.input_holes == device.input_holes
+    assert restored.max_length == device.max_length
+
+    for key in restored.input_holes:
+        restored.input_holes[key] -= LEARNED_EXPIRY
+    restored._max_length_learned -= LEARNED_EXPIRY
+    restored._update_expiry()
+    update(restored)
+    assert not restored.input_holes
+    assert restored.max_length == 100
+
+
+class FakeClient:
+    """Client recording the transactions, failing when two overlap on the connection."""
+
+    def __init__(self):
+        self.active = False
+        self.writes = []
+
+    async def _transaction(self, response):
+        assert not self.active
+        self.active = True
+        await asyncio.sleep(0)
+        self.active = False
+        return response
+
+    async def read_holding_registers(self, address, count, slave=0):
+        return await self._transaction(ReadHoldingRegistersResponse([24, 5, 6, 7, 8, 9]))
+
+    async def write_register(self, address, value, slave=0):
+        self.writes.append((address, value))
+        return await self._transaction(WriteSingleRegisterResponse(address, value))
+
+
+class FakeModbus(GrowattModbusBase):
+    def __init__(self):
+        self.client = FakeClient()
+
+
+def test_device_time_is_serialized_with_other_requests():
+    modbus = FakeModbus()
+
+    async def run():
+        return await asyncio.gather(
+            modbus.read_device_time(1),
+            modbus.write_device_time(2024, 5, 6, 7, 8, 9, 1),
+            modbus.read_holding_registers(45, 6, 1),
+        )
+
+    device_time, _, _ = asyncio.run(run())
+
+    assert device_time == datetime(2024, 5, 6, 7, 8, 9)
+    assert modbus.client.writes == [(45, 24), (46, 5), (47, 6), (48, 7), (49, 8), (50, 9)]
+    assert modbus.metrics.transactions == 8
+
+
+def test_cancelled_stream_leaves_no_tasks():
+    device = GrowattDevice(FakeTransport(), 1)
+    plan = device.plan({register.register for register in device.input_register})
+
+    async def run():
+        async def consume():
+            async with aclosing(device.stream(plan, 10)) as stream:
+                async for _ in stream:
+                    pass
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(run()) == set()
+
+
+class GlitchTransport(FakeTransport):
+    """Transport failing the single register reads of a counter, as used to confirm an implausible value."""
+
+    failing = True
+
+    async def read_input_registers(self, start_index, length, unit):
+        if length == 2 and self.failing:
+            self.requests += 1
+            raise ModbusException("busy", BUSY)
+        return await super().read_input_registers(start_index, length, unit)
+
+
+def test_failed_counter_confirmation_keeps_previous_value():
+    device = GrowattDevice(GlitchTransport(), 1)
+    keys = {register.register for register in device.input_register}
+    monotonic = [register for register in device.input_register if register.monotonic and not register.daily_reset]
+    for register in monotonic:
+        device._counters[register.name] = (1000, date.today())
+
+    results = asyncio.run(device.update(keys))
+
+    for register in monotonic:
+        assert register.name not in results
+        assert device._counters[register.name][0] == 1000
+
+    # the unchanged blocks are checked again, the confirmation now succeeds
+    device.modbus.failing = False
+    results = asyncio.run(device.update(keys))
+
+    for register in monotonic:
+        assert results[register.name] == 0
+        assert device._counters[register.name][0] == 0
+
+
+def test_monotonic_registers_do_not_overlap():
+    words = {}
+    for register in GrowattDevice(FakeTransport(), 1).input_register:
+        if register.monotonic:
+            for key in range(register.register, register.register + register.length):
+                assert words.setdefault(key, register.name) == register.name
+
+
+@pytest.mark.parametrize("rtu", [False, True])
+def test_scan_ignores_late_responses(rtu):
+    """A unit answering after the timeout isn't found, and its late response isn't taken for the next unit."""
+
+    async def run():
+        devices = [GrowattSimulator(3, faults=SimulatorFaults(latency=0.45)), GrowattSimulator(6)]
+        servers = await serve(devices, None if rtu else 0, rtu)
+        modbus = GrowattSerial(servers[0].port) if rtu else GrowattNetwork("tcp", "127.0.0.1", servers[0].port)
+        try:
+            units = await modbus.scan_units(range(1, 9), 0.3, 8)
+            # the connection dropped by the timeouts is open again afterwards
+            await modbus.read_input_registers(0, 2, 6)
+            return units
+        finally:
+            await modbus.close()
+            for server in servers:
+                await server.stop()
+
+    assert list(asyncio.run(run())) == [6]
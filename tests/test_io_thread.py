@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from API.growatt import GrowattDevice, GrowattSerial
+from API.simulator import GrowattSimulator, SimulatorFaults, serve
+
+
+async def session(devices, run, io_thread=True):
+    """Runs the session against the simulated devices on a pseudo terminal."""
+    servers = await serve(devices, rtu=True)
+    modbus = GrowattSerial(servers[0].port, io_thread=io_thread)
+    try:
+        await modbus.connect()
+        return await run(modbus)
+    finally:
+        await modbus.close()
+        for server in servers:
+            await server.stop()
+
+
+def update(modbus):
+    device = GrowattDevice(modbus, 1)
+    return device.update({register.register for register in device.input_register})
+
+
+def test_update_on_io_thread():
+    threads = []
+
+    async def run(modbus):
+        threads.append(modbus._io_thread)
+        return await update(modbus)
+
+    on_thread = asyncio.run(session([GrowattSimulator(1)], run))
+    on_loop = asyncio.run(session([GrowattSimulator(1)], update, io_thread=False))
+
+    assert on_thread
+    assert on_thread.keys() == on_loop.keys()
+    assert threads[0] is not threading.current_thread()
+    # closing the transport stops the thread
+    assert not threads[0].is_alive()
+
+
+def test_cancelled_read_on_io_thread():
+    async def run(modbus):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(modbus.read_input_registers(0, 2, 1), 0.1)
+        # the late response of the cancelled read isn't taken for the response of the next read
+        await asyncio.sleep(0.3)
+        return await modbus.read_input_registers(100, 2, 1)
+
+    faults = SimulatorFaults(latency=0.2)
+    values = asyncio.run(session([GrowattSimulator(1, faults=faults)], run))
+    expected = asyncio.run(session([GrowattSimulator(1)], lambda modbus: modbus.read_input_registers(100, 2, 1)))
+
+    assert values == expected
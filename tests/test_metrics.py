@@ -0,0 +1,62 @@
+import re
+
+from API.metrics import LATENCY_BUCKETS, GrowattDeviceMetrics, GrowattTransportMetrics, format_prometheus
+
+SAMPLE = re.compile(r'^([a-z_]+)\{serial="(A|B)"(?:,[a-z]+="[^"]*")*\} (-?[0-9.e+-]+)$')
+
+
+def metrics() -> GrowattTransportMetrics:
+    transport = GrowattTransportMetrics()
+    transport.request(8)
+    transport.response("input", 0, 10, 0.02, 25)
+    transport.request(8)
+    transport.response("input", 0, 10, 0.04, 5, 2)
+    transport.request(8)
+    transport.failure(timeout=True)
+    return transport
+
+
+def test_prometheus_format():
+    text = format_prometheus([('serial="A"', metrics(), GrowattDeviceMetrics())])
+    lines = text.splitlines()
+
+    assert text.endswith("\n")
+    described = set()
+    for line in lines:
+        if line.startswith("# HELP "):
+            described.add(line.split()[2])
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            assert name in described
+            assert kind in ("counter", "gauge", "histogram")
+        else:
+            assert (match := SAMPLE.match(line)), line
+            assert re.sub("_(bucket|sum|count)$", "", match[1]) in described
+
+    assert 'growatt_transactions_total{serial="A"} 3' in lines
+    assert 'growatt_transaction_timeouts_total{serial="A"} 1' in lines
+    assert 'growatt_bytes_sent_total{serial="A"} 24' in lines
+    assert 'growatt_exception_responses_total{serial="A",code="2"} 1' in lines
+
+
+def test_prometheus_histogram_is_cumulative():
+    lines = format_prometheus([('serial="A"', metrics(), GrowattDeviceMetrics())]).splitlines()
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in lines if line.startswith("growatt_transaction_latency_seconds_bucket")]
+
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 2
+    assert 'growatt_transaction_latency_seconds_count{serial="A"} 2' in lines
+    assert 'growatt_block_latency_seconds{serial="A",block="input 0-9"} 0.03' in lines
+
+
+def test_prometheus_multiple_sources_share_descriptions():
+    text = format_prometheus([
+        ('serial="A"', metrics(), GrowattDeviceMetrics()),
+        ('serial="B"', GrowattTransportMetrics(), GrowattDeviceMetrics()),
+    ])
+
+    assert text.count("# HELP growatt_transactions_total ") == 1
+    assert 'growatt_transactions_total{serial="B"} 0' in text.splitlines()
+    # the cycle duration is only reported once a cycle completed
+    assert "growatt_poll_cycle_duration_seconds{" not in text
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from API.device_type.inverter import HOLDING_REGISTERS, INPUT_REGISTERS
+from API.utils import create_read_plan, get_continuation_keys, keys_sequences, split_sequence
+
+
+@pytest.mark.parametrize("registers", (INPUT_REGISTERS, HOLDING_REGISTERS), ids=("input", "holding"))
+@pytest.mark.parametrize("maximum_length", (1, 2, 3, 5, 8, 20, 100))
+def test_random_plans_cover_registers(registers, maximum_length):
+    rng = random.Random(maximum_length)
+    keys = sorted({register.register for register in registers})
+
+    for _ in range(50):
+        selected = set(rng.sample(keys, rng.randint(1, len(keys))))
+        plan = create_read_plan(registers, selected, maximum_length)
+        continuation_keys = get_continuation_keys(
+            tuple(register for register in registers if register.register in selected)
+        )
+
+        for (start, length), _ in plan.blocks:
+            assert start not in continuation_keys
+            if length > maximum_length:
+                # only a chain of overlapping registers can't be split
+                assert set(range(start + 1, start + length)) <= continuation_keys
+
+        covered = {register.register for register in plan.registers}
+        assert selected <= covered
+
+
+def test_short_maximum_length_terminates():
+    plan = create_read_plan(
+        INPUT_REGISTERS, {0, 4, 11, 16, 20, 35, 43, 46, 65, 69, 71, 83, 87, 93, 95, 98, 3073, 3127}, 3
+    )
+
+    assert all(length <= 3 for (_, length), _ in plan.blocks)
+
+
+def test_register_start_within_another_register():
+    # 3039 is the start of a register as well as the second key of the register at 3038
+    plan = create_read_plan(HOLDING_REGISTERS, {43, 3039, 3049}, 100)
+
+    assert all(length <= 100 for (_, length), _ in plan.blocks)
+
+
+def test_sequences_split_on_gaps():
+    assert keys_sequences({0, 1, 2, 50, 51}, 100) == {(0, 3), (50, 2)}
+    assert keys_sequences(range(10), 40) == {(0, 10)}
+
+
+def test_sequences_keep_continuation_keys():
+    assert keys_sequences({0, 1, 2, 3}, 1, {1, 3}) == {(0, 2), (2, 2)}
+
+
+def test_split_sequence_on_gaps():
+    assert split_sequence([0, 1, 2, 50, 51], 100) == [3]
+    assert split_sequence([0, 1, 2, 3], 100) == []
+
+
+@pytest.mark.parametrize("maximum_length", (1, 4, 10, 25, 100))
+def test_random_sequences(maximum_length):
+    rng = random.Random(maximum_length)
+
+    for _ in range(50):
+        keys = sorted(rng.sample(range(300), rng.randint(1, 120)))
+        splits = split_sequence(keys, maximum_length)
+
+        assert splits == sorted(set(splits))
+        assert all(0 < index < len(keys) for index in splits)
+        # gaps of at least a quarter of the maximum length always separate blocks
+        for index, (key, next_key) in enumerate(zip(keys, keys[1:]), 1):
+            if next_key - key >= maximum_length / 4:
+                assert index in splits
+
+        # split sequences longer than the maximum are split again until the blocks fit
+        sequences = keys_sequences(keys, maximum_length)
+        assert all(length <= maximum_length for _, length in sequences)
+        covered = {key for start, length in sequences for key in range(start, start + length)}
+        assert set(keys) <= covered
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from pymodbus.exceptions import ModbusIOException
+
+from API.exception import ModbusException
+from API.poller import GrowattPoller, GrowattSnapshotRing
+
+
+class FailingDevice:
+    def __init__(self, error):
+        self.error = error
+
+    async def update(self, keys):
+        raise self.error
+
+    async def update_holding(self, keys):
+        return {}
+
+    def status(self, values):
+        return "normal"
+
+
+@pytest.fixture
+def ring():
+    ring = GrowattSnapshotRing.create(4, 4096)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+@pytest.mark.parametrize(
+    ("error", "status"),
+    ((ModbusIOException("timeout"), "no_response"), (ModbusException("failed", 4), "normal")),
+)
+def test_failed_tick_keeps_polling(ring, error, status):
+    notifications = []
+    poller = GrowattPoller(FailingDevice(error), ring, notifications.append)
+    poller.configure({0}, set(), set(), 60, 0)
+
+    asyncio.run(poller.tick())
+
+    assert poller._failed
+    assert poller.values["status"] == status
+    assert notifications == ["S 1"]
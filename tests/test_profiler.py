@@ -0,0 +1,33 @@
+import sys
+
+import pytest
+
+from API.profiler import GrowattProfiler
+
+
+def test_stop_waits_for_open_sections(tmp_path):
+    profiler = GrowattProfiler(10, memory=False)
+    first = profiler.section()
+    first.__enter__()
+
+    with profiler.section():
+        profiler.stop()
+
+    assert profiler.active
+    with pytest.raises(RuntimeError):
+        profiler.finish()
+
+    first.__exit__(None, None, None)
+    assert not profiler.active
+    assert sys.getprofile() is None
+
+    profiler.finish()
+    assert len(profiler.write(str(tmp_path))) == 2
+
+
+def test_sections_after_stop_are_not_profiled():
+    profiler = GrowattProfiler(1, memory=False)
+    profiler.stop()
+
+    with profiler.section():
+        assert not profiler.active
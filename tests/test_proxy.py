@@ -0,0 +1,61 @@
+import asyncio
+import struct
+
+from pymodbus.exceptions import ModbusIOException
+
+from API.const import (
+    GATEWAY_TARGET_FAILED,
+    ILLEGAL_DATA_ADDRESS,
+    ILLEGAL_DATA_VALUE,
+    READ_INPUT_REGISTERS,
+    SLAVE_DEVICE_FAILURE,
+)
+from API.exception import ModbusException
+from API.growatt import GrowattDevice
+from API.metrics import GrowattTransportMetrics
+from API.proxy import GrowattModbusProxy
+from API.server import exception_response, read_response
+
+
+class FailingTransport:
+    """Transport failing every read with the given error."""
+
+    trace_name = "failing"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.metrics = GrowattTransportMetrics()
+
+    async def read_input_registers(self, start_index, length, unit):
+        if self.error is not None:
+            raise self.error
+        return list(range(start_index, start_index + length))
+
+    read_holding_registers = read_input_registers
+
+
+def read(error, count=2):
+    proxy = GrowattModbusProxy(GrowattDevice(FailingTransport(error), 1), max_age=60)
+    return asyncio.run(proxy.handle(1, struct.pack(">BHH", READ_INPUT_REGISTERS, 0, count)))
+
+
+def test_read_forwarded():
+    assert read(None) == read_response(READ_INPUT_REGISTERS, [0, 1])
+
+
+def test_refusal_relayed():
+    error = ModbusException("Illegal data value", ILLEGAL_DATA_VALUE)
+    assert read(error) == exception_response(READ_INPUT_REGISTERS, ILLEGAL_DATA_VALUE)
+
+    error = ModbusException("Illegal data address", ILLEGAL_DATA_ADDRESS)
+    assert read(error) == exception_response(READ_INPUT_REGISTERS, ILLEGAL_DATA_ADDRESS)
+
+
+def test_invalid_response_is_device_failure():
+    error = ModbusException("Unexpected response length")
+    assert read(error) == exception_response(READ_INPUT_REGISTERS, SLAVE_DEVICE_FAILURE)
+
+
+def test_timeout_is_gateway_failure():
+    error = ModbusIOException("No response received")
+    assert read(error) == exception_response(READ_INPUT_REGISTERS, GATEWAY_TARGET_FAILED)
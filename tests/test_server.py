@@ -0,0 +1,111 @@
+import asyncio
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+from API.const import ILLEGAL_DATA_VALUE, READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS, WRITE_SINGLE_REGISTER
+from API.server import (
+    MAXIMUM_PENDING,
+    ModbusTcpServer,
+    exception_response,
+    request_valid,
+)
+
+
+def test_request_valid():
+    assert request_valid(struct.pack(">BHH", READ_INPUT_REGISTERS, 0, 10))
+    assert request_valid(struct.pack(">BHH", WRITE_SINGLE_REGISTER, 0, 1))
+    assert request_valid(struct.pack(">BHHBHH", WRITE_MULTIPLE_REGISTERS, 0, 2, 4, 1, 2))
+
+    assert not request_valid(b"")
+    assert not request_valid(bytes([READ_INPUT_REGISTERS]))
+    assert not request_valid(struct.pack(">BHHB", READ_INPUT_REGISTERS, 0, 10, 0))
+    assert not request_valid(struct.pack(">BHH", WRITE_MULTIPLE_REGISTERS, 0, 2))
+    # byte count not matching the register count or the values
+    assert not request_valid(struct.pack(">BHHBHH", WRITE_MULTIPLE_REGISTERS, 0, 2, 2, 1, 2))
+    assert not request_valid(struct.pack(">BHHBH", WRITE_MULTIPLE_REGISTERS, 0, 2, 4, 1))
+    assert not request_valid(struct.pack(">BHHB", WRITE_MULTIPLE_REGISTERS, 0, 0, 0))
+    assert not request_valid(bytes([0x2B]) * 254)
+
+
+async def exchange(frames: list[bytes], handler) -> list[bytes]:
+    server = ModbusTcpServer(handler)
+    await server.start()
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    try:
+        writer.write(b"".join(frames))
+        await writer.drain()
+        responses = []
+        while header := await reader.read(7):
+            if len(header) < 7:
+                break
+            length = struct.unpack(">H", header[4:6])[0]
+            responses.append(await reader.readexactly(length - 1))
+            if len(responses) == len(frames):
+                break
+        return responses
+    finally:
+        writer.close()
+        await server.stop()
+
+
+def frame(tid: int, pdu: bytes, length: int | None = None) -> bytes:
+    return struct.pack(">HHHB", tid, 0, len(pdu) + 1 if length is None else length, 1) + pdu
+
+
+def test_malformed_request_answered_with_exception():
+    calls = []
+
+    async def handler(unit, pdu):
+        calls.append(pdu)
+        return pdu
+
+    short = bytes([READ_INPUT_REGISTERS, 0])
+    responses = asyncio.run(exchange([frame(1, short)], handler))
+
+    assert responses == [exception_response(READ_INPUT_REGISTERS, ILLEGAL_DATA_VALUE)]
+    assert not calls
+
+
+def test_zero_length_closes_connection():
+    async def handler(unit, pdu):
+        return pdu
+
+    responses = asyncio.run(asyncio.wait_for(exchange([frame(1, b"", length=0)], handler), 5))
+
+    assert responses == []
+
+
+def test_pending_requests_are_bounded():
+    active = 0
+    peak = 0
+
+    async def handler(unit, pdu):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return pdu
+
+    request = struct.pack(">BHH", READ_INPUT_REGISTERS, 0, 1)
+    count = 3 * MAXIMUM_PENDING
+    responses = asyncio.run(exchange([frame(tid, request) for tid in range(count)], handler))
+
+    assert len(responses) == count
+    assert peak <= MAXIMUM_PENDING
+
+
+def test_import_without_terminal_support():
+    """Only the pseudo terminal server needs tty, like on Windows the API imports without it."""
+    code = "import sys; sys.modules['tty'] = sys.modules['termios'] = None; import API.growatt, API.proxy, API.capture"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parents[1] / "custom_components" / "growatt_local",
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from API.device_type.base import GrowattCatalog, GrowattSnapshot, ValueQuality
+
+
+@pytest.fixture
+def catalog():
+    return GrowattCatalog(("power", "energy", "status", "power"))
+
+
+def test_catalog_keeps_first_position(catalog):
+    assert catalog.names == ("power", "energy", "status")
+    assert len(catalog) == 3
+
+
+def test_export_leaves_out_missing_values(catalog):
+    snapshot = GrowattSnapshot(catalog)
+    snapshot.update({"power": 1200.5, "unknown": 1}, timestamp=10.0)
+
+    assert snapshot.export() == {"power": (1200.5, 10.0, ValueQuality.Good)}
+    assert dict(snapshot) == {"power": 1200.5}
+
+
+def test_restore_substitutes_exported_values(catalog):
+    snapshot = GrowattSnapshot(catalog)
+    snapshot.update({"power": 1200.5, "status": "normal"}, timestamp=10.0)
+    snapshot.update({"energy": 15.2}, timestamp=20.0)
+
+    # the export is stored as JSON, which turns the tuples into lists
+    exported = json.loads(json.dumps(snapshot.export()))
+    exported["removed"] = [1, 5.0, 1]
+    restored = GrowattSnapshot(catalog)
+    restored.restore(exported)
+
+    assert dict(restored) == dict(snapshot)
+    assert restored.timestamp == 20.0
+    for index, name in enumerate(catalog.names):
+        assert restored.updated(index) == snapshot.updated(index)
+        assert restored.quality(index) == ValueQuality.Substituted
+
+
+def test_read_values_replace_restored(catalog):
+    snapshot = GrowattSnapshot(catalog)
+    snapshot.restore({"power": (1000, 10.0, ValueQuality.Good)})
+    snapshot.update({"power": 1100}, timestamp=30.0)
+
+    index = catalog.index["power"]
+    assert snapshot["power"] == 1100
+    assert snapshot.quality(index) == ValueQuality.Good
+    assert snapshot.age(index, now=35.0) == 5.0
+
+
+def test_frozen_snapshot_rejects_restore(catalog):
+    snapshot = GrowattSnapshot(catalog).copy(frozen=True)
+
+    with pytest.raises(TypeError):
+        snapshot.restore({"power": (1, 1.0, 1)})
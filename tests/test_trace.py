@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from API.growatt import GrowattDevice, GrowattNetwork
+from API.simulator import GrowattSimulator, serve
+from API.trace import TRACER, GrowattTracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = GrowattTracer()
+
+    with tracer.span("read", "transport", "tcp"):
+        pass
+
+    assert len(tracer) == 0
+
+
+def test_ring_drops_oldest_spans():
+    tracer = GrowattTracer()
+    tracer.start(capacity=2)
+    for name in ("first", "second", "third"):
+        with tracer.span(name, "transport", "tcp"):
+            pass
+    tracer.stop()
+
+    with tracer.span("stopped", "transport", "tcp"):
+        pass
+
+    assert [event["name"] for event in tracer.events() if event["ph"] == "X"] == ["second", "third"]
+
+
+def test_export_chrome_trace(tmp_path):
+    tracer = GrowattTracer()
+    tracer.start()
+    with tracer.span("cycle", "coordinator", "device"):
+        with tracer.span("input", "transport", "tcp", start=0, length=10):
+            pass
+    tracer.stop()
+
+    path = tmp_path / "trace.json"
+    assert tracer.export(str(path)) == 2
+
+    events = json.loads(path.read_text())["traceEvents"]
+    threads = {event["args"]["name"]: event["tid"] for event in events if event["name"] == "thread_name"}
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert set(threads) == {"device", "tcp"}
+    assert spans["input"]["tid"] == threads["tcp"]
+    assert spans["input"]["args"] == {"start": 0, "length": 10}
+    assert "args" not in spans["cycle"]
+    # the inner span is recorded first, but lies within the outer span
+    assert spans["cycle"]["ts"] <= spans["input"]["ts"]
+    assert spans["input"]["ts"] + spans["input"]["dur"] <= spans["cycle"]["ts"] + spans["cycle"]["dur"]
+
+
+def test_update_traced():
+    async def run():
+        servers = await serve([GrowattSimulator(1)], 0)
+        modbus = GrowattNetwork("tcp", "127.0.0.1", servers[0].port)
+        try:
+            await modbus.connect()
+            device = GrowattDevice(modbus, 1)
+            keys = {register.register for register in device.input_register}
+            await device.update(keys)
+            return modbus.trace_name, device.trace_name, len(device.plan(keys).blocks)
+        finally:
+            await modbus.close()
+            for server in servers:
+                await server.stop()
+
+    TRACER.start()
+    try:
+        transport, device, blocks = asyncio.run(run())
+    finally:
+        TRACER.stop()
+
+    events = [event for event in TRACER.events() if event["ph"] == "X"]
+    names = [event["name"] for event in events]
+    assert names.count("input") == blocks
+    assert names.count("queue") == blocks
+    assert names.count("decode") == 1
+    threads = {event["args"]["name"] for event in TRACER.events() if event["name"] == "thread_name"}
+    assert threads == {transport, f"{transport} queue", device}